@@ -1,11 +1,55 @@
+import argparse
+import fnmatch
+import os
+import re
 import sys
+import time
+from audit_index import AuditStore
+from comment_store import CommentStore
 from friend_management import FriendManager
 from picture_management import PictureManager
 from list_management import ListManager
 from log import Logger
+from metrics import Metrics, profiling
+from pipeline import IOPool, parse_in_background
+from snapshot import load_snapshot, save_snapshot
+from transaction import TRANSACTION_COMMANDS, Transaction
+from wal import WriteAheadLog
+
+def stream_commands(source):
+    # Lazily yield the stripped, non-blank commands from a regular file, named pipe or stdin ('-')
+    if source == '-':
+        lines = sys.stdin
+    else:
+        lines = open(source, 'r')
+
+    try:
+        for line in lines:
+            # Strip any extra spaces and skip blank lines
+            command = line.strip()
+            if command:
+                yield command
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+
+
+def is_valid_name(name):
+    # Return whether a name can be used as a friend name (one command argument that is not an @file)
+    return bool(name) and not name.startswith('@') and not any(character.isspace() for character in name)
+
+
+def is_pattern(name):
+    # Return whether a picture name argument is a glob pattern
+    return any(character in name for character in "*?[")
+
 
 class MyFacebook:
-    def __init__(self):
+    def __init__(self, comment_store_dir=None, wal_dir=None, checkpoint_every=1000, state_dir=".", fresh=True,
+                 audit_index_dir=None, audit_retention_days=None, snapshot=None,
+                 comment_cache_bytes=32 * 1024 * 1024, io_workers=0, audit_flush_policy="count", audit_flush_every=512,
+                 audit_flush_interval=1.0, audit_max_bytes=None, audit_backup_count=5, audit_sync=False,
+                 metrics_path=None):
         # Initialize MyFacebook with a profile owner and current viewer
         self.profile_owner = None
         self.current_viewer = None
@@ -13,107 +57,332 @@ class MyFacebook:
         # Flag to keep track whether or not profile owner has viewed the profile
         self.profile_owner_has_viewed = False
 
-        # Use the supporting files to manage friends, lists, and pictures as well as logging
-        self.friends_manager = FriendManager("friends.txt")
-        self.picture_manager = PictureManager("pictures.txt")
-        self.list_manager = ListManager("lists.txt")
-        self.logger = Logger()
+        # Use the supporting files (kept in state_dir) to manage friends, lists, and pictures as well as logging.
+        # A fresh run starts a new audit.txt; otherwise the audit log keeps growing across runs
+        self.state_dir = state_dir
+        self.friends_manager = FriendManager(os.path.join(state_dir, "friends.txt"))
+        self.comment_store = CommentStore(comment_store_dir) if comment_store_dir else None
+
+        # In pipelined mode picture files are written by io_workers processes while the next commands are evaluated
+        self.io_pool = IOPool(io_workers) if io_workers else None
+        self.picture_manager = PictureManager(os.path.join(state_dir, "pictures.txt"), self.comment_store, state_dir,
+                                              comment_cache_bytes, self.io_pool)
+        self.list_manager = ListManager(os.path.join(state_dir, "lists.txt"))
+        # audit.txt is buffered (see log.py for the flush policies), optionally rotated and fsynced
+        self.logger = Logger(os.path.join(state_dir, "audit.txt"), audit_flush_policy, audit_flush_every,
+                             audit_flush_interval, audit_max_bytes, audit_backup_count, truncate=fresh, sync=audit_sync)
+
+        # Optionally also keep the audit stream as structured, indexed records that are kept across runs
+        self.audit_store = AuditStore(audit_index_dir, retention_days=audit_retention_days) if audit_index_dir \
+            else None
+
+        # Where command output goes besides the audit log (print by default)
+        self.output = print
+
+        # Per-instruction latency histograms and outcome counters (written to metrics_path at end when one is given),
+        # and the instruction being executed (with its parts)
+        self.metrics = Metrics()
+        self.metrics_path = metrics_path
+        self.instruction = None
+        self.parts = None
+
+        # The open transaction (begin ... commit/abort), if any
+        self.transaction = None
+
+        # Optionally start from a binary snapshot of the friends, lists and pictures (written back by save)
+        # The loaded names stay in the memory-mapped file, kept in mapped_snapshot
+        self.snapshot = snapshot
+        self.mapped_snapshot = None
+        if snapshot and os.path.exists(snapshot):
+            self.mapped_snapshot = load_snapshot(snapshot, self.friends_manager, self.list_manager,
+                                                 self.picture_manager)
+
+            # As in friends.txt, the first friend is the profile owner
+            self.profile_owner = next(iter(self.friends_manager.friends), None)
+
+        # Optionally record every state change in a write-ahead log and recover the state it describes
+        self.wal = None
+        if wal_dir:
+            self.wal = WriteAheadLog(wal_dir, checkpoint_every)
+            self.wal.recover(self)
+
+    # Dispatch table from each instruction to a handler taking the MyFacebook instance and the command's parts
+    HANDLERS = {
+        "friendadd": lambda self, parts: self.friend_add(parts[1]) if len(parts) <= 2 and not parts[1].startswith('@')
+                                         else self.friend_add_many(parts[1:]),
+        "viewby": lambda self, parts: self.view_by(parts[1]),
+        "logout": lambda self, parts: self.logout(),
+        "listadd": lambda self, parts: self.list_add(parts[1]),
+        "friendlist": lambda self, parts: self.friend_list(parts[1], parts[2])
+                                          if len(parts) <= 3 and not parts[1].startswith('@')
+                                          else self.friend_list_many(parts[1:-1], parts[-1]),
+        "postpicture": lambda self, parts: self.post_picture(parts[1]),
+        "chlst": lambda self, parts: self.change_list(parts[1], parts[2]),
+        "chmod": lambda self, parts: self.change_permissions(parts[1], parts[2:5]),
+        "chown": lambda self, parts: self.change_owner(parts[1], parts[2]),
+        "readcomments": lambda self, parts: self.read_comments(parts[1], parts[2:]),
+        "writecomments": lambda self, parts: self.write_comments(parts[1], ' '.join(parts[2:])),
+        "accessible": lambda self, parts: self.accessible(parts[1], parts[2]),
+        "accessmatrix": lambda self, parts: self.access_matrix(parts[1]),
+        "stats": lambda self, parts: self.show_stats(),
+        "begin": lambda self, parts: self.begin(),
+        "commit": lambda self, parts: self.commit(),
+        "abort": lambda self, parts: self.abort(),
+        "end": lambda self, parts: self.end(),
+    }
+
+    # Positions of the picture and list arguments of each instruction, recorded in the indexed audit log
+    # (negative positions count from the end, e.g. the list of "friendlist f1 f2 ... list")
+    AUDIT_TARGETS = {
+        "listadd": (None, 1),
+        "friendlist": (None, -1),
+        "postpicture": (1, None),
+        "chlst": (1, 2),
+        "chmod": (1, None),
+        "chown": (1, None),
+        "readcomments": (1, None),
+        "writecomments": (1, None),
+    }
 
     def run(self, filename):
-        # Execute the commands from the specified input file
+        # Execute the commands from the specified input file (or stdin when the filename is '-')
+        # Commands are read lazily, so pipes and huge files start executing right away in constant memory.
+        # In pipelined mode they are read and tokenized on a parser thread ahead of the evaluator
+        if self.io_pool is not None:
+            self.run_commands(filename, parse_in_background(stream_commands(filename)))
+        else:
+            self.run_commands(filename, ((command.split(), command) for command in stream_commands(filename)))
+
+        # Roll back a transaction the commands never committed
+        if self.transaction is not None:
+            self.abort()
+
+    def run_commands(self, source, commands, execute=None):
+        # Execute already tokenized (parts, command) pairs, e.g. from a text file. A compiled replay passes its own
+        # execute for the decoded commands it yields instead
+        execute = execute or self.execute_parts
+        self.instruction = None
+        self.parts = None
         try:
-            with open(filename, 'r') as file:
-                commands = file.readlines()
-                for command in commands:
-                    # Strip any extra speaces and execute the cleaned up command
-                    self.execute_command(command.strip())
+            for command in commands:
+                execute(*command)
 
         except FileNotFoundError:
             # Log and print an error if the file is not found
-            self.logger.log_action(f"File {filename} not found")
-            print(f"File {filename} not found")
+            self.report(f"File {source} not found", "file_not_found")
 
         except Exception as e:
             # Log and print any unexpected errors that may occur
-            self.logger.log_action(f"Unexpected error: {e}")
-            print(f"Unexpected error: {e}")
+            self.report(f"Unexpected error: {e}", "unexpected_error")
 
     def execute_command(self, command):
         # Split each instruction/command into parts based on the space between command and arugments
-        parts = command.split()
+        self.execute_parts(command.split(), command)
 
-        # Set the actual instruction/command to be the first part
-        instruction = parts[0]
+    def execute_parts(self, parts, command):
+        # Skip blank and whitespace-only lines
+        if not parts:
+            return
 
-        # Perform several checks to see which instruction should be executed
-        if instruction == "friendadd": self.friend_add(parts[1])
+        # Look up the handler for the actual instruction/command (the first part)
+        handler = self.HANDLERS.get(parts[0])
 
-        elif instruction == "viewby": self.view_by(parts[1])
+        if handler is None:
+            # Log and print an error for invalid commands
+            self.instruction = "invalid"
+            self.report(f"Invalid command: {command}", "invalid_command")
+            return
 
-        elif instruction == "logout": self.logout()
-        
-        elif instruction == "listadd": self.list_add(parts[1])
-        
-        elif instruction == "friendlist": self.friend_list(parts[1], parts[2])
+        self.execute_handler(handler, parts)
 
-        elif instruction == "postpicture": self.post_picture(parts[1])
-        
-        elif instruction == "chlst": self.change_list(parts[1], parts[2])
+    def execute_handler(self, handler, parts):
+        # Run the handler of an instruction that was already looked up (compiled replays look it up by opcode)
+        # Time the command for the latency histograms
+        self.instruction = parts[0]
+        self.parts = parts
 
-        elif instruction == "chmod": self.change_permissions(parts[1], parts[2:5])
+        # Only the list and picture changes can be staged in a transaction (an error aborts it); end rolls it back
+        if self.transaction is not None and parts[0] not in TRANSACTION_COMMANDS | {"commit", "abort", "end"}:
+            self.report(f"Error: {parts[0]} is not allowed in a transaction", "not_transactional")
+            return
 
-        elif instruction == "chown": self.change_owner(parts[1], parts[2])
+        start = time.perf_counter()
+        try:
+            handler(self, parts)
+        finally:
+            self.metrics.observe(parts[0], time.perf_counter() - start)
+
+        # Fold the logged changes into a checkpoint every so often (but not while changes are staged)
+        if self.wal is not None and self.transaction is None and self.wal.checkpoint_due():
+            self.wal.checkpoint(self)
+
+    def report(self, message, outcome="success"):
+        # Log a result or error to audit.txt, show it to the viewer and count its outcome
+        self.metrics.count(self.instruction or "run", outcome)
+        picture_name, list_name = self.audit_targets() if self.audit_store is not None else (None, None)
+        entry = (message, outcome, self.current_viewer, self.instruction or "run", picture_name, list_name)
+
+        if self.transaction is not None:
+            # Results inside a transaction are held back until it commits, and an error rolls it back
+            if outcome == "success":
+                self.transaction.reports.append(entry)
+                return
 
-        elif instruction == "readcomments": self.read_comments(parts[1])
-        
-        elif instruction == "writecomments": self.write_comments(parts[1], ' '.join(parts[2:]))
-        
-        elif instruction == "end": self.end()
+            count = self.rollback()
+            self.publish([entry])
+            self.report(f"Transaction aborted: {count} changes rolled back", "transaction_aborted")
+            return
 
-        else: 
-            # Log and print an error for invalid commands
-            self.logger.log_action(f"Invalid command: {command}")
-            print(f"Invalid command: {command}")
+        self.publish([entry])
+
+    def publish(self, entries):
+        # Write results to audit.txt (and the audit index) and show them to the viewer
+        for message, outcome, viewer, instruction, picture_name, list_name in entries:
+            self.logger.log_action(message)
+            if self.audit_store is not None:
+                self.audit_store.append(viewer, instruction, picture_name, list_name, outcome, message)
+            self.output(message)
+
+    def audit_targets(self):
+        # Return the picture and list the current command is about (None when it has none)
+        picture_index, list_index = self.AUDIT_TARGETS.get(self.instruction, (None, None))
+        parts = self.parts or ()
+
+        def argument(index):
+            # The argument at a position, None if there is none (the instruction itself is not an argument)
+            if index is None:
+                return None
+            position = index if index >= 0 else len(parts) + index
+            return parts[position] if 0 < position < len(parts) else None
+
+        return argument(picture_index), argument(list_index)
+
+    def show_stats(self):
+        # Show the command counts, latency percentiles and outcome counters collected so far
+        cache = self.picture_manager.comment_cache
+        self.report('\n'.join(["Stats:"] + self.metrics.summary() +
+                               [f"comment cache: {cache.hits} hits, {cache.misses} misses, {cache.evictions} evictions, "
+                                f"{cache.bytes} of {cache.max_bytes} bytes"]))
+
+    def journal(self, operation, *arguments):
+        # Record a state change in the write-ahead log (if enabled) before it is applied.
+        # Inside a transaction the record is held back until commit, along with how to undo the change
+        if self.transaction is not None:
+            self.transaction.stage(self, operation, arguments)
+        elif self.wal is not None:
+            self.wal.append(operation, *arguments)
+
+    def journal_many(self, records):
+        # Record a batch of (operation, arguments) state changes with a single write-ahead log write
+        if self.transaction is not None:
+            for operation, arguments in records:
+                self.transaction.stage(self, operation, arguments)
+        elif self.wal is not None:
+            self.wal.append_many(records)
+
+    def expand_names(self, arguments):
+        # Replace @file arguments with the names listed in the file (one per line), dropping repeated names.
+        # Return the names and the (file, line number, line) of every line that is not a valid friend name
+        names = []
+        invalid = []
+        for argument in arguments:
+            if not argument.startswith('@'):
+                names.append(argument)
+                continue
+
+            with open(argument[1:], 'r') as file:
+                for number, line in enumerate(file, 1):
+                    friend_name = line.strip()
+                    if is_valid_name(friend_name):
+                        names.append(friend_name)
+                    else:
+                        invalid.append((argument[1:], number, friend_name))
+        return list(dict.fromkeys(names)), invalid
+
+    def report_invalid_names(self, instruction, invalid):
+        # Report each @file line that is not a valid friend name (empty, containing whitespace or starting with @)
+        for filename, number, friend_name in invalid:
+            self.report(f"Error with {instruction}: invalid friend name '{friend_name}' in {filename} line {number}",
+                        "invalid_friend_name")
 
     def friend_add(self, friend_name):
         # Check whether the current viewer is the profile owner
         if self.current_viewer != self.profile_owner:
-            self.logger.log_action(f"Error: only {self.profile_owner} may issue friendadd command")
-            print(f"Error: only {self.profile_owner} may issue friendadd command")
+            self.report(f"Error: only {self.profile_owner} may issue friendadd command", "not_profile_owner")
             return
         
         # If there is no profile owner, set it to the first added friend
         if self.profile_owner is None:
             self.profile_owner = friend_name
+            self.journal("owner", friend_name)
 
         # Check to see if the friend already exists
         if friend_name in self.friends_manager.friends:
-            self.logger.log_action(f"Error with friendadd: friend {friend_name} already exists")
-            print(f"Error with friendadd: friend {friend_name} already exists")
+            self.report(f"Error with friendadd: friend {friend_name} already exists", "friend_exists")
             return
 
         # Add the friend and log the action
+        self.journal("friendadd", friend_name)
         self.friends_manager.add_friend(friend_name)
-        self.logger.log_action(f"Friend {friend_name} added")
-        print(f"Friend {friend_name} added")
+        self.report(f"Friend {friend_name} added")
         
+    def friend_add_many(self, arguments):
+        # Check whether the current viewer is the profile owner
+        if self.current_viewer != self.profile_owner:
+            self.report(f"Error: only {self.profile_owner} may issue friendadd command", "not_profile_owner")
+            return
+
+        # Collect the names given on the command line or in @files
+        try:
+            friend_names, invalid = self.expand_names(arguments)
+        except FileNotFoundError as e:
+            self.report(f"Error with friendadd: file {e.filename} not found", "file_not_found")
+            return
+
+        # Add nothing if any listed name is invalid
+        if invalid:
+            self.report_invalid_names("friendadd", invalid)
+            return
+
+        # An empty @file names nobody
+        if not friend_names:
+            self.report("Error with friendadd: no friend names given", "no_friend_names")
+            return
+
+        # If there is no profile owner, set it to the first added friend
+        if self.profile_owner is None:
+            self.profile_owner = friend_names[0]
+            self.journal("owner", friend_names[0])
+
+        # Check which friends already exist
+        friends = self.friends_manager.friends
+        existing = [friend_name for friend_name in friend_names if friend_name in friends]
+        added = [friend_name for friend_name in friend_names if friend_name not in friends]
+        if not added:
+            self.report(f"Error with friendadd: friends {' '.join(existing)} already exist", "friend_exists")
+            return
+
+        # Add the friends and log a single summary of the action
+        self.journal_many(("friendadd", (friend_name,)) for friend_name in added)
+        for friend_name in added:
+            self.friends_manager.add_friend(friend_name)
+        skipped = f" ({len(existing)} already existed: {' '.join(existing)})" if existing else ""
+        self.report(f"{len(added)} friends added{skipped}")
+
     def view_by(self, friend_name):
         # Check to make sure the profile owner views first
         if not self.profile_owner_has_viewed and friend_name != self.profile_owner:
-            self.logger.log_action(f"Error with viewby: profile owner must view profile first")
-            print(f"Error with viewby: profile owner must view profile first")
+            self.report(f"Error with viewby: profile owner must view profile first", "owner_must_view_first")
             return
 
         # Check if there is already someone viewing profile to prevent simultaneous login
         if self.current_viewer is not None:
-            self.logger.log_action("Login failed: simultaneous login not permitted")
-            print("Login failed: simultaneous login not permitted")
+            self.report("Login failed: simultaneous login not permitted", "simultaneous_login")
             return
         
         # Check if the friend has been added
         if friend_name not in self.friends_manager.friends:
-            self.logger.log_action(f"Login failed: invalid friend name")
-            print(f"Login failed: invalid friend name")
+            self.report(f"Login failed: invalid friend name", "invalid_friend")
             return
         
         # Indicate that the profile owner has viewed first/at least once
@@ -122,222 +391,342 @@ class MyFacebook:
             
         # Set the current viewer and log the action
         self.current_viewer = friend_name
-        self.logger.log_action(f"Friend {friend_name} views the profile")
-        print(f"Friend {friend_name} views the profile")
+        self.report(f"Friend {friend_name} views the profile")
 
     def logout(self):
         # If no one is viewing the profile, log an error
         if not self.current_viewer:
-            self.logger.log_action("Error: no one is currently viewing profile")
-            print("Error: no one is currently viewing profile")
+            self.report("Error: no one is currently viewing profile", "no_viewer")
             return
         
         # Log the friend out (no viewer) and log the action
-        self.logger.log_action(f"Friend {self.current_viewer} logged out")
-        print(f"Friend {self.current_viewer} logged out")
+        self.report(f"Friend {self.current_viewer} logged out")
         self.current_viewer = None
 
     def list_add(self, list_name):
         # Check whether the current viewer is the profile owner
         if self.current_viewer != self.profile_owner:
-            self.logger.log_action(f"Error: only {self.profile_owner} may issue listadd command")
-            print(f"Error: only {self.profile_owner} may issue listadd command")
+            self.report(f"Error: only {self.profile_owner} may issue listadd command", "not_profile_owner")
             return
         
         # Check to see if the list already exists (or it is 'nil')
         if list_name in self.list_manager.lists or list_name == 'nil':
-            self.logger.log_action(f"Error with listadd: list {list_name} already exists")
-            print(f"Error with listadd: list {list_name} already exists")
+            self.report(f"Error with listadd: list {list_name} already exists", "list_exists")
             return
         
         # Add the list and log the action
+        self.journal("listadd", list_name)
         self.list_manager.add_list(list_name)
-        self.logger.log_action(f"List {list_name} added")
-        print(f"List {list_name} added")
+        self.report(f"List {list_name} added")
 
     def friend_list(self, friend_name, list_name):
         # Check whether the current viewer is the profile owner
         if self.current_viewer != self.profile_owner:
-            self.logger.log_action(f"Error: only {self.profile_owner} may issue friendlist command")
-            print(f"Error: only {self.profile_owner} may issue friendlist command")
+            self.report(f"Error: only {self.profile_owner} may issue friendlist command", "not_profile_owner")
             return
         
         # Check to see if the list exists
         if list_name not in self.list_manager.lists:
-            self.logger.log_action(f"Error with friendlist: list {list_name} not found")
-            print(f"Error with friendlist: list {list_name} not found")
+            self.report(f"Error with friendlist: list {list_name} not found", "list_not_found")
             return
         
-        # Check to see if the friend exists
+        # Check to see if the friend exists (otherwise a list of that name is nested in the list)
         if friend_name not in self.friends_manager.friends:
-            self.logger.log_action(f"Error with friendlist: friend {friend_name} not found")
-            print(f"Error with friendlist: friend {friend_name} not found")
+            if friend_name in self.list_manager.lists:
+                self.nest_list(friend_name, list_name)
+                return
+            self.report(f"Error with friendlist: friend {friend_name} not found", "friend_not_found")
             return
         
         # Add the friend to the list and log the action
+        self.journal("friendlist", friend_name, list_name)
         self.list_manager.add_friend_to_list(friend_name, list_name)
-        self.logger.log_action(f"Friend {friend_name} added to list {list_name}")
-        print(f"Friend {friend_name} added to list {list_name}")
+        self.picture_manager.invalidate_viewer(friend_name)
+        self.report(f"Friend {friend_name} added to list {list_name}")
+
+    def nest_list(self, child_name, list_name):
+        # Check that the list would not end up containing itself
+        if self.list_manager.creates_cycle(child_name, list_name):
+            self.report(f"Error with friendlist: list {child_name} contains list {list_name}, "
+                        f"nesting would create a cycle", "list_cycle")
+            return
+
+        # Nest the list and log the action; its members' access decisions may change
+        self.journal("sublist", child_name, list_name)
+        self.list_manager.add_list_to_list(child_name, list_name)
+        for friend_name in self.list_manager.members_of(child_name):
+            self.picture_manager.invalidate_viewer(friend_name)
+        self.report(f"List {child_name} added to list {list_name}")
+
+    def friend_list_many(self, arguments, list_name):
+        # Check whether the current viewer is the profile owner
+        if self.current_viewer != self.profile_owner:
+            self.report(f"Error: only {self.profile_owner} may issue friendlist command", "not_profile_owner")
+            return
+
+        # Check to see if the list exists
+        if list_name not in self.list_manager.lists:
+            self.report(f"Error with friendlist: list {list_name} not found", "list_not_found")
+            return
+
+        # Collect the names given on the command line or in @files
+        try:
+            friend_names, invalid = self.expand_names(arguments)
+        except FileNotFoundError as e:
+            self.report(f"Error with friendlist: file {e.filename} not found", "file_not_found")
+            return
+
+        # Add nothing if any listed name is invalid
+        if invalid:
+            self.report_invalid_names("friendlist", invalid)
+            return
+
+        # An empty @file names nobody
+        if not friend_names:
+            self.report("Error with friendlist: no friend names given", "no_friend_names")
+            return
+
+        # Check that every friend exists before adding any of them
+        missing = [friend_name for friend_name in friend_names if friend_name not in self.friends_manager.friends]
+        if missing:
+            self.report(f"Error with friendlist: friends not found: {' '.join(missing)}", "friend_not_found")
+            return
+
+        # Add the friends to the list and log a single summary of the action
+        self.journal_many(("friendlist", (friend_name, list_name)) for friend_name in friend_names)
+        for friend_name in friend_names:
+            self.list_manager.add_friend_to_list(friend_name, list_name)
+            self.picture_manager.invalidate_viewer(friend_name)
+        self.report(f"{len(friend_names)} friends added to list {list_name}")
+
+    def reserved_names(self):
+        # File names in the state directory that pictures and exports may not take: the state files, and the
+        # metrics file when it is written there
+        reserved_names = {"audit.txt", "friends.txt", "lists.txt", "pictures.txt"}
+        if self.metrics_path and os.path.dirname(os.path.abspath(self.metrics_path)) == os.path.abspath(self.state_dir):
+            reserved_names.add(os.path.basename(self.metrics_path))
+        return reserved_names
 
     def post_picture(self, picture_name):
         # If no one is viewing the profile, log an error
         if not self.current_viewer:
-            self.logger.log_action("Error: no one is currently viewing profile")
-            print("Error: no one is currently viewing profile")
+            self.report("Error: no one is currently viewing profile", "no_viewer")
             return
         
-        # Store the reserved file names
-        reserved_names = {"audit.txt", "friends.txt", "lists.txt", "pictures.txt"}
-
         # Check to see if the picture name matches one of the reserved file names
-        if picture_name in reserved_names:
-            self.logger.log_action(f"Error: invalid filename {picture_name}")
-            print(f"Error: invalid filename {picture_name}")
+        if picture_name in self.reserved_names():
+            self.report(f"Error: invalid filename {picture_name}", "invalid_filename")
             return
         
         # Check to see if the picture already exists
         if picture_name in self.picture_manager.pictures:
-            self.logger.log_action(f"Error: picture {picture_name} already exists")
-            print(f"Error: picture {picture_name} already exists")
+            self.report(f"Error: picture {picture_name} already exists", "picture_exists")
             return
         
         # Post the picutre and log the action (including owner and default permissions)
+        self.journal("postpicture", picture_name, self.current_viewer)
         self.picture_manager.add_picture(picture_name, self.current_viewer)
-        self.logger.log_action(f"Picture {picture_name} with owner {self.current_viewer} and default permissions created")
-        print(f"Picture {picture_name} with owner {self.current_viewer} and default permissions created")
+        self.report(f"Picture {picture_name} with owner {self.current_viewer} and default permissions created")
 
     def change_list(self, picture_name, list_name):
         # If no one is viewing the profile, log an error
         if not self.current_viewer:
-            self.logger.log_action("Error with chlist: no one is currently viewing profile")
-            print("Error with chlist: no one is currently viewing profile")
+            self.report("Error with chlist: no one is currently viewing profile", "no_viewer")
+            return
+
+        # A glob pattern (that is not itself a picture name) changes every matching picture
+        if picture_name not in self.picture_manager.pictures and is_pattern(picture_name):
+            self.change_list_matching(picture_name, list_name)
             return
         
         # Check to see if the picture exists
         if picture_name not in self.picture_manager.pictures:
-            self.logger.log_action(f"Error with chlist: picture {picture_name} not found")
-            print(f"Error with chlist: picture {picture_name} not found")
+            self.report(f"Error with chlist: picture {picture_name} not found", "picture_not_found")
             return
         
         # Check to see if the list exists
         if list_name != "nil" and list_name not in self.list_manager.lists:
-            self.logger.log_action(f"Error with chlist: list {list_name} not found")
-            print(f"Error with chlist: list {list_name} not found")
+            self.report(f"Error with chlist: list {list_name} not found", "list_not_found")
             return
         
-        picture_owner = self.picture_manager.pictures[picture_name]['owner']
+        picture_owner = self.picture_manager.owner_of(picture_name)
 
         # Check to make sure current viewer is profile owner or picture owner to determine if they can change list
         if self.current_viewer != self.profile_owner and self.current_viewer != picture_owner:
-            self.logger.log_action("Error with chlist: only profile owner or picture owner can change the list")
-            print("Error with chlist: only profile owner or picture owner can change the list")
+            self.report("Error with chlist: only profile owner or picture owner can change the list", "not_picture_owner")
             return
          
         # If current viewer is not profile owner, they can only set list to "nil" or a list they belong to
         if self.current_viewer != self.profile_owner and list_name != "nil":
             if not self.list_manager.friend_in_list(self.current_viewer, list_name):
-                self.logger.log_action(f"Error with chlist: friend {self.current_viewer} is not a member of list {list_name}")
-                print(f"Error with chlist: friend {self.current_viewer} is not a member of list {list_name}")
+                self.report(f"Error with chlist: friend {self.current_viewer} is not a member of list {list_name}", "not_list_member")
                 return
        
         # Change the list and log the action
+        self.journal("chlst", picture_name, list_name)
         self.picture_manager.change_list(picture_name, list_name)
-        self.logger.log_action(f"List for {picture_name} set to {list_name} by {self.current_viewer}")
-        print(f"List for {picture_name} set to {list_name} by {self.current_viewer}")
+        self.report(f"List for {picture_name} set to {list_name} by {self.current_viewer}")
 
     def change_permissions(self, picture_name, permissions):
         # If no one is viewing the profile, log an error
         if not self.current_viewer:
-            self.logger.log_action("Error with chmod: no one is currently viewing profile")
-            print("Error with chmod: no one is currently viewing profile")
+            self.report("Error with chmod: no one is currently viewing profile", "no_viewer")
+            return
+
+        # A glob pattern (that is not itself a picture name) changes every matching picture
+        if picture_name not in self.picture_manager.pictures and is_pattern(picture_name):
+            self.change_permissions_matching(picture_name, permissions)
             return
         
         # Check to see if the picture exists
         if picture_name not in self.picture_manager.pictures:
-            self.logger.log_action(f"Error with chmod: picture {picture_name} not found")
-            print(f"Error with chmod: picture {picture_name} not found")
+            self.report(f"Error with chmod: picture {picture_name} not found", "picture_not_found")
             return
         
-        picture_owner = self.picture_manager.pictures[picture_name]['owner']
+        picture_owner = self.picture_manager.owner_of(picture_name)
 
         # Check to make sure current viewer is profile owner or picture owner to determine if they can change list
         if self.current_viewer != self.profile_owner and self.current_viewer != picture_owner:
-            self.logger.log_action("Error with chmod: only profile owner or picture owner can change permissions")
-            print("Error with chmod: only profile owner or picture owner can change permissions")
+            self.report("Error with chmod: only profile owner or picture owner can change permissions", "not_picture_owner")
             return
     
         # Change the permissions and log the action
+        self.journal("chmod", picture_name, *permissions[:3])
         self.picture_manager.change_permissions(picture_name, permissions)
         owner, list, others = permissions[:3]
-        self.logger.log_action(f"Permissions for {picture_name} set to {owner} {list} {others} by {self.current_viewer}")
-        print(f"Permissions for {picture_name} set to {owner} {list} {others} by {self.current_viewer}")
+        self.report(f"Permissions for {picture_name} set to {owner} {list} {others} by {self.current_viewer}")
+
+    def matching_pictures(self, pattern):
+        # Return the pictures matching a glob pattern that the current viewer may change
+        # (every picture for the profile owner, otherwise the viewer's own pictures)
+        match = re.compile(fnmatch.translate(pattern)).match
+        picture_manager = self.picture_manager
+        if self.current_viewer == self.profile_owner:
+            return [picture_name for picture_name in picture_manager.pictures if match(picture_name)]
+        return [picture_name for picture_name in picture_manager.pictures
+                if match(picture_name) and picture_manager.owner_of(picture_name) == self.current_viewer]
+
+    def change_list_matching(self, pattern, list_name):
+        # Check to see if the list exists
+        if list_name != "nil" and list_name not in self.list_manager.lists:
+            self.report(f"Error with chlist: list {list_name} not found", "list_not_found")
+            return
+
+        # If current viewer is not profile owner, they can only set list to "nil" or a list they belong to
+        if self.current_viewer != self.profile_owner and list_name != "nil":
+            if not self.list_manager.friend_in_list(self.current_viewer, list_name):
+                self.report(f"Error with chlist: friend {self.current_viewer} is not a member of list {list_name}", "not_list_member")
+                return
+
+        # Check that the pattern matches pictures the viewer may change
+        picture_names = self.matching_pictures(pattern)
+        if not picture_names:
+            self.report(f"Error with chlist: no pictures matching {pattern} can be changed by {self.current_viewer}",
+                        "picture_not_found")
+            return
+
+        # Change the lists and log a single summary of the action
+        self.journal_many(("chlst", (picture_name, list_name)) for picture_name in picture_names)
+        for picture_name in picture_names:
+            self.picture_manager.change_list(picture_name, list_name)
+        self.report(f"List for {len(picture_names)} pictures matching {pattern} set to {list_name} by {self.current_viewer}")
+
+    def change_permissions_matching(self, pattern, permissions):
+        # Check that the pattern matches pictures the viewer may change
+        owner, list, others = permissions[0], permissions[1], permissions[2]
+        picture_names = self.matching_pictures(pattern)
+        if not picture_names:
+            self.report(f"Error with chmod: no pictures matching {pattern} can be changed by {self.current_viewer}",
+                        "picture_not_found")
+            return
+
+        # Change the permissions and log a single summary of the action
+        self.journal_many(("chmod", (picture_name, owner, list, others)) for picture_name in picture_names)
+        for picture_name in picture_names:
+            self.picture_manager.change_permissions(picture_name, permissions)
+        self.report(f"Permissions for {len(picture_names)} pictures matching {pattern} set to {owner} {list} {others} "
+                    f"by {self.current_viewer}")
 
     def change_owner(self, picture_name, new_owner):
         # If no one is viewing the profile, log an error
         if not self.current_viewer:
-            self.logger.log_action("Error with chown: no one is currently viewing profile")
-            print("Error with chown: no one is currently viewing profile")
+            self.report("Error with chown: no one is currently viewing profile", "no_viewer")
             return
         
         # Check whether the current viewer is the profile owner
         if self.current_viewer != self.profile_owner:
-            self.logger.log_action(f"Error: only {self.profile_owner} may issue chown command")
-            print(f"Error: only {self.profile_owner} may issue chown command")
+            self.report(f"Error: only {self.profile_owner} may issue chown command", "not_profile_owner")
             return
         
         # Check to see if the picture exists
         if picture_name not in self.picture_manager.pictures:
-            self.logger.log_action(f"Error with chown: picture {picture_name} not found")
-            print(f"Error with chown: picture {picture_name} not found")
+            self.report(f"Error with chown: picture {picture_name} not found", "picture_not_found")
             return
         
         # Check to see if the new owner exists as a friend
         if new_owner not in self.friends_manager.friends:
-            self.logger.log_action(f"Error with chown: friend {new_owner} not found")
-            print(f"Error with chown: friend {new_owner} not found")
+            self.report(f"Error with chown: friend {new_owner} not found", "friend_not_found")
             return
         
         # Change the owner and log the action
+        self.journal("chown", picture_name, new_owner)
         self.picture_manager.change_owner(picture_name, new_owner)
-        self.logger.log_action(f"Owner of {picture_name} changed to {new_owner}")
-        print(f"Owner of {picture_name} changed to {new_owner}")
+        self.report(f"Owner of {picture_name} changed to {new_owner}")
 
-    def read_comments(self, picture_name):
+    def read_comments(self, picture_name, page_options=()):
         # If no one is viewing the profile, log an error
         if not self.current_viewer:
-            self.logger.log_action("Error with readcomments: no one is currently viewing profile")
-            print("Error with readcomments: no one is currently viewing profile")
+            self.report("Error with readcomments: no one is currently viewing profile", "no_viewer")
             return
         
         # Check to see if the picture exists
         if picture_name not in self.picture_manager.pictures:
-            self.logger.log_action(f"Error with readcomments: picture {picture_name} not found")
-            print(f"Error with readcomments: picture {picture_name} not found")
+            self.report(f"Error with readcomments: picture {picture_name} not found", "picture_not_found")
             return
         
+        # Check for a page request such as "last 10" or "from 20 10" after the picture name
+        try:
+            start, count = self.parse_page(page_options)
+        except ValueError:
+            self.report(f"Error with readcomments: invalid page {' '.join(page_options)}", "invalid_page")
+            return
+
         # Determine whether or ont permissions were granted to read comments
-        comment = self.picture_manager.read_comments(picture_name, self.current_viewer, self.list_manager)
+        comment = self.picture_manager.read_comments(picture_name, self.current_viewer, self.list_manager, start, count)
 
         if comment is not None:
             # Successfully read the comments and log the action
-            self.logger.log_action(f"Friend {self.current_viewer} reads {picture_name} as:\n{comment}")
-            print(f"Friend {self.current_viewer} reads {picture_name} as:\n{comment}")
+            self.report(f"Friend {self.current_viewer} reads {picture_name} as:\n{comment}")
         else:
             # Log that read access is denied
-            self.logger.log_action(f"Friend {self.current_viewer} denied read access to {picture_name}")
-            print(f"Friend {self.current_viewer} denied read access to {picture_name}")
+            self.report(f"Friend {self.current_viewer} denied read access to {picture_name}", "denied_read")
+
+    def parse_page(self, page_options):
+        # Turn "last N" or "from K [N]" into a (start, count) page; anything else reads the whole picture
+        if not page_options or page_options[0] not in ("last", "from"):
+            return None, None
+
+        numbers = [int(option) for option in page_options[1:]]
+        if any(number < 0 for number in numbers):
+            raise ValueError("page numbers must not be negative")
+
+        if page_options[0] == "last" and len(numbers) == 1:
+            # "last 0" is an empty page rather than every comment from offset 0
+            return -numbers[0], (None if numbers[0] else 0)
+        if page_options[0] == "from" and len(numbers) in (1, 2):
+            return numbers[0], numbers[1] if len(numbers) == 2 else None
+
+        raise ValueError("malformed page")
 
     def write_comments(self, picture_name, comment_text):
         # If no one is viewing the profile, log an error
         if not self.current_viewer:
-            self.logger.log_action("Error with writecomments: no one is currently viewing profile")
-            print("Error with writecomments: no one is currently viewing profile")
+            self.report("Error with writecomments: no one is currently viewing profile", "no_viewer")
             return
         
         # Check to see if the picture exists
         if picture_name not in self.picture_manager.pictures:
-            self.logger.log_action(f"Error with writecomments: picture {picture_name} not found")
-            print(f"Error with writecomments: picture {picture_name} not found")
+            self.report(f"Error with writecomments: picture {picture_name} not found", "picture_not_found")
             return
         
         # Determine whether or not permissions were granted to write comments
@@ -345,31 +734,210 @@ class MyFacebook:
         
         if success:
             # Successfully write the comments and log the action
-            self.logger.log_action(f"Friend {self.current_viewer} wrote to {picture_name}: {comment_text}")
-            print(f"Friend {self.current_viewer} wrote to {picture_name}: {comment_text}")
+            self.report(f"Friend {self.current_viewer} wrote to {picture_name}: {comment_text}")
         else:
             # Log that write access is denied
-            self.logger.log_action(f"Friend {self.current_viewer} denied write access to {picture_name}")
-            print(f"Friend {self.current_viewer} denied write access to {picture_name}")
+            self.report(f"Friend {self.current_viewer} denied write access to {picture_name}", "denied_write")
 
-    def end(self):
+    def save(self):
         # Writing all data back to files
         self.friends_manager.save_to_file()
         self.list_manager.save_to_file()
         self.picture_manager.save_to_file()
+        if self.metrics_path:
+            self.metrics.write_prometheus(self.metrics_path)
+        if self.snapshot:
+            save_snapshot(self.snapshot, self.friends_manager, self.list_manager, self.picture_manager)
+
+        # Checkpoint the write-ahead log so the next start only has to load checkpoints
+        if self.wal is not None:
+            self.wal.checkpoint(self)
+
+        # Push the queued picture writes, buffered audit log and comments to disk
+        if self.io_pool is not None:
+            self.io_pool.drain()
+        self.logger.flush()
+        if self.audit_store is not None:
+            self.audit_store.flush()
+        if self.comment_store is not None:
+            self.comment_store.flush()
+
+    def close(self):
+        # Close the I/O workers, write-ahead log, audit log and comment store
+        if self.io_pool is not None:
+            self.io_pool.close()
+        if self.wal is not None:
+            self.wal.close()
+        self.logger.close()
+        if self.audit_store is not None:
+            self.audit_store.close()
+        if self.comment_store is not None:
+            self.comment_store.close()
+
+    def accessible(self, friend_name, permission):
+        # Check whether the current viewer is the profile owner
+        if self.current_viewer is None or self.current_viewer != self.profile_owner:
+            self.report(f"Error: only {self.profile_owner} may issue accessible command", "not_profile_owner")
+            return
+
+        # Check that the permission asked about is read or write
+        if permission not in ('r', 'w'):
+            self.report(f"Error with accessible: permission must be r or w, not {permission}", "invalid_permission")
+            return
+
+        # Check to see if the friend exists
+        if friend_name not in self.friends_manager.friends:
+            self.report(f"Error with accessible: friend {friend_name} not found", "friend_not_found")
+            return
+
+        # List the pictures the friend may read or write and log the action
+        pictures = self.picture_manager.accessible(friend_name, permission, self.list_manager)
+        verb = "read" if permission == 'r' else "write"
+        self.report(f"Friend {friend_name} can {verb}: {' '.join(pictures) if pictures else '(no pictures)'}")
+
+    def access_matrix(self, filename):
+        # Check whether the current viewer is the profile owner
+        if self.current_viewer is None or self.current_viewer != self.profile_owner:
+            self.report(f"Error: only {self.profile_owner} may issue accessmatrix command", "not_profile_owner")
+            return
+
+        # The export goes next to the state files, so it must not clobber them and must be .csv or .npy
+        if filename in self.reserved_names() or not filename.endswith((".csv", ".npy")):
+            self.report(f"Error with accessmatrix: invalid filename {filename}", "invalid_filename")
+            return
+
+        # Imported here so NumPy is only loaded by profiles that export a matrix
+        import access_matrix
+        if access_matrix.np is None:
+            self.report("Error with accessmatrix: NumPy is not installed", "numpy_missing")
+            return
+
+        # Picture files live in the same directory, so neither the export nor the labels of an .npy may replace one
+        written = [filename] + ([access_matrix.labels_path(filename)] if filename.endswith(".npy") else [])
+        for name in written:
+            if name in self.picture_manager.pictures:
+                self.report(f"Error with accessmatrix: {name} is a picture", "invalid_filename")
+                return
+
+        # Build the friends x pictures read/write matrix in one pass and log the action
+        matrix = access_matrix.export_access_matrix(os.path.join(self.state_dir, filename),
+                                                    self.friends_manager, self.list_manager, self.picture_manager)
+        self.report(f"Access matrix of {len(matrix.friends)} friends and {len(matrix.pictures)} pictures "
+                    f"written to {filename}")
+
+    def begin(self):
+        # If no one is viewing the profile, log an error
+        if not self.current_viewer:
+            self.report("Error with begin: no one is currently viewing profile", "no_viewer")
+            return
+
+        # Transactions do not nest
+        if self.transaction is not None:
+            self.report("Error with begin: a transaction is already open", "transaction_open")
+            return
+
+        # Stage the following list and picture changes until commit or abort
+        self.report(f"Transaction started by {self.current_viewer}")
+        self.transaction = Transaction()
+
+    def commit(self):
+        # Check that a transaction is open
+        if self.transaction is None:
+            self.report("Error with commit: no transaction is open", "no_transaction")
+            return
+
+        # The staged changes are already applied in memory: log them with one write-ahead log write and release
+        # their results
+        transaction, self.transaction = self.transaction, None
+        self.journal_many(transaction.records)
+        self.publish(transaction.reports)
+        self.report(f"Transaction committed: {len(transaction.records)} changes")
+
+        # One audit flush and one write of the list and picture state for the whole batch
+        self.logger.flush()
+        if self.audit_store is not None:
+            self.audit_store.flush()
+        self.list_manager.save_to_file()
+        self.picture_manager.save_to_file()
+
+    def abort(self):
+        # Check that a transaction is open
+        if self.transaction is None:
+            self.report("Error with abort: no transaction is open", "no_transaction")
+            return
+
+        count = self.rollback()
+        self.report(f"Transaction aborted: {count} changes rolled back")
+
+    def rollback(self):
+        # Undo the open transaction's changes, close it and return how many changes it had staged
+        transaction, self.transaction = self.transaction, None
+        transaction.rollback(self)
+        return len(transaction.records)
+
+    def end(self):
+        # Roll back an uncommitted transaction, then save the state and flush everything before exiting
+        if self.transaction is not None:
+            self.abort()
+        self.save()
+        self.close()
 
         # Terminate the program
         sys.exit(0)
 
 if __name__ == "__main__":
-    # Check to see if script is being run properly and if the correct number of arguments are provided
-    if len(sys.argv) != 2:
-        # Print usage instructions if the number of arguments is not correct
-        print("Usage Instruction: python access.py <commands_file>")
-        sys.exit(1)
+    # Check to see if script is being run properly and if the correct arguments are provided
+    # (argparse prints the usage instructions if they are not)
+    parser = argparse.ArgumentParser(usage="python access.py [options] <commands_file>")
+    parser.add_argument("commands_file", help="file or named pipe with one command per line, or - for stdin")
+    parser.add_argument("--comment-store", metavar="DIR",
+                        help="keep comments in append-only segment files under DIR instead of one file per picture")
+    parser.add_argument("--comment-cache-mb", type=float, default=32, metavar="MB",
+                        help="keep up to MB megabytes of picture comments in memory (default 32, 0 disables)")
+    parser.add_argument("--wal", metavar="DIR",
+                        help="log every state change to a write-ahead log under DIR and recover from it at startup")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, metavar="N",
+                        help="write an incremental checkpoint after N logged changes (default 1000)")
+    parser.add_argument("--snapshot", metavar="FILE",
+                        help="load friends, lists and pictures from a binary snapshot (if it exists) and save to it at end")
+    parser.add_argument("--audit-index", metavar="DIR",
+                        help="also write the audit log as indexed JSON lines segments under DIR (see audit_index.py)")
+    parser.add_argument("--audit-retention-days", type=float, metavar="DAYS",
+                        help="drop indexed audit segments older than DAYS (default: keep them all)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="parse commands ahead on a separate thread and write picture files in I/O worker processes "
+                             "(the output is identical to sequential mode)")
+    parser.add_argument("--io-workers", type=int, default=2, metavar="N",
+                        help="I/O worker processes used with --pipeline (default 2)")
+    parser.add_argument("--audit-flush", choices=Logger.FLUSH_POLICIES, default="count",
+                        help="when audit.txt is written: every line, every --audit-flush-every lines (default), every "
+                             "--audit-flush-interval seconds, or only at end")
+    parser.add_argument("--audit-flush-every", type=int, default=512, metavar="N",
+                        help="lines buffered before a count flush (default 512)")
+    parser.add_argument("--audit-flush-interval", type=float, default=1.0, metavar="SECONDS",
+                        help="seconds between time flushes (default 1)")
+    parser.add_argument("--audit-max-bytes", type=int, metavar="BYTES",
+                        help="rotate audit.txt to audit.txt.1, .2, ... once it grows past BYTES")
+    parser.add_argument("--audit-backups", type=int, default=5, metavar="N",
+                        help="rotated audit files kept (default 5)")
+    parser.add_argument("--audit-sync", action="store_true", help="fsync audit.txt after every write")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write the command counters and latency histograms to FILE (Prometheus text format) at end")
+    parser.add_argument("--profile", metavar="FILE", help="run under cProfile and dump the stats to FILE")
+    parser.add_argument("--tracemalloc", type=int, default=0, metavar="N",
+                        help="trace allocations and print the top N allocation sites to stderr at exit")
+    args = parser.parse_args()
 
     # Create an instance of the MyFacebook class
-    facebook = MyFacebook()
+    facebook = MyFacebook(comment_store_dir=args.comment_store, wal_dir=args.wal,
+                          checkpoint_every=args.checkpoint_every, audit_index_dir=args.audit_index,
+                          audit_retention_days=args.audit_retention_days, snapshot=args.snapshot,
+                          comment_cache_bytes=int(args.comment_cache_mb * 1024 * 1024),
+                          io_workers=args.io_workers if args.pipeline else 0, audit_flush_policy=args.audit_flush,
+                          audit_flush_every=args.audit_flush_every, audit_flush_interval=args.audit_flush_interval,
+                          audit_max_bytes=args.audit_max_bytes, audit_backup_count=args.audit_backups,
+                          audit_sync=args.audit_sync, metrics_path=args.metrics)
 
     # Run the instructions/commands by passing the provided command file as an argument
-    facebook.run(sys.argv[1])
\ No newline at end of file
+    with profiling(args.profile, args.tracemalloc):
+        facebook.run(args.commands_file)
\ No newline at end of file
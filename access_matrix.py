@@ -0,0 +1,164 @@
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is only needed for bulk access audits
+    np = None
+
+from picture_management import ACCESS_BITS
+
+# Pictures evaluated per block, so the temporary arrays stay small however many pictures there are
+BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("the access matrix needs NumPy (pip install numpy)")
+
+
+class AccessMatrix:
+    def __init__(self, friends, pictures, read, write):
+        # Friend and picture names in matrix order, and the read and write bitsets: one row per picture,
+        # with bit f of the row (np.packbits order) set when friend f is granted the operation
+        self.friends = friends
+        self.pictures = pictures
+        self.read = read
+        self.write = write
+
+        # Positions of the names, for single lookups
+        self.friend_index = {name: index for index, name in enumerate(friends)}
+        self.picture_index = {name: index for index, name in enumerate(pictures)}
+
+    @classmethod
+    def build(cls, friends_manager, list_manager, picture_manager, read_out=None, write_out=None):
+        # Evaluate every friend against every picture with the owner, list and others rules of check_access
+        require_numpy()
+        friends = list(friends_manager.friends)
+        friend_index = {name: index for index, name in enumerate(friends)}
+        friend_bytes = (len(friends) + 7) // 8
+        table = picture_manager.pictures
+
+        # Map every interned owner/list string of the picture table to a friend index and a list row
+        owner_lookup = np.full(len(table.strings) + 1, -1, dtype=np.int64)
+        list_lookup = np.full(len(table.strings) + 1, -1, dtype=np.int64)
+        list_names = []
+        for string_id, name in enumerate(table.strings):
+            owner_lookup[string_id] = friend_index.get(name, -1)
+            if name != 'nil' and name in list_manager.lists:
+                list_lookup[string_id] = len(list_names)
+                list_names.append(name)
+
+        # List-membership mask: one packed bitset of friends per list
+        membership = np.zeros((max(len(list_names), 1), friend_bytes), dtype=np.uint8)
+        for row, list_name in enumerate(list_names):
+            members = [friend_index[name] for name in list_manager.members_of(list_name) if name in friend_index]
+            if members:
+                bits = np.zeros(len(friends), dtype=bool)
+                bits[members] = True
+                membership[row] = np.packbits(bits)
+
+        owners = owner_lookup[np.frombuffer(table.owners, dtype=np.uint32)] if len(table) else owner_lookup[:0]
+        lists = list_lookup[np.frombuffer(table.lists, dtype=np.uint32)] if len(table) else list_lookup[:0]
+        modes = np.frombuffer(bytes(table.modes), dtype=np.uint8)
+
+        matrices = {}
+        for operation, out in (('r', read_out), ('w', write_out)):
+            matrices[operation] = cls._evaluate(operation, owners, lists, modes, membership, len(friends), out)
+
+        return cls(friends, list(table.names), matrices['r'], matrices['w'])
+
+    @staticmethod
+    def _evaluate(operation, owners, lists, modes, membership, friend_count, out=None):
+        owner_bit, list_bit, others_bit = ACCESS_BITS[operation]
+        friend_bytes = membership.shape[1]
+        matrix = out if out is not None else np.zeros((len(modes), friend_bytes), dtype=np.uint8)
+
+        # Bits past the last friend in the final byte must stay clear
+        tail = friend_count % 8
+        last_byte_mask = np.uint8((0xFF << (8 - tail)) & 0xFF) if tail else np.uint8(0xFF)
+
+        block = max(1, BLOCK_BYTES // max(friend_bytes, 1))
+        for start in range(0, len(modes), block):
+            stop = min(start + block, len(modes))
+            block_modes = modes[start:stop]
+            rows = np.zeros((stop - start, friend_bytes), dtype=np.uint8)
+
+            # List mask: the members of the picture's list, when the list permission grants the operation
+            by_list = ((block_modes & list_bit) != 0) & (lists[start:stop] >= 0)
+            rows[by_list] = membership[lists[start:stop][by_list]]
+
+            # Others mask: every friend, when the others permission grants the operation
+            by_others = (block_modes & others_bit) != 0
+            rows[by_others] = 0xFF
+            if friend_bytes:
+                rows[:, -1] &= last_byte_mask
+
+            # Owner mask: the owner's bit, when the owner permission grants the operation
+            by_owner = ((block_modes & owner_bit) != 0) & (owners[start:stop] >= 0)
+            picture_rows = np.nonzero(by_owner)[0]
+            owner_indexes = owners[start:stop][by_owner]
+            np.bitwise_or.at(rows, (picture_rows, owner_indexes >> 3),
+                             (0x80 >> (owner_indexes & 7)).astype(np.uint8))
+
+            matrix[start:stop] = rows
+
+        return matrix
+
+    def allowed(self, friend_name, picture_name, operation):
+        # Look up a single cell of the matrix
+        row = self.picture_index[picture_name]
+        friend = self.friend_index[friend_name]
+        matrix = self.read if operation == 'r' else self.write
+        return bool(matrix[row, friend >> 3] & (0x80 >> (friend & 7)))
+
+    def dense(self, operation):
+        # Return the friends x pictures boolean matrix for one operation (only sensible for small profiles)
+        matrix = self.read if operation == 'r' else self.write
+        return np.unpackbits(matrix, axis=1, count=len(self.friends)).astype(bool).T
+
+    def save_csv(self, filename, friends_per_block=1024):
+        # Write one row per friend and one column per picture, each cell being rw, r-, -w or --
+        cells = np.array(['--', '-w', 'r-', 'rw'])
+        with open(filename, 'w') as f:
+            f.write("friend," + ",".join(self.pictures) + "\n")
+            for first in range(0, len(self.friends), friends_per_block):
+                byte_start, byte_stop = first // 8, (first + friends_per_block + 7) // 8
+                count = min(friends_per_block, len(self.friends) - first)
+                read = np.unpackbits(self.read[:, byte_start:byte_stop], axis=1, count=count).T
+                write = np.unpackbits(self.write[:, byte_start:byte_stop], axis=1, count=count).T
+                codes = read.astype(np.uint8) * 2 + write
+                for offset, row in enumerate(codes):
+                    f.write(self.friends[first + offset] + "," + ",".join(cells[row]) + "\n")
+
+    def save_npy(self, filename):
+        # Write both bitsets as one (2, pictures, friend bytes) array, read first, plus the names alongside
+        np.save(filename, np.stack((self.read, self.write)))
+        with open(labels_path(filename), 'w') as f:
+            f.write(" ".join(self.friends) + "\n")
+            f.write(" ".join(self.pictures) + "\n")
+
+
+def labels_path(filename):
+    # Friend and picture names for an .npy export live next to it
+    return os.path.splitext(filename)[0] + ".labels.txt"
+
+
+def export_access_matrix(filename, friends_manager, list_manager, picture_manager):
+    # Build the access matrix and write it as CSV or .npy depending on the file extension
+    require_numpy()
+    if filename.endswith(".npy"):
+        # Write straight into a memory-mapped .npy so very large matrices never have to fit in memory
+        friend_bytes = (len(friends_manager.friends) + 7) // 8
+        shape = (2, len(picture_manager.pictures), friend_bytes)
+        out = np.lib.format.open_memmap(filename, mode='w+', dtype=np.uint8, shape=shape)
+        matrix = AccessMatrix.build(friends_manager, list_manager, picture_manager, out[0], out[1])
+        out.flush()
+        with open(labels_path(filename), 'w') as f:
+            f.write(" ".join(matrix.friends) + "\n")
+            f.write(" ".join(matrix.pictures) + "\n")
+        return matrix
+
+    matrix = AccessMatrix.build(friends_manager, list_manager, picture_manager)
+    matrix.save_csv(filename)
+    return matrix
@@ -0,0 +1,244 @@
+import argparse
+import atexit
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+# Indexed fields and the record keys they index (the friend index is by viewer)
+INDEXED_FIELDS = {"friend": "viewer", "instruction": "instruction", "picture": "picture", "list": "list",
+                  "outcome": "outcome"}
+
+# Relative times accepted by the query CLI, e.g. 7d or 12h
+RELATIVE_TIME = re.compile(r"^(\d+(?:\.\d+)?)([smhdw])$")
+UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+class AuditStore:
+    def __init__(self, directory="audit", segment_records=100000, retention_days=None, max_segments=None):
+        # Initialize AuditStore with a directory of JSON lines segments, each sealed with a sidecar index
+        self.directory = directory
+        self.segment_records = segment_records
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Old segments are kept across runs until they fall out of the retention window (None keeps them all)
+        self.retention_days = retention_days
+        self.max_segments = max_segments
+        self.apply_retention()
+
+        # Continue the newest segment if it was never sealed (the previous run stopped early), else start a new one
+        segments = segment_numbers(self.directory)
+        if segments and not os.path.exists(index_path(self.directory, segments[-1])):
+            self._segment = segments[-1]
+            self._index, end = build_index(segment_path(self.directory, self._segment))
+            os.truncate(segment_path(self.directory, self._segment), end)
+        else:
+            self._segment = segments[-1] + 1 if segments else 0
+            self._index = new_index()
+        self._active = open(segment_path(self.directory, self._segment), 'ab')
+
+        # Make sure the buffered records and the index reach the disk even if the run never issues end
+        atexit.register(self.close)
+
+    def append(self, viewer, instruction, picture, list_name, outcome, message):
+        # Append one structured audit record and index it by friend, instruction, picture, list and outcome
+        record = {"ts": time.time(), "viewer": viewer, "instruction": instruction, "picture": picture,
+                  "list": list_name, "outcome": outcome, "message": message}
+        offset = self._active.tell()
+        self._active.write(json.dumps(record).encode() + b"\n")
+        add_to_index(self._index, record, offset)
+
+        # Seal the segment once it holds enough records
+        if self._index["count"] >= self.segment_records:
+            self._seal()
+            self._segment += 1
+            self._index = new_index()
+            self._active = open(segment_path(self.directory, self._segment), 'ab')
+            self.apply_retention()
+
+    def flush(self):
+        if self._active is not None:
+            self._active.flush()
+
+    def close(self):
+        # Seal the active segment (an empty one is simply removed)
+        if self._active is None:
+            return
+
+        if self._index["count"]:
+            self._seal()
+        else:
+            self._active.close()
+            os.remove(segment_path(self.directory, self._segment))
+        self._active = None
+
+        atexit.unregister(self.close)
+
+    def apply_retention(self):
+        # Drop the oldest sealed segments past max_segments or older than retention_days
+        segments = [segment for segment in segment_numbers(self.directory)
+                    if os.path.exists(index_path(self.directory, segment))]
+        expired = []
+        if self.max_segments is not None and len(segments) > self.max_segments:
+            expired = segments[:len(segments) - self.max_segments]
+        if self.retention_days is not None:
+            cutoff = time.time() - self.retention_days * 86400
+            expired += [segment for segment in segments[len(expired):]
+                        if load_index(self.directory, segment)["max_ts"] < cutoff]
+
+        for segment in expired:
+            os.remove(index_path(self.directory, segment))
+            os.remove(segment_path(self.directory, segment))
+
+    def _seal(self):
+        # Close the active segment and publish its index atomically
+        self._active.close()
+        path = index_path(self.directory, self._segment)
+        with open(path + ".tmp", 'w') as file:
+            json.dump(self._index, file)
+        os.replace(path + ".tmp", path)
+
+
+def new_index():
+    # Record count, timestamp range and, per indexed field, the byte offsets of the records with each value
+    return {"count": 0, "min_ts": None, "max_ts": None, "fields": {field: {} for field in INDEXED_FIELDS}}
+
+
+def add_to_index(index, record, offset):
+    index["count"] += 1
+    if index["min_ts"] is None:
+        index["min_ts"] = record["ts"]
+    index["max_ts"] = record["ts"]
+
+    for field, key in INDEXED_FIELDS.items():
+        value = record[key]
+        if value is not None:
+            index["fields"][field].setdefault(value, []).append(offset)
+
+
+def build_index(path):
+    # Rebuild the index of a segment that was never sealed; return it with the size of its complete records,
+    # so a torn last line can be ignored (or truncated away before appending)
+    index = new_index()
+    offset = 0
+    with open(path, 'rb') as file:
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            add_to_index(index, record, offset)
+            offset += len(line)
+    return index, offset
+
+
+def load_index(directory, segment):
+    with open(index_path(directory, segment), 'r') as file:
+        return json.load(file)
+
+
+def segment_path(directory, segment):
+    return os.path.join(directory, f"segment-{segment:06d}.jsonl")
+
+
+def index_path(directory, segment):
+    return os.path.join(directory, f"segment-{segment:06d}.idx.json")
+
+
+def segment_numbers(directory):
+    # Return the numbers of the existing segment files in ascending order
+    return sorted(int(name[8:14]) for name in os.listdir(directory)
+                  if name.startswith("segment-") and name.endswith(".jsonl"))
+
+
+def query(directory, since=None, until=None, **filters):
+    # Yield the records matching every given field filter (friend, instruction, picture, list, outcome) and the
+    # time range. Segments outside the range are skipped and only the indexed offsets of a segment are read
+    filters = {field: value for field, value in filters.items() if value is not None}
+    for field in filters:
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Unknown audit field: {field}")
+
+    for segment in segment_numbers(directory):
+        try:
+            index = load_index(directory, segment)
+        except FileNotFoundError:
+            # The segment is still being written (or was never sealed): index it on the fly
+            index = build_index(segment_path(directory, segment))[0]
+
+        if not index["count"]:
+            continue
+        if (since is not None and index["max_ts"] < since) or (until is not None and index["min_ts"] > until):
+            continue
+
+        # Intersect the offset lists of the filters, smallest first
+        offsets = None
+        for field, value in sorted(filters.items(), key=lambda item: len(index["fields"][item[0]].get(item[1], ()))):
+            matches = index["fields"][field].get(value, ())
+            offsets = set(matches) if offsets is None else offsets.intersection(matches)
+            if not offsets:
+                break
+        if offsets is not None and not offsets:
+            continue
+
+        with open(segment_path(directory, segment), 'rb') as file:
+            lines = iter(file) if offsets is None else read_lines_at(file, sorted(offsets))
+
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if (since is None or record["ts"] >= since) and (until is None or record["ts"] <= until):
+                    yield record
+
+
+def read_lines_at(file, offsets):
+    # Yield the lines starting at the given byte offsets
+    for offset in offsets:
+        file.seek(offset)
+        yield file.readline()
+
+
+def parse_time(text, now=None):
+    # Accept epoch seconds, an ISO date/time, or a time relative to now such as 7d, 12h or 30m
+    if text is None:
+        return None
+
+    match = RELATIVE_TIME.match(text)
+    if match:
+        return (now if now is not None else time.time()) - float(match.group(1)) * UNIT_SECONDS[match.group(2)]
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).timestamp()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the indexed audit log written with access.py --audit-index")
+    parser.add_argument("directory", help="audit index directory")
+    parser.add_argument("--friend", help="viewer who issued the command")
+    parser.add_argument("--instruction")
+    parser.add_argument("--picture")
+    parser.add_argument("--list")
+    parser.add_argument("--outcome", help="e.g. success, denied_read, denied_write, not_profile_owner")
+    parser.add_argument("--since", help="epoch seconds, ISO date/time, or relative such as 7d or 12h")
+    parser.add_argument("--until", help="epoch seconds, ISO date/time, or relative such as 7d or 12h")
+    parser.add_argument("--limit", type=int, help="stop after N records")
+    parser.add_argument("--json", action="store_true", help="print the raw JSON records")
+    args = parser.parse_args()
+
+    records = query(args.directory, parse_time(args.since), parse_time(args.until), friend=args.friend,
+                    instruction=args.instruction, picture=args.picture, list=args.list, outcome=args.outcome)
+    for number, record in enumerate(records):
+        if args.limit is not None and number >= args.limit:
+            break
+        if args.json:
+            print(json.dumps(record))
+        else:
+            timestamp = datetime.fromtimestamp(record["ts"]).isoformat(timespec="seconds")
+            print(f"{timestamp} {record['viewer'] or '-'} {record['instruction']} {record['outcome']}: "
+                  f"{record['message']}")
@@ -0,0 +1,80 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from access import MyFacebook
+
+
+def run_script(job):
+    # Worker: run one command file as an independent profile in its own working directory
+    index, script, work_root = job
+    workdir = os.path.join(work_root, f"{index:06d}")
+
+    # A directory kept (--keep) by an earlier run with the same work directory is replaced
+    if os.path.exists(workdir):
+        shutil.rmtree(workdir)
+    os.makedirs(workdir)
+
+    facebook = MyFacebook(state_dir=workdir)
+    with open(os.path.join(workdir, "stdout.txt"), 'w') as stdout:
+        facebook.output = lambda message: stdout.write(f"{message}\n")
+        try:
+            facebook.run(script)
+        except SystemExit:
+            # end saves the state and exits; in a worker that just finishes this script
+            pass
+        facebook.close()
+
+    return workdir
+
+
+def run_batch(scripts, merged_audit, workers=None, work_root=None, keep=False, merged_stdout=None):
+    # Run many command files across a process pool and merge their audit logs in input order
+    created_root = work_root is None
+    work_root = work_root or tempfile.mkdtemp(prefix="myfacebook-batch-")
+    os.makedirs(work_root, exist_ok=True)
+
+    jobs = [(index, os.path.abspath(script), work_root) for index, script in enumerate(scripts)]
+    chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 8))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(merged_audit, 'w') as audit_out:
+        stdout_out = open(merged_stdout, 'w') if merged_stdout else None
+        try:
+            # map yields results in input order, so the merged output does not depend on scheduling
+            for script, workdir in zip(scripts, pool.map(run_script, jobs, chunksize=chunksize)):
+                audit_out.write(f"==> {script} <==\n")
+                with open(os.path.join(workdir, "audit.txt"), 'r') as audit:
+                    shutil.copyfileobj(audit, audit_out)
+
+                if stdout_out is not None:
+                    stdout_out.write(f"==> {script} <==\n")
+                    with open(os.path.join(workdir, "stdout.txt"), 'r') as stdout:
+                        shutil.copyfileobj(stdout, stdout_out)
+
+                if not keep:
+                    shutil.rmtree(workdir)
+        finally:
+            if stdout_out is not None:
+                stdout_out.close()
+
+    if created_root and not keep:
+        shutil.rmtree(work_root, ignore_errors=True)
+    return len(scripts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay many command files in parallel, one profile each")
+    parser.add_argument("scripts", nargs="+", help="command files (each runs as an independent profile)")
+    parser.add_argument("--audit", default="merged_audit.txt", help="merged audit log to write")
+    parser.add_argument("--stdout", metavar="FILE", help="also merge the printed output of every script into FILE")
+    parser.add_argument("--workers", type=int, help="worker processes (defaults to the number of cores)")
+    parser.add_argument("--work-dir", help="directory for the per-script working directories")
+    parser.add_argument("--keep", action="store_true", help="keep the per-script working directories")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = run_batch(args.scripts, args.audit, args.workers, args.work_dir, args.keep, args.stdout)
+    print(f"Ran {count} command files in {time.perf_counter() - start:.2f}s; merged audit log written to {args.audit}")
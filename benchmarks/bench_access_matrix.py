@@ -0,0 +1,81 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Make the project modules importable when running from the benchmarks directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from access_matrix import AccessMatrix
+from friend_management import FriendManager
+from list_management import ListManager
+from picture_management import PictureManager
+
+PERMISSIONS = ("rw", "r-", "-w", "--")
+
+
+def build_profile(directory, friends, pictures, lists, list_size, seed):
+    # Build a profile with random lists, owners and permissions, without going through the command engine
+    rng = random.Random(seed)
+    friend_manager = FriendManager(os.path.join(directory, "friends.txt"))
+    list_manager = ListManager(os.path.join(directory, "lists.txt"))
+    picture_manager = PictureManager(os.path.join(directory, "pictures.txt"), directory=directory)
+
+    for i in range(friends):
+        friend_manager.add_friend(f"friend{i}")
+    for i in range(lists):
+        list_manager.set_list(f"list{i}", (f"friend{rng.randrange(friends)}" for _ in range(list_size)))
+    list_names = list(list_manager.lists) + ["nil"]
+    for i in range(pictures):
+        picture_manager.set_picture(f"picture{i}.txt", f"friend{rng.randrange(friends)}", rng.choice(list_names),
+                                    [rng.choice(PERMISSIONS) for _ in range(3)])
+
+    return friend_manager, list_manager, picture_manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the vectorized access matrix against per-pair checks")
+    parser.add_argument("--friends", type=int, default=100000)
+    parser.add_argument("--pictures", type=int, default=100000)
+    parser.add_argument("--lists", type=int, default=100)
+    parser.add_argument("--list-size", type=int, default=1000)
+    parser.add_argument("--sample", type=int, default=200000,
+                        help="friend/picture pairs timed with check_access to extrapolate the per-pair cost")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        managers = build_profile(directory, args.friends, args.pictures, args.lists, args.list_size, args.seed)
+        friend_manager, list_manager, picture_manager = managers
+
+        start = time.perf_counter()
+        matrix = AccessMatrix.build(*managers)
+        elapsed = time.perf_counter() - start
+        cells = args.friends * args.pictures
+        print(f"matrix     {args.friends} friends x {args.pictures} pictures: {elapsed:.2f}s "
+              f"({cells / elapsed / 1e6:.0f}M cells/s, {(matrix.read.nbytes + matrix.write.nbytes) / 2 ** 20:.0f} MB)")
+
+        # Per-pair evaluation of a random sample, extrapolated to the whole matrix
+        rng = random.Random(args.seed)
+        friends = list(friend_manager.friends)
+        pairs = [(rng.choice(friends), f"picture{rng.randrange(args.pictures)}.txt") for _ in range(args.sample)]
+        start = time.perf_counter()
+        for friend, picture in pairs:
+            picture_manager._evaluate_access(picture_manager.pictures.rows[picture], friend, 'r', list_manager)
+            picture_manager._evaluate_access(picture_manager.pictures.rows[picture], friend, 'w', list_manager)
+        per_pair = (time.perf_counter() - start) / args.sample
+        print(f"per pair   {per_pair * 1e6:.2f}us per friend/picture pair, about {per_pair * cells / 3600:.1f}h "
+              f"for the whole matrix")
+
+        # Spot-check the sample against the matrix
+        for friend, picture in pairs[:10000]:
+            for operation in ('r', 'w'):
+                row = picture_manager.pictures.rows[picture]
+                expected = picture_manager._evaluate_access(row, friend, operation, list_manager)
+                assert matrix.allowed(friend, picture, operation) == expected, (friend, picture, operation)
+
+
+if __name__ == "__main__":
+    main()
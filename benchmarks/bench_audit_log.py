@@ -0,0 +1,59 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Make the project modules importable when running from the benchmarks directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from log import Logger
+
+
+def per_line_writes(filename, actions):
+    # The original Logger.log_action: open, append one line and close for every action
+    open(filename, 'w').close()
+    for action in actions:
+        with open(filename, 'a') as f:
+            f.write(f"{action}\n")
+
+
+def buffered_writes(filename, actions, policy):
+    # The buffered writer, including the final flush done by MyFacebook.end
+    logger = Logger(filename, flush_policy=policy)
+    for action in actions:
+        logger.log_action(action)
+    logger.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-line audit writes with the buffered audit writer")
+    parser.add_argument("--actions", type=int, default=200000, help="number of audit lines to write")
+    args = parser.parse_args()
+
+    # Audit lines shaped like the ones MyFacebook produces during a replay
+    actions = [f"Friend friend{i % 1000} wrote to picture{i % 50}.txt: comment number {i}" for i in range(args.actions)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "audit.txt")
+
+        runs = [("per-line (baseline)", lambda: per_line_writes(filename, actions))]
+        for policy in Logger.FLUSH_POLICIES:
+            runs.append((f"buffered ({policy})", lambda policy=policy: buffered_writes(filename, actions, policy)))
+
+        baseline = None
+        for name, run in runs:
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+
+            # Every variant must produce the same audit file
+            with open(filename) as f:
+                assert sum(1 for _ in f) == len(actions), f"{name} lost audit lines"
+
+            baseline = baseline or elapsed
+            print(f"{name:<22} {elapsed:8.3f}s  {len(actions) / elapsed:12.0f} lines/s  {baseline / elapsed:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
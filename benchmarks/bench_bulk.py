@@ -0,0 +1,86 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Make the project modules importable when running from the benchmarks directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from access import MyFacebook
+
+
+def per_line_script(friends, pictures):
+    # One friendadd, friendlist and chmod line per entity
+    yield "friendadd owner"
+    yield "viewby owner"
+    yield "listadd everyone"
+    for i in range(pictures):
+        yield f"postpicture picture{i}.txt"
+    for i in range(friends):
+        yield f"friendadd friend{i}"
+    for i in range(friends):
+        yield f"friendlist friend{i} everyone"
+    for i in range(pictures):
+        yield f"chmod picture{i}.txt rw r- --"
+
+
+def bulk_script(names_file, pictures):
+    # The same onboarding with bulk and pattern commands
+    yield "friendadd owner"
+    yield "viewby owner"
+    yield "listadd everyone"
+    for i in range(pictures):
+        yield f"postpicture picture{i}.txt"
+    yield f"friendadd @{names_file}"
+    yield f"friendlist @{names_file} everyone"
+    yield "chmod picture*.txt rw r- --"
+
+
+def run(commands, directory, wal):
+    # Execute a script in a fresh profile and return the elapsed time and its audit log
+    facebook = MyFacebook(state_dir=directory, wal_dir=os.path.join(directory, "wal") if wal else None)
+    facebook.output = lambda message: None
+    commands = list(commands)
+
+    start = time.perf_counter()
+    for command in commands:
+        facebook.execute_command(command)
+    facebook.save()
+    elapsed = time.perf_counter() - start
+
+    facebook.close()
+    with open(os.path.join(directory, "audit.txt")) as file:
+        audit_lines = sum(1 for _ in file)
+    with open(os.path.join(directory, "lists.txt")) as file:
+        members = len(file.read().split()) - 1
+    return elapsed, audit_lines, members
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bulk onboarding of many friends with one command per friend")
+    parser.add_argument("--friends", type=int, default=100000)
+    parser.add_argument("--pictures", type=int, default=1000)
+    parser.add_argument("--wal", action="store_true", help="also write the write-ahead log")
+    args = parser.parse_args()
+
+    results = {}
+    for label in ("per line", "bulk"):
+        with tempfile.TemporaryDirectory() as directory:
+            if label == "bulk":
+                names_file = os.path.join(directory, "names.txt")
+                with open(names_file, 'w') as file:
+                    file.writelines(f"friend{i}\n" for i in range(args.friends))
+                commands = bulk_script(names_file, args.pictures)
+            else:
+                commands = per_line_script(args.friends, args.pictures)
+            results[label] = run(commands, directory, args.wal)
+
+        elapsed, audit_lines, members = results[label]
+        print(f"{label:<9} {elapsed:8.3f}s  {audit_lines:>7} audit lines  {members} list members")
+
+    print(f"bulk speedup: {results['per line'][0] / results['bulk'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
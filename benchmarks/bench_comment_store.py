@@ -0,0 +1,69 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Make the project modules importable when running from the benchmarks directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from comment_store import CommentStore
+from list_management import ListManager
+from picture_management import PictureManager
+
+
+def time_read(read, repeat=20):
+    # Return the average latency and peak traced memory of a read
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        read()
+    elapsed = (time.perf_counter() - start) / repeat
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare comment reads from picture files and from the CommentStore")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000],
+                        help="number of comments on the picture")
+    parser.add_argument("--page", type=int, default=20, help="comments per page")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        list_manager = ListManager("lists.txt")
+        file_pictures = PictureManager("pictures.txt")
+        store = CommentStore("comments")
+        store_pictures = PictureManager("pictures.txt", store)
+
+        file_pictures.add_picture("popular.txt", "owner")
+        store_pictures.add_picture("popular.txt", "owner")
+
+        print(f"{'comments':>9} {'file full read':>15} {'file last page':>15} {'store last page':>16} "
+              f"{'file peak':>10} {'store peak':>11}")
+        written = 0
+        for size in args.sizes:
+            # Grow the picture to the next size in both storage modes
+            for i in range(written, size):
+                comment = f"comment {i} on a very popular picture"
+                file_pictures.write_comments("popular.txt", "owner", comment, list_manager)
+                store_pictures.write_comments("popular.txt", "owner", comment, list_manager)
+            written = size
+
+            full, _ = time_read(lambda: file_pictures.read_comments("popular.txt", "owner", list_manager))
+            file_page, file_peak = time_read(
+                lambda: file_pictures.read_comments("popular.txt", "owner", list_manager, -args.page))
+            store_page, store_peak = time_read(
+                lambda: store_pictures.read_comments("popular.txt", "owner", list_manager, -args.page))
+
+            print(f"{size:>9} {full * 1e3:>13.2f}ms {file_page * 1e3:>13.2f}ms {store_page * 1e3:>14.3f}ms "
+                  f"{file_peak / 1024:>8.0f}KB {store_peak / 1024:>9.1f}KB")
+
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import contextlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Make the project modules importable when running from the benchmarks directory
+sys.path.insert(0, ROOT)
+
+from metrics import Histogram
+from workload import MIXES, generate
+
+# Latency histogram buckets grow by 10% from 0.1us to about 17s, so percentiles are accurate to within 10% in
+# constant memory (finer than the buckets MyFacebook exports, since small regressions have to show up)
+LATENCY_BUCKETS = tuple(1e-7 * 1.1 ** index for index in range(200))
+
+
+def run_workload(mix, size, seed):
+    # Worker: replay a generated workload in a scratch directory and report throughput, latency and peak RSS
+    from access import MyFacebook
+
+    histograms = {}
+    with tempfile.TemporaryDirectory() as directory:
+        facebook = MyFacebook(state_dir=directory)
+        facebook.output = lambda message: None
+
+        start = time.perf_counter()
+        for command in generate(size, seed, MIXES[mix]):
+            begin = time.perf_counter()
+            facebook.execute_command(command)
+            elapsed = time.perf_counter() - begin
+
+            instruction = command.split(' ', 1)[0]
+            histogram = histograms.get(instruction)
+            if histogram is None:
+                histogram = histograms[instruction] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(elapsed)
+        total = time.perf_counter() - start
+
+        facebook.close()
+
+    return {
+        "mix": mix,
+        "commands": size,
+        "seconds": total,
+        "commands_per_second": size / total,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "latency_us": {
+            instruction: {
+                "count": histogram.count,
+                "mean": histogram.sum / histogram.count * 1e6,
+                "p50": histogram.percentile(0.50) * 1e6,
+                "p90": histogram.percentile(0.90) * 1e6,
+                "p99": histogram.percentile(0.99) * 1e6,
+            }
+            for instruction, histogram in sorted(histograms.items())
+        },
+    }
+
+
+def run_in_subprocess(mix, size, seed):
+    # Each mix runs in its own interpreter so peak RSS is measured per workload
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", "--mixes", mix,
+                             "--size", str(size), "--seed", str(seed)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def print_results(results, baseline, tolerance):
+    # Print a summary per mix, with the change from the baseline when one was given; return the regressions
+    regressions = []
+    for result in results:
+        mix = result["mix"]
+        print(f"\n[{mix}] {result['commands']} commands in {result['seconds']:.2f}s: "
+              f"{result['commands_per_second']:.0f} commands/s, peak RSS {result['peak_rss_kb'] / 1024:.1f} MB")
+
+        previous = (baseline or {}).get(mix)
+        if previous:
+            change = result["commands_per_second"] / previous["commands_per_second"] - 1
+            print(f"  throughput vs baseline: {change:+.1%}")
+            if change < -tolerance:
+                regressions.append(f"{mix} throughput {change:+.1%}")
+
+        print(f"  {'instruction':<14} {'count':>9} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9}  (us)")
+        for instruction, latency in result["latency_us"].items():
+            line = (f"  {instruction:<14} {latency['count']:>9} {latency['mean']:>9.1f} {latency['p50']:>9.1f} "
+                    f"{latency['p90']:>9.1f} {latency['p99']:>9.1f}")
+
+            old = (previous or {}).get("latency_us", {}).get(instruction)
+            if old:
+                change = latency["p99"] / old["p99"] - 1
+                line += f"  p99 {change:+.0%}"
+                if change > tolerance:
+                    regressions.append(f"{mix} {instruction} p99 {change:+.0%}")
+            print(line)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the command engine on synthetic workloads")
+    parser.add_argument("--size", type=int, default=100000, help="commands per workload (1K to 10M)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mixes", nargs="+", default=["friends", "lists", "pictures", "default"],
+                        choices=sorted(MIXES))
+    parser.add_argument("--save-baseline", metavar="FILE", help="save the results as a baseline")
+    parser.add_argument("--baseline", metavar="FILE", help="compare the results with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative slowdown reported as a regression (default 0.10)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = run_workload(args.mixes[0], args.size, args.seed)
+        print(json.dumps(result))
+        return
+
+    results = [run_in_subprocess(mix, args.size, args.seed) for mix in args.mixes]
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = {result["mix"]: result for result in json.load(file)}
+
+    regressions = print_results(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if regressions:
+        print("\nRegressions: " + ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import os
+import sys
+import time
+
+# Make the project modules importable when running from the benchmarks directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from friend_management import FriendRegistry
+
+
+def time_lookups(friends, names):
+    # Time membership checks the way friend_add/view_by/friend_list/change_owner do them
+    start = time.perf_counter()
+    for name in names:
+        name in friends
+    return (time.perf_counter() - start) / len(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare friend membership checks on a list and on FriendRegistry")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--lookups", type=int, default=200, help="membership checks per size")
+    args = parser.parse_args()
+
+    print(f"{'friends':>9} {'list add':>10} {'registry add':>13} {'list in':>12} {'registry in':>12}")
+    for size in args.sizes:
+        names = [f"friend{i}" for i in range(size)]
+
+        # Look up a mix of existing friends (late in insertion order) and missing names
+        probes = [names[-1 - i % size] if i % 2 else f"stranger{i}" for i in range(args.lookups)]
+
+        start = time.perf_counter()
+        friends_list = list(names)
+        list_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        registry = FriendRegistry(names)
+        registry_build = time.perf_counter() - start
+
+        list_lookup = time_lookups(friends_list, probes)
+        registry_lookup = time_lookups(registry, probes)
+
+        print(f"{size:>9} {list_build:>9.3f}s {registry_build:>12.3f}s "
+              f"{list_lookup * 1e6:>10.2f}us {registry_lookup * 1e6:>10.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Make the project modules importable when running from the benchmarks directory
+sys.path.insert(0, ROOT)
+
+from engine import Engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare one interpreter per script with a reused Engine")
+    parser.add_argument("script", nargs="?", default=os.path.join(ROOT, "testcase1.txt"))
+    parser.add_argument("--runs", type=int, default=1000, help="times the script is run with the engine")
+    parser.add_argument("--process-runs", type=int, default=50, help="times the script is run as a process")
+    args = parser.parse_args()
+
+    script = os.path.abspath(args.script)
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        for _ in range(args.process_runs):
+            subprocess.run([sys.executable, os.path.join(ROOT, "access.py"), script], cwd=directory, check=True,
+                           stdout=subprocess.DEVNULL)
+        per_process = (time.perf_counter() - start) / args.process_runs
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = Engine(directory)
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            engine.reset()
+            engine.execute_script(script)
+        per_engine = (time.perf_counter() - start) / args.runs
+        engine.close()
+
+    print(f"process per script  {per_process * 1000:8.2f}ms")
+    print(f"engine reset + run  {per_engine * 1000:8.2f}ms  ({per_process / per_engine:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Make the project modules importable when running from the benchmarks directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from list_management import ListManager
+
+
+def search_membership(list_manager, friend_name, list_name):
+    # Membership check without the closure: walk the nested lists
+    stack = [list_name]
+    seen = set()
+    while stack:
+        current = stack.pop()
+        if friend_name in list_manager.lists[current]:
+            return True
+        if current not in seen:
+            seen.add(current)
+            stack.extend(list_manager.sublists[current])
+    return False
+
+
+def deep(list_manager, depth, friends):
+    # A chain of lists, each nested in the next, with the friends in the innermost one
+    for level in range(depth):
+        list_manager.add_list(f"level{level}")
+        if level:
+            list_manager.add_list_to_list(f"level{level - 1}", f"level{level}")
+    for i in range(friends):
+        list_manager.add_friend_to_list(f"friend{i}", "level0")
+    return "level0", f"level{depth - 1}"
+
+
+def wide(list_manager, width, friends):
+    # One list holding width teams that share the friends between them
+    list_manager.add_list("org")
+    for team in range(width):
+        list_manager.add_list(f"team{team}")
+        for i in range(team, friends, width):
+            list_manager.add_friend_to_list(f"friend{i}", f"team{team}")
+        list_manager.add_list_to_list(f"team{team}", "org")
+    return "team0", "org"
+
+
+def measure(label, build, size, friends, lookups):
+    with tempfile.TemporaryDirectory() as directory:
+        list_manager = ListManager(os.path.join(directory, "lists.txt"))
+
+        start = time.perf_counter()
+        inner, outer = build(list_manager, size, friends)
+        built = time.perf_counter() - start
+
+        # Incremental update: a friend joins the innermost list and leaves it again
+        start = time.perf_counter()
+        list_manager.add_friend_to_list("newcomer", inner)
+        list_manager.remove_friend_from_list("newcomer", inner)
+        update = time.perf_counter() - start
+
+        names = [f"friend{i % friends}" for i in range(lookups)] + ["stranger"] * lookups
+        start = time.perf_counter()
+        for friend_name in names:
+            list_manager.friend_in_list(friend_name, outer)
+        closure = (time.perf_counter() - start) / len(names)
+
+        searched = names[:min(lookups, 100)] + ["stranger"] * min(lookups, 100)
+        start = time.perf_counter()
+        for friend_name in searched:
+            search_membership(list_manager, friend_name, outer)
+        search = (time.perf_counter() - start) / len(searched)
+
+        print(f"{label:<26} build {built:7.3f}s  join+leave {update * 1e3:8.3f}ms  "
+              f"friend_in_list {closure * 1e9:6.0f}ns  graph search {search * 1e6:9.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure nested lists with the incremental membership closure")
+    parser.add_argument("--depth", type=int, default=1000)
+    parser.add_argument("--width", type=int, default=1000)
+    parser.add_argument("--friends", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    measure(f"deep ({args.depth} levels)", deep, args.depth, args.friends, args.lookups)
+    measure(f"wide ({args.width} teams)", wide, args.width, args.friends, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+# Make the project modules importable when running from the benchmarks directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from picture_management import OWNER_READ, OWNER_WRITE, PictureTable
+
+
+def picture_rows(count, owners, lists):
+    # Generate (picture, owner, list) rows shaped like a large profile
+    for i in range(count):
+        yield f"picture{i}.txt", f"friend{i % owners}", f"list{i % lists}" if i % 3 else "nil"
+
+
+def dict_layout(count, owners, lists):
+    # The previous layout: one dict per picture holding a nested dict of permission strings
+    pictures = {}
+    for name, owner, list_name in picture_rows(count, owners, lists):
+        pictures[name] = {
+            'owner': owner,
+            'list': list_name,
+            'permissions': {'owner': 'rw', 'list': '--', 'others': '--'},
+        }
+    return pictures
+
+
+def table_layout(count, owners, lists):
+    # The compact PictureTable: interned ids and packed permission bits in parallel arrays
+    table = PictureTable()
+    for name, owner, list_name in picture_rows(count, owners, lists):
+        table.set(name, owner, list_name, OWNER_READ | OWNER_WRITE)
+    return table
+
+
+def names_only(count, owners, lists):
+    # Just the picture name strings, which both layouts have to keep
+    return [name for name, _, _ in picture_rows(count, owners, lists)]
+
+
+def measure(build, *args):
+    # Return the bytes still allocated by the structure a builder returns
+    gc.collect()
+    tracemalloc.start()
+    structure = build(*args)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del structure
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bytes per picture of the dict layout and PictureTable")
+    parser.add_argument("--pictures", type=int, default=1000000)
+    parser.add_argument("--owners", type=int, default=10000)
+    parser.add_argument("--lists", type=int, default=100)
+    args = parser.parse_args()
+
+    names = measure(names_only, args.pictures, args.owners, args.lists)
+    for label, build in (("dict of dicts", dict_layout), ("PictureTable", table_layout)):
+        size = measure(build, args.pictures, args.owners, args.lists)
+        print(f"{label:<14} {size / 2 ** 20:8.1f} MB  {size / args.pictures:6.1f} bytes/picture  "
+              f"({(size - names) / args.pictures:6.1f} bytes/picture besides the name strings)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import filecmp
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_script(filename, pictures, comments, reads, seed):
+    # An I/O-heavy script: post pictures, then interleave comments and reads over them
+    rng = random.Random(seed)
+    with open(filename, 'w') as f:
+        f.write("friendadd owner\nviewby owner\n")
+        for picture in range(pictures):
+            f.write(f"postpicture picture{picture}.txt\n")
+        operations = ["w"] * comments + ["r"] * reads
+        rng.shuffle(operations)
+        for number, operation in enumerate(operations):
+            picture = rng.randrange(pictures)
+            if operation == "w":
+                f.write(f"writecomments picture{picture}.txt comment {number}\n")
+            else:
+                f.write(f"readcomments picture{picture}.txt last 3\n")
+        f.write("end\n")
+
+
+def run(script, directory, options):
+    # Run access.py on the script in its own state directory and return the wall time
+    os.makedirs(directory)
+    start = time.perf_counter()
+    with open(os.path.join(directory, "stdout.txt"), 'w') as stdout:
+        subprocess.run([sys.executable, os.path.join(ROOT, "access.py"), *options, script], cwd=directory,
+                       stdout=stdout, check=True)
+    return time.perf_counter() - start
+
+
+def identical(left, right):
+    # Compare every file the two runs wrote
+    names = sorted(set(os.listdir(left)) | set(os.listdir(right)))
+    _, mismatch, errors = filecmp.cmpfiles(left, right, names, shallow=False)
+    return not mismatch and not errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sequential and pipelined execution on an I/O-heavy script")
+    parser.add_argument("--pictures", type=int, nargs="+", default=[200, 20000],
+                        help="picture counts to try (few pictures means many comments per file)")
+    parser.add_argument("--comments", type=int, default=100000)
+    parser.add_argument("--reads", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--cache-mb", type=float, default=32, help="comment cache size (0 makes every read hit disk)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # Pipelining overlaps work across cores, so the speedup depends on how many there are
+    print(f"{os.cpu_count()} CPUs")
+    for pictures in args.pictures:
+        with tempfile.TemporaryDirectory() as directory:
+            script = os.path.join(directory, "script.txt")
+            write_script(script, pictures, args.comments, args.reads, args.seed)
+            options = ["--comment-cache-mb", str(args.cache_mb)]
+
+            print(f"{pictures} pictures, {args.comments} comments, {args.reads} reads")
+            sequential = run(script, os.path.join(directory, "sequential"), options)
+            print(f"  sequential            {sequential:7.2f}s")
+            for workers in args.workers:
+                name = f"pipeline-{workers}"
+                elapsed = run(script, os.path.join(directory, name),
+                              options + ["--pipeline", "--io-workers", str(workers)])
+                same = identical(os.path.join(directory, "sequential"), os.path.join(directory, name))
+                print(f"  pipeline {workers:2d} workers    {elapsed:7.2f}s  ({sequential / elapsed:.2f}x)  "
+                      f"output {'identical' if same else 'DIFFERS'}")
+
+if __name__ == "__main__":
+    main()
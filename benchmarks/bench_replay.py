@@ -0,0 +1,58 @@
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+# Make the project modules importable when running from the benchmarks directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from access import MyFacebook
+from replay import compile_script, load_program, replay
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_runs(run, runs):
+    # Run a replay on fresh MyFacebook instances and return the total time spent replaying
+    total = 0.0
+    for _ in range(runs):
+        facebook = MyFacebook()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            run(facebook)
+            total += time.perf_counter() - start
+        facebook.logger.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare text replay with compiled binary replay")
+    parser.add_argument("script", nargs="?", default=os.path.join(ROOT, "testcase1.txt"))
+    parser.add_argument("--runs", type=int, default=2000, help="number of replays of the script")
+    args = parser.parse_args()
+
+    script = os.path.abspath(args.script)
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+
+        # The script must not end the process while it is being benchmarked
+        with open(script) as source, open("script.txt", 'w') as target:
+            target.writelines(line for line in source if line.split()[:1] != ["end"])
+        compile_script("script.txt", "script.mfbr")
+
+        text = time_runs(lambda facebook: facebook.run("script.txt"), args.runs)
+
+        # Compiled scripts are decoded once and replayed many times
+        program = load_program("script.mfbr")
+        binary = time_runs(lambda facebook: replay(facebook, "script.mfbr", program), args.runs)
+
+        print(f"text replay    {text:8.3f}s for {args.runs} runs ({text / args.runs * 1e6:8.1f}us per run)")
+        print(f"binary replay  {binary:8.3f}s for {args.runs} runs ({binary / args.runs * 1e6:8.1f}us per run)"
+              f"  {text / binary:5.2f}x")
+        print(f"script size    {os.path.getsize('script.txt')} bytes text, {os.path.getsize('script.mfbr')} bytes compiled")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Make the project modules importable when running from the benchmarks directory
+sys.path.insert(0, ROOT)
+
+from server import send_command
+
+
+async def connect(socket_path):
+    # Wait for the server to start listening, then connect
+    for _ in range(100):
+        try:
+            return await asyncio.open_unix_connection(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            await asyncio.sleep(0.05)
+    raise RuntimeError(f"server did not start on {socket_path}")
+
+
+async def set_up(socket_path, clients, pictures):
+    # Create the profile owner, one friend per client, a list and some pictures everyone may read and write
+    reader, writer = await connect(socket_path)
+    commands = ["friendadd owner", "viewby owner", "listadd everyone"]
+    commands += [f"friendadd client{i}" for i in range(clients)]
+    commands += [f"friendlist client{i} everyone" for i in range(clients)]
+    for i in range(pictures):
+        commands += [f"postpicture picture{i}.txt", f"chlst picture{i}.txt everyone",
+                     f"chmod picture{i}.txt rw rw --"]
+    commands.append("logout")
+
+    for command in commands:
+        await send_command(reader, writer, command)
+    writer.close()
+
+
+async def client(socket_path, number, requests, pictures, write_ratio, latencies):
+    # One viewer session issuing a mix of readcomments and writecomments
+    reader, writer = await connect(socket_path)
+    await send_command(reader, writer, f"viewby client{number}")
+
+    rng = random.Random(number)
+    for i in range(requests):
+        picture = f"picture{rng.randrange(pictures)}.txt"
+        if rng.random() < write_ratio:
+            command = f"writecomments {picture} comment {i} from client{number}"
+        else:
+            command = f"readcomments {picture} last 5"
+
+        start = time.perf_counter()
+        await send_command(reader, writer, command)
+        latencies.append(time.perf_counter() - start)
+
+    await send_command(reader, writer, "logout")
+    writer.close()
+
+
+async def run_load(socket_path, args):
+    await set_up(socket_path, args.clients, args.pictures)
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(socket_path, i, args.requests, args.pictures, args.write_ratio, latencies)
+                           for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    percentile = lambda p: latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1e3
+    print(f"clients {args.clients}, requests {len(latencies)}, {elapsed:.2f}s")
+    print(f"throughput {len(latencies) / elapsed:10.0f} commands/s")
+    print(f"latency    p50 {percentile(0.50):.3f}ms  p99 {percentile(0.99):.3f}ms  max {latencies[-1] * 1e3:.3f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput and latency of the MyFacebook server")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent client sessions")
+    parser.add_argument("--requests", type=int, default=200, help="commands per client")
+    parser.add_argument("--pictures", type=int, default=20)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--comment-store", action="store_true", help="run the server with a comment store")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, "myfacebook.sock")
+        command = [sys.executable, os.path.join(ROOT, "server.py"), "--socket", socket_path]
+        if args.comment_store:
+            command += ["--comment-store", "comments"]
+
+        server = subprocess.Popen(command, cwd=directory, stdout=subprocess.DEVNULL)
+        try:
+            asyncio.run(run_load(socket_path, args))
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Make the project modules importable when running from the benchmarks directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from friend_management import FriendManager
+from list_management import ListManager
+from picture_management import OWNER_READ, OWNER_WRITE, PictureManager, read_pictures
+from snapshot import load_snapshot, save_snapshot
+
+
+def build_managers(directory, friends, pictures, lists):
+    # Build a profile directly in the managers, without going through the command engine
+    friend_manager = FriendManager(os.path.join(directory, "friends.txt"))
+    list_manager = ListManager(os.path.join(directory, "lists.txt"))
+    picture_manager = PictureManager(os.path.join(directory, "pictures.txt"), directory=directory)
+
+    for i in range(friends):
+        friend_manager.add_friend(f"friend{i}")
+    for i in range(lists):
+        list_manager.set_list(f"list{i}", (f"friend{j}" for j in range(i, friends, lists)))
+    for i in range(pictures):
+        picture_manager.pictures.set(f"picture{i}.txt", f"friend{i % friends}", f"list{i % lists}" if i % 3 else "nil",
+                                     OWNER_READ | OWNER_WRITE)
+    return friend_manager, list_manager, picture_manager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare loading pictures.txt with mapping a binary snapshot")
+    parser.add_argument("--friends", type=int, default=10000)
+    parser.add_argument("--pictures", type=int, default=1000000)
+    parser.add_argument("--lists", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        managers = build_managers(directory, args.friends, args.pictures, args.lists)
+        for manager in managers:
+            manager.save_to_file()
+        snapshot = os.path.join(directory, "state.mfbs")
+
+        start = time.perf_counter()
+        save_snapshot(snapshot, *managers)
+        print(f"write snapshot          {time.perf_counter() - start:8.3f}s  ({os.path.getsize(snapshot) / 2 ** 20:.1f} MB)")
+
+        # Parse pictures.txt the way PictureManager.load_from_file does
+        text_manager = PictureManager(os.path.join(directory, "scratch.txt"), directory=directory)
+        start = time.perf_counter()
+        for picture_name, owner, list_name, permissions in read_pictures(os.path.join(directory, "pictures.txt")):
+            text_manager.set_picture(picture_name, owner, list_name, permissions)
+        print(f"load pictures.txt       {time.perf_counter() - start:8.3f}s")
+        del text_manager
+
+        # Map the snapshot into fresh managers, then touch a few records
+        fresh = (FriendManager(os.path.join(directory, "f.txt")), ListManager(os.path.join(directory, "l.txt")),
+                 PictureManager(os.path.join(directory, "p.txt"), directory=directory))
+        start = time.perf_counter()
+        load_snapshot(snapshot, *fresh)
+        loaded = time.perf_counter() - start
+        print(f"load snapshot           {loaded * 1000:8.1f}ms")
+
+        picture_manager = fresh[2]
+        start = time.perf_counter()
+        for i in range(0, args.pictures, max(args.pictures // 1000, 1)):
+            picture_manager.owner_of(f"picture{i}.txt")
+        print(f"1000 picture lookups    {(time.perf_counter() - start) * 1000:8.1f}ms")
+
+        start = time.perf_counter()
+        picture_manager.accessible("friend0", 'r', fresh[1])
+        print(f"first accessible query  {time.perf_counter() - start:8.3f}s  (builds the access indexes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import atexit
+import mmap
+import os
+from array import array
+
+# Index log records start with an opcode, so no picture name can be mistaken for one:
+#   R <picture>                              the picture was (re)posted, forget its earlier records
+#   A <picture> <segment> <offset> <length>  a record was appended for the picture
+RESET = "R"
+APPEND = "A"
+
+# A record position packs the segment number into the high bits and the byte offset into the low bits
+OFFSET_BITS = 48
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+
+class CommentStore:
+    def __init__(self, directory="comments", segment_bytes=64 * 1024 * 1024):
+        # Initialize CommentStore with a directory holding append-only segment files and an offset index
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Per-picture index: record positions (segment and offset) and record lengths, in comment order
+        self.positions = {}
+        self.lengths = {}
+
+        # Read-only maps of the segments, remapped when a segment has grown past the mapped size
+        self._maps = {}
+
+        # Rebuild the index from the index log and continue appending to the newest segment
+        self.load_index()
+        segments = self._segment_numbers()
+        self._segment = segments[-1] if segments else 0
+        self._active = open(self._segment_path(self._segment), 'ab')
+        self._index_log = open(os.path.join(self.directory, "index.log"), 'a')
+        self._unflushed = False
+
+        # Make sure appended comments reach the disk even if the command file never issues end
+        atexit.register(self.close)
+
+    def create(self, picture_name, title):
+        # Start a new comment stream for a picture, with the picture title as its first record
+        self.positions[picture_name] = array('Q')
+        self.lengths[picture_name] = array('I')
+        self._index_log.write(f"{RESET} {picture_name}\n")
+        self.append(picture_name, title)
+
+    def append(self, picture_name, text):
+        # Append a record to the active segment and remember where it went
+        data = text.encode()
+
+        # Roll over to a new segment once the active one is full
+        offset = self._active.tell()
+        if offset and offset + len(data) > self.segment_bytes:
+            self._active.close()
+            self._segment += 1
+            self._active = open(self._segment_path(self._segment), 'ab')
+            offset = 0
+
+        # Records are newline terminated so segments stay readable as text
+        self._active.write(data + b"\n")
+        self._unflushed = True
+
+        self.positions[picture_name].append((self._segment << OFFSET_BITS) | offset)
+        self.lengths[picture_name].append(len(data))
+        self._index_log.write(f"{APPEND} {picture_name} {self._segment} {offset} {len(data)}\n")
+
+    def count(self, picture_name):
+        # Return the number of records (title plus comments) stored for a picture
+        return len(self.lengths[picture_name])
+
+    def read(self, picture_name, start=0, stop=None):
+        # Return records start..stop of a picture, reading only those records through mmap
+        if self._unflushed:
+            self.flush()
+
+        positions = self.positions[picture_name]
+        lengths = self.lengths[picture_name]
+        records = []
+        for index in range(*slice(start, stop).indices(len(lengths))):
+            position = positions[index]
+            segment = self._map(position >> OFFSET_BITS, (position & OFFSET_MASK) + lengths[index])
+            offset = position & OFFSET_MASK
+            records.append(segment[offset:offset + lengths[index]].decode())
+        return records
+
+    def flush(self):
+        # Push appended records and index entries to the operating system
+        self._active.flush()
+        self._index_log.flush()
+        self._unflushed = False
+
+    def close(self):
+        # Flush and close the segment, index log and maps
+        if self._active is None:
+            return
+
+        self.flush()
+        self._active.close()
+        self._index_log.close()
+        self._active = None
+
+        for segment_map, _ in self._maps.values():
+            segment_map.close()
+        self._maps.clear()
+
+        atexit.unregister(self.close)
+
+    def load_index(self):
+        # Load the offset index from the index log (one line per record, a reset when a picture is reposted)
+        try:
+            with open(os.path.join(self.directory, "index.log"), 'r') as file:
+                for line in file:
+                    parts = line.split()
+                    if parts[0] == RESET:
+                        self.positions[parts[1]] = array('Q')
+                        self.lengths[parts[1]] = array('I')
+                        continue
+
+                    picture_name, segment, offset, length = parts[1], int(parts[2]), int(parts[3]), int(parts[4])
+                    self.positions[picture_name].append((segment << OFFSET_BITS) | offset)
+                    self.lengths[picture_name].append(length)
+        except FileNotFoundError:
+            # Handle the case for a brand new store
+            pass
+
+    def _map(self, segment, needed):
+        # Return an mmap of the segment that covers at least the needed number of bytes
+        mapped = self._maps.get(segment)
+        if mapped is None or mapped[1] < needed:
+            if mapped is not None:
+                mapped[0].close()
+            with open(self._segment_path(segment), 'rb') as file:
+                size = os.fstat(file.fileno()).st_size
+                mapped = (mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ), size)
+            self._maps[segment] = mapped
+        return mapped[0]
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:06d}.log")
+
+    def _segment_numbers(self):
+        # Return the numbers of the existing segment files in ascending order
+        return sorted(int(name[8:14]) for name in os.listdir(self.directory)
+                      if name.startswith("segment-") and name.endswith(".log"))
@@ -0,0 +1,107 @@
+import glob
+import os
+import shutil
+
+from access import MyFacebook, stream_commands
+from wal import changed_entity
+
+
+class CommandResult:
+    def __init__(self, outcome, messages, affected):
+        # The outcome of a command (success or the first error outcome), the messages it reported and the
+        # (kind, name) of every friend, list, picture or owner it changed
+        self.outcome = outcome
+        self.messages = messages
+        self.affected = affected
+
+    def __repr__(self):
+        return f"CommandResult({self.outcome!r}, {self.messages!r}, {self.affected!r})"
+
+
+class Engine(MyFacebook):
+    def __init__(self, state_dir=".", **options):
+        # Initialize an embeddable engine keeping its state in state_dir; options are passed on to MyFacebook
+        os.makedirs(state_dir, exist_ok=True)
+        self.options = dict(options, state_dir=state_dir)
+        self.start()
+
+    def start(self):
+        # (Re)build the profile from the options, with nothing printed and no result being collected
+        MyFacebook.__init__(self, **self.options)
+        self.output = lambda message: None
+        self.ended = False
+        self._result = None
+
+    def execute(self, command):
+        # Execute one command and return its CommandResult
+        if self.ended:
+            raise RuntimeError("the engine has ended; call reset() to use it again")
+
+        self._result = result = CommandResult("success", [], [])
+        try:
+            self.run_commands("execute", [(command.split(), command)])
+        finally:
+            self._result = None
+
+        # Keep each changed entity once, in the order it was first changed
+        result.affected = list(dict.fromkeys(result.affected))
+        return result
+
+    def execute_script(self, filename):
+        # Execute every command of a script and return their results
+        return [self.execute(command) for command in stream_commands(filename)]
+
+    def reset(self):
+        # Start over with an empty profile in the same state directory, without a new process
+        self.close()
+        wal_dir = self.options.get("wal_dir")
+        if wal_dir:
+            for name in glob.glob(os.path.join(wal_dir, "checkpoint-*")) + glob.glob(os.path.join(wal_dir, "wal.log")):
+                os.remove(name)
+
+        # Drop the profile, whose names may still live in the snapshot map, then unmap and delete the snapshot
+        snapshot = self.mapped_snapshot
+        self.friends_manager = self.list_manager = self.picture_manager = self.mapped_snapshot = None
+        if snapshot is not None:
+            snapshot.close()
+        if self.snapshot and os.path.exists(self.snapshot):
+            os.remove(self.snapshot)
+
+        # The comment store would otherwise load the old comments again from its index log
+        comment_store_dir = self.options.get("comment_store_dir")
+        if comment_store_dir and os.path.exists(comment_store_dir):
+            shutil.rmtree(comment_store_dir)
+        self.start()
+
+    def end(self):
+        # Save the state and flush everything, but keep the process (and this engine, after reset) alive
+        if self.ended:
+            return
+        if self.transaction is not None:
+            self.abort()
+        self.save()
+        self.close()
+        self.ended = True
+
+    def publish(self, entries):
+        # Collect what the current command reports besides logging it
+        entries = list(entries)
+        result = self._result
+        if result is not None:
+            for message, outcome, *_ in entries:
+                result.messages.append(message)
+                if outcome != "success" and result.outcome == "success":
+                    result.outcome = outcome
+        MyFacebook.publish(self, entries)
+
+    def journal(self, operation, *arguments):
+        # Collect the entities the current command changes (staged changes count once they are committed)
+        if self._result is not None and self.transaction is None:
+            self._result.affected.append(changed_entity(operation, arguments))
+        MyFacebook.journal(self, operation, *arguments)
+
+    def journal_many(self, records):
+        records = list(records)
+        if self._result is not None and self.transaction is None:
+            self._result.affected.extend(changed_entity(operation, arguments) for operation, arguments in records)
+        MyFacebook.journal_many(self, records)
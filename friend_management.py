@@ -1,7 +1,67 @@
+def read_friends(filename):
+    # Yield the friend names stored in a friends file (one per line, blank lines skipped)
+    with open(filename, 'r') as file:
+        for line in file:
+            friend_name = line.strip()
+            if friend_name:
+                yield friend_name
+
+
+class FriendRegistry:
+    def __init__(self, names=()):
+        # Map each friend name to its interned integer id (the dict also keeps insertion order)
+        self._ids = {}
+
+        # Map each interned id back to its friend name (None once the friend has been removed)
+        self._names = []
+
+        for name in names:
+            self.add(name)
+
+    def add(self, friend_name):
+        # Add a friend (if not already present) and return its interned id
+        friend_id = self._ids.get(friend_name)
+        if friend_id is None:
+            friend_id = len(self._names)
+            self._ids[friend_name] = friend_id
+            self._names.append(friend_name)
+        return friend_id
+
+    # Keep the list-style API used before the registry existed
+    append = add
+
+    def remove(self, friend_name):
+        # Remove a friend; its id is retired rather than reused
+        friend_id = self._ids.pop(friend_name, None)
+        if friend_id is None:
+            raise ValueError(f"friend {friend_name} not found")
+        self._names[friend_id] = None
+
+    def id_of(self, friend_name):
+        # Return the interned id of a friend (None if the friend does not exist)
+        return self._ids.get(friend_name)
+
+    def name_of(self, friend_id):
+        # Return the friend name for an interned id (None if the friend has been removed)
+        return self._names[friend_id]
+
+    def __contains__(self, friend_name):
+        return friend_name in self._ids
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __repr__(self):
+        return f"FriendRegistry({list(self._ids)!r})"
+
+
 class FriendManager:
     def __init__(self, filename="friends.txt"):
-        # Initialize FriendManager with a file name and an empty friend list
-        self.friends = []
+        # Initialize FriendManager with a file name and an empty friend registry
+        self.friends = FriendRegistry()
         self.filename = filename
 
         # Clear friends.txt file each time the program is run
@@ -11,23 +71,25 @@ class FriendManager:
         self.load_from_file()
 
     def add_friend(self, friend_name):
-        # Add a new friend to the list of friends
-        self.friends.append(friend_name)
+        # Add a new friend to the registry of friends
+        self.friends.add(friend_name)
+
+    def remove_friend(self, friend_name):
+        # Remove a friend from the registry of friends
+        self.friends.remove(friend_name)
     
     def load_from_file(self):
         # Load friends from the file (one per line)
         try:
-            with open(self.filename, 'r') as file:
-                for line in file:
-                    # Strip the newline and add each friend to the list
-                    self.friends.append(line.strip())
+            for friend_name in read_friends(self.filename):
+                self.friends.add(friend_name)
         except FileNotFoundError:
             # Handle the case for if the file does not exist
             print(f"Warning: {self.filename} not found. Starting with empty file {self.filename}")
 
     def save_to_file(self):
         # Save any added friends to friends.txt
-        with open("friends.txt", 'w') as f:
+        with open(self.filename, 'w') as f:
             for friend in self.friends:
                 # Write each friend to a newline in the file
                 f.write(friend + "\n")
\ No newline at end of file
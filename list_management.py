@@ -1,9 +1,34 @@
+def read_lists(filename):
+    # Yield (list name, members) for each line of a lists file written as "list_name: friend1 friend2 @nested_list"
+    with open(filename, 'r') as file:
+        for line in file:
+            parts = line.split()
+            if not parts:
+                continue
+
+            # The list name is written with a trailing colon, which is not part of the name
+            list_name = parts[0][:-1] if parts[0].endswith(':') else parts[0]
+            yield list_name, parts[1:]
+
+
 class ListManager:
     def __init__(self, filename="lists.txt"):
         # Initialize ListManager with a file name and an empty dictionary
         self.lists = {}
         self.filename = filename
 
+        # Lists can contain other lists: the lists directly inside each list, and the lists each list is directly in
+        self.sublists = {}
+        self.parents = {}
+
+        # Transitive membership closure: for each list, every friend in it directly or through nested lists, counted
+        # once for being a direct member plus once per child list whose closure has the friend. A friend is in the
+        # closure while the count is positive, so changes only propagate on 0 <-> 1 transitions
+        self.closure = {}
+
+        # Reverse index from each friend to the set of lists they are in (directly or through nested lists)
+        self.memberships = {}
+
         # Clear lists.txt file each time the program is run
         open(self.filename, 'w').close()
 
@@ -12,39 +37,145 @@ class ListManager:
 
     def add_list(self, list_name):
         # Add a new list to the dictionary of lists with an empty set of friends associated with the list
-        self.lists[list_name] = set()
+        self.set_list(list_name, ())
+
+    def set_list(self, list_name, members):
+        # Store a list with the given members, where "@name" members are nested lists (used when loading or
+        # recovering state). Nested lists that do not exist yet are created empty, so lists can be set in any order
+        if list_name in self.lists:
+            for friend_name in list(self.lists[list_name]):
+                self.remove_friend_from_list(friend_name, list_name)
+            for child_name in list(self.sublists[list_name]):
+                self.remove_list_from_list(child_name, list_name)
+        else:
+            self.lists[list_name] = set()
+            self.sublists[list_name] = set()
+            self.parents[list_name] = set()
+            self.closure[list_name] = {}
+
+        for member in members:
+            if member.startswith('@'):
+                if member[1:] not in self.lists:
+                    self.add_list(member[1:])
+                self.add_list_to_list(member[1:], list_name)
+            else:
+                self.add_friend_to_list(member, list_name)
+
+    def clear(self):
+        # Forget every list
+        for lists in (self.lists, self.sublists, self.parents, self.closure, self.memberships):
+            lists.clear()
 
     def add_friend_to_list(self, friend_name, list_name):
-        # Add a friend into the set for a specified list
-        self.lists[list_name].add(friend_name)
+        # Add a friend into the set for a specified list and keep the closure and reverse index up to date
+        if friend_name not in self.lists[list_name]:
+            self.lists[list_name].add(friend_name)
+            self._gain(list_name, (friend_name,))
+
+    def remove_friend_from_list(self, friend_name, list_name):
+        # Remove a friend from a list, the closure and the reverse index
+        if friend_name in self.lists[list_name]:
+            self.lists[list_name].discard(friend_name)
+            self._lose(list_name, (friend_name,))
+
+    def add_list_to_list(self, child_name, list_name):
+        # Nest a list inside another one (check creates_cycle first); the child's members join the parent's closure
+        if child_name not in self.sublists[list_name]:
+            self.sublists[list_name].add(child_name)
+            self.parents[child_name].add(list_name)
+            self._gain(list_name, list(self.closure[child_name]))
+
+    def remove_list_from_list(self, child_name, list_name):
+        # Take a nested list out of another one
+        if child_name in self.sublists[list_name]:
+            self.sublists[list_name].discard(child_name)
+            self.parents[child_name].discard(list_name)
+            self._lose(list_name, list(self.closure[child_name]))
+
+    def remove_list(self, list_name):
+        # Remove a list, its nesting and its memberships
+        for parent_name in list(self.parents[list_name]):
+            self.remove_list_from_list(list_name, parent_name)
+        self.set_list(list_name, ())
+        for lists in (self.lists, self.sublists, self.parents, self.closure):
+            del lists[list_name]
+
+    def creates_cycle(self, child_name, list_name):
+        # Return whether nesting child_name inside list_name would make a list (indirectly) contain itself
+        stack = [child_name]
+        seen = set()
+        while stack:
+            current = stack.pop()
+            if current == list_name:
+                return True
+            if current not in seen:
+                seen.add(current)
+                stack.extend(self.sublists[current])
+        return False
+
+    def _gain(self, list_name, friend_names):
+        # Count friends that joined a list (directly or through a child) and propagate the ones new to its closure
+        stack = [(list_name, friend_names)]
+        while stack:
+            list_name, friend_names = stack.pop()
+            counts = self.closure[list_name]
+            joined = []
+            for friend_name in friend_names:
+                count = counts.get(friend_name, 0)
+                counts[friend_name] = count + 1
+                if not count:
+                    joined.append(friend_name)
+                    self.memberships.setdefault(friend_name, set()).add(list_name)
+            if joined:
+                stack.extend((parent_name, joined) for parent_name in self.parents[list_name])
+
+    def _lose(self, list_name, friend_names):
+        # Uncount friends that left a list (directly or through a child) and propagate the ones gone from its closure
+        stack = [(list_name, friend_names)]
+        while stack:
+            list_name, friend_names = stack.pop()
+            counts = self.closure[list_name]
+            left = []
+            for friend_name in friend_names:
+                count = counts[friend_name] - 1
+                if count:
+                    counts[friend_name] = count
+                else:
+                    del counts[friend_name]
+                    left.append(friend_name)
+                    self.memberships[friend_name].discard(list_name)
+            if left:
+                stack.extend((parent_name, left) for parent_name in self.parents[list_name])
+
+    def entries_of(self, list_name):
+        # Return the direct members of a list, with nested lists written as "@name"
+        return list(self.lists[list_name]) + [f"@{child_name}" for child_name in self.sublists[list_name]]
+
+    def members_of(self, list_name):
+        # Return the friends in a list, including the friends of nested lists
+        return self.closure.get(list_name, ())
+
+    def lists_of(self, friend_name):
+        # Return the lists a friend is in, including the lists that contain those lists
+        return self.memberships.get(friend_name, ())
 
     def friend_in_list(self, friend_name, list_name):
-        # Return whether or not a friend is in the list
-        return list_name in self.lists and friend_name in self.lists[list_name]
+        # Return whether or not a friend is in the list (directly or through nested lists), in constant time
+        return friend_name in self.closure.get(list_name, ())
 
     def load_from_file(self):
         # Load lists from the file
         try:
-            with open(self.filename, 'r') as file:
-                for line in file:
-                    # Strip the newline and add each friend to the list
-                    parts = line.strip().split()
-
-                    # Extract the list name from the first part
-                    list_name = parts[0]
-
-                    # Extract the friends (as a set) from the remaining parts
-                    members = set(parts[1:])
-
-                    # Store the lists's data into the the lists dictionary
-                    self.lists[list_name] = members
+            for list_name, members in read_lists(self.filename):
+                # Store the lists's data (with the friends from the remaining parts) into the the lists dictionary
+                self.set_list(list_name, members)
         except FileNotFoundError:
             # Handle the case for if the file does not exist
             print(f"Warning: {self.filename} not found. Starting with empty file {self.filename}")
 
     def save_to_file(self):
         # Save any created lists to lists.txt
-        with open("lists.txt", 'w') as f:
-            for list_name, members in self.lists.items():
-                # Write each list to a new line in the file with format list_name: friend1 friend2
-                f.write(f"{list_name}: {' '.join(members)}\n")
\ No newline at end of file
+        with open(self.filename, 'w') as f:
+            for list_name in self.lists:
+                # Write each list to a new line in the file with format list_name: friend1 friend2 @nested_list
+                f.write(f"{list_name}: {' '.join(self.entries_of(list_name))}\n")
\ No newline at end of file
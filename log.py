@@ -1,11 +1,187 @@
+import atexit
+import os
+import threading
+import time
+
+
+class Flusher:
+    def __init__(self):
+        # One background thread writes the due batches of every count and time policy Logger in the process,
+        # so hosting many profiles does not mean one writer thread per profile
+        self._loggers = set()
+        self._condition = threading.Condition()
+        self._woken = False
+        self._thread = None
+
+    def add(self, logger):
+        with self._condition:
+            self._loggers.add(logger)
+
+            # Start the thread with the first logger, and wake it so it picks up a shorter flush interval
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+            self._woken = True
+            self._condition.notify()
+
+    def remove(self, logger):
+        with self._condition:
+            self._loggers.discard(logger)
+
+    def wake(self):
+        # A count policy logger has a full batch waiting
+        with self._condition:
+            self._woken = True
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # Sleep until woken or until the next time policy logger is due
+                now = time.monotonic()
+                due = [logger.flushed_at + logger.flush_interval for logger in self._loggers
+                       if logger.flush_policy == "time"]
+                timeout = max(min(due) - now, 0) if due else None
+                self._condition.wait_for(lambda: self._woken, timeout)
+                self._woken = False
+                loggers = list(self._loggers)
+
+            now = time.monotonic()
+            for logger in loggers:
+                if logger.flush_due(now):
+                    logger.flush()
+
+
+# The writer thread shared by all loggers
+FLUSHER = Flusher()
+
+
 class Logger:
-    def __init__(self, filename="audit.txt"):
-       # Initialize Logger with a file name
-       self.filename = filename
-       # Clear audit.txt file each time the program is run
-       open(self.filename, 'w').close()
+    # Flush policies supported by the buffered audit writer:
+    #   line  - write (and flush) every action immediately, like the original per-line appends
+    #   count - flush in the background once flush_every actions are buffered (the default)
+    #   time  - flush in the background every flush_interval seconds
+    #   end   - only flush (and fsync) when the logger is closed by MyFacebook.end
+    FLUSH_POLICIES = ("line", "count", "time", "end")
+
+    def __init__(self, filename="audit.txt", flush_policy="count", flush_every=512, flush_interval=1.0,
+                 max_bytes=None, backup_count=5, truncate=True, sync=False):
+        # Initialize Logger with a file name
+        if flush_policy not in self.FLUSH_POLICIES:
+            raise ValueError(f"Unknown flush policy: {flush_policy}")
+
+        self.filename = filename
+        self.flush_policy = flush_policy
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        # Rotate audit.txt to audit.txt.1, audit.txt.2, ... once it grows past max_bytes (None disables rotation)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        # fsync every batch written instead of only flushing it to the operating system
+        self.sync = sync
+
+        # Clear audit.txt file each time the program is run (unless asked to keep appending to it)
+        # and keep it open for the lifetime of the logger instead of reopening it for every action
+        self._file = open(self.filename, 'w' if truncate else 'a')
+
+        # Actions waiting to be written, guarded by _condition. Batches are taken and written under _write_lock,
+        # so a background flush and an explicit one can never write their batches out of order
+        self._pending = []
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self.flushed_at = time.monotonic()
+
+        # The policies that flush on their own are served by the shared writer thread
+        if flush_policy in ("count", "time"):
+            FLUSHER.add(self)
+
+        # Make sure buffered actions reach the disk even if the command file never issues end
+        atexit.register(self.close)
 
     def log_action(self, action):
         # Log an action (success or error)
-        with open(self.filename, 'a') as f:
-            f.write(f"{action}\n")
\ No newline at end of file
+        line = f"{action}\n"
+
+        # Once the logger has been closed, fall back to appending the line directly
+        if self._file is None:
+            with open(self.filename, 'a') as f:
+                f.write(line)
+            return
+
+        if self.flush_policy == "line":
+            with self._write_lock:
+                self._write_batch([line])
+            return
+
+        with self._condition:
+            self._pending.append(line)
+            full = self.flush_policy == "count" and len(self._pending) >= self.flush_every
+
+        # Wake up the writer thread once a full batch is waiting
+        if full:
+            FLUSHER.wake()
+
+    def flush_due(self, now):
+        # Whether the shared writer thread should flush this logger now
+        with self._condition:
+            if self.flush_policy == "count":
+                return len(self._pending) >= self.flush_every
+            return now - self.flushed_at >= self.flush_interval
+
+    def flush(self):
+        # Write every buffered action to audit.txt right now
+        with self._write_lock:
+            with self._condition:
+                batch, self._pending = self._pending, []
+            self.flushed_at = time.monotonic()
+            if self._file is not None:
+                self._write_batch(batch)
+
+    def close(self):
+        # Stop background flushes, write whatever is still buffered and close audit.txt
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+
+        FLUSHER.remove(self)
+        self.flush()
+
+        with self._write_lock:
+            # The end policy trades durability during the run for a single fsync when the run ends
+            if self.flush_policy == "end":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+        atexit.unregister(self.close)
+
+    def _write_batch(self, batch):
+        # Write a batch of lines with a single write call and rotate the file if it got too big
+        # (called with _write_lock held)
+        if not batch:
+            return
+
+        self._file.write(''.join(batch))
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+
+        if self.max_bytes is not None and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        # Shift audit.txt.N to audit.txt.N+1 (dropping the oldest) and start a fresh audit.txt
+        self._file.close()
+
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.filename}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.filename}.{index + 1}")
+            os.replace(self.filename, f"{self.filename}.1")
+
+        self._file = open(self.filename, 'w')
@@ -0,0 +1,102 @@
+import cProfile
+import contextlib
+import sys
+import tracemalloc
+from bisect import bisect_left
+
+# Upper bounds (in seconds) of the command latency histogram buckets, from 1us to 1s
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2,
+                   2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+
+
+class Histogram:
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        # Initialize Histogram with one counter per bucket plus one for values above the last bound
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, fraction):
+        # Return the upper bound of the bucket holding the given fraction of observations
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return self.bounds[index] if index < len(self.bounds) else float("inf")
+        return 0.0
+
+
+class Metrics:
+    def __init__(self):
+        # Latency histogram per instruction and a counter per (instruction, outcome)
+        self.latencies = {}
+        self.outcomes = {}
+
+    def observe(self, instruction, seconds):
+        histogram = self.latencies.get(instruction)
+        if histogram is None:
+            histogram = self.latencies[instruction] = Histogram()
+        histogram.observe(seconds)
+
+    def count(self, instruction, outcome):
+        key = (instruction, outcome)
+        self.outcomes[key] = self.outcomes.get(key, 0) + 1
+
+    def summary(self):
+        # Return human readable lines for the stats command
+        lines = []
+        for instruction, histogram in sorted(self.latencies.items()):
+            lines.append(f"{instruction}: count {histogram.count}, "
+                         f"p50 <= {histogram.percentile(0.5) * 1e6:g}us, p99 <= {histogram.percentile(0.99) * 1e6:g}us")
+        for (instruction, outcome), count in sorted(self.outcomes.items()):
+            lines.append(f"{instruction} {outcome}: {count}")
+        return lines
+
+    def write_prometheus(self, filename):
+        # Write the counters and histograms in the Prometheus text exposition format
+        with open(filename, 'w') as f:
+            f.write("# HELP myfacebook_commands_total Commands executed, by instruction and outcome.\n")
+            f.write("# TYPE myfacebook_commands_total counter\n")
+            for (instruction, outcome), count in sorted(self.outcomes.items()):
+                f.write(f'myfacebook_commands_total{{instruction="{instruction}",outcome="{outcome}"}} {count}\n')
+
+            f.write("# HELP myfacebook_command_duration_seconds Time spent executing a command.\n")
+            f.write("# TYPE myfacebook_command_duration_seconds histogram\n")
+            for instruction, histogram in sorted(self.latencies.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    f.write(f'myfacebook_command_duration_seconds_bucket{{instruction="{instruction}",le="{le}"}} '
+                            f'{cumulative}\n')
+                f.write(f'myfacebook_command_duration_seconds_sum{{instruction="{instruction}"}} {histogram.sum:.9f}\n')
+                f.write(f'myfacebook_command_duration_seconds_count{{instruction="{instruction}"}} {histogram.count}\n')
+
+
+@contextlib.contextmanager
+def profiling(cprofile_path=None, tracemalloc_top=0):
+    # Optionally run a block under cProfile (dumping stats to cprofile_path) and/or tracemalloc
+    # (printing the top allocation sites to stderr). The block may exit through SystemExit (end)
+    profiler = cProfile.Profile() if cprofile_path else None
+    if tracemalloc_top:
+        tracemalloc.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+        if tracemalloc_top:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            for stat in snapshot.statistics("lineno")[:tracemalloc_top]:
+                print(stat, file=sys.stderr)
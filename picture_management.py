@@ -1,9 +1,335 @@
+import os
+from array import array
+from collections import OrderedDict
+
+# Permission bits packed into a single integer per picture (owner rw, list rw, others rw)
+OWNER_READ = 0b100000
+OWNER_WRITE = 0b010000
+LIST_READ = 0b001000
+LIST_WRITE = 0b000100
+OTHERS_READ = 0b000010
+OTHERS_WRITE = 0b000001
+
+# The owner, list and others bits that grant each operation
+ACCESS_BITS = {
+    'r': (OWNER_READ, LIST_READ, OTHERS_READ),
+    'w': (OWNER_WRITE, LIST_WRITE, OTHERS_WRITE),
+}
+
+
+def compile_permissions(owner, list, others):
+    # Turn permission strings such as 'rw', 'r-' and '--' into a permission bitmask
+    mode = 0
+    for permission, (read_bit, write_bit) in ((owner, (OWNER_READ, OWNER_WRITE)),
+                                              (list, (LIST_READ, LIST_WRITE)),
+                                              (others, (OTHERS_READ, OTHERS_WRITE))):
+        if permission[:1] == 'r':
+            mode |= read_bit
+        if permission[1:2] == 'w':
+            mode |= write_bit
+    return mode
+
+
+def render_permissions(mode):
+    # Turn a permission bitmask back into the owner, list and others permission strings
+    return tuple(('r' if mode & read_bit else '-') + ('w' if mode & write_bit else '-')
+                 for read_bit, write_bit in ((OWNER_READ, OWNER_WRITE),
+                                             (LIST_READ, LIST_WRITE),
+                                             (OTHERS_READ, OTHERS_WRITE)))
+
+
+def read_pictures(filename):
+    # Yield (picture name, owner, list, permissions) for each line of a pictures file written as
+    # "picture_name: owner list owner_permissions list_permissions others_permissions"
+    with open(filename, 'r') as file:
+        for line in file:
+            parts = line.split()
+            if not parts:
+                continue
+
+            # The picture name is written with a trailing colon, which is not part of the name
+            picture_name = parts[0][:-1] if parts[0].endswith(':') else parts[0]
+            yield picture_name, parts[1], parts[2], parts[3:6]
+
+
+class PictureTable:
+    def __init__(self):
+        # Map each picture name to its row, and each row back to its name (in posting order)
+        self.rows = {}
+        self.names = []
+
+        # Parallel per-row columns: interned owner id, interned list id and packed permission bits
+        self.owners = array('I')
+        self.lists = array('I')
+        self.modes = bytearray()
+
+        # Owner and list names are interned once and referred to by id
+        self.strings = []
+        self.string_ids = {}
+
+        # Access indexes per operation ('r'/'w'): rows whose owner, list or others permission grants it,
+        # keyed by owner id and list id, so "what can this friend access" only visits matching rows.
+        # They cost several times the columns, so they are only built (and from then on kept up to date)
+        # by the first accessible query; profiles that never ask keep just the compact columns
+        self.by_owner = {'r': {}, 'w': {}}
+        self.by_list = {'r': {}, 'w': {}}
+        self.by_others = {'r': set(), 'w': set()}
+        self.indexed = False
+
+    def intern(self, name):
+        # Return the id of a name, adding it to the string table the first time it is seen
+        string_id = self.string_ids.get(name)
+        if string_id is None:
+            string_id = self.string_ids[name] = len(self.strings)
+            self.strings.append(name)
+        return string_id
+
+    def set(self, picture_name, owner, list_name, mode):
+        # Add a picture (or overwrite an existing one) and return its row
+        row = self.rows.get(picture_name)
+        if row is None:
+            row = self.rows[picture_name] = len(self.names)
+            self.names.append(picture_name)
+            self.owners.append(self.intern(owner))
+            self.lists.append(self.intern(list_name))
+            self.modes.append(mode)
+            self._index(row)
+            return row
+
+        self._unindex(row)
+        self.owners[row] = self.intern(owner)
+        self.lists[row] = self.intern(list_name)
+        self.modes[row] = mode
+        self._index(row)
+        return row
+
+    def owner_of(self, picture_name):
+        return self.strings[self.owners[self.rows[picture_name]]]
+
+    def list_of(self, picture_name):
+        return self.strings[self.lists[self.rows[picture_name]]]
+
+    def mode_of(self, picture_name):
+        return self.modes[self.rows[picture_name]]
+
+    def set_owner(self, picture_name, owner):
+        row = self.rows[picture_name]
+        self._unindex(row)
+        self.owners[row] = self.intern(owner)
+        self._index(row)
+
+    def set_list(self, picture_name, list_name):
+        row = self.rows[picture_name]
+        self._unindex(row)
+        self.lists[row] = self.intern(list_name)
+        self._index(row)
+
+    def set_mode(self, picture_name, mode):
+        row = self.rows[picture_name]
+        self._unindex(row)
+        self.modes[row] = mode
+        self._index(row)
+
+    def accessible_rows(self, owner, list_names, operation):
+        # Return the rows an owner who is in list_names may access, visiting only rows that grant it
+        if not self.indexed:
+            self.build_indexes()
+
+        rows = set(self.by_owner[operation].get(self.string_ids.get(owner), ()))
+        for list_name in list_names:
+            rows.update(self.by_list[operation].get(self.string_ids.get(list_name), ()))
+        rows.update(self.by_others[operation])
+        return rows
+
+    def build_indexes(self):
+        # Index every row (once, on the first accessible query)
+        self.indexed = True
+        for row in range(len(self.names)):
+            self._index(row)
+
+    def _index(self, row):
+        # Add a row to the access indexes for the permissions it grants
+        if not self.indexed:
+            return
+
+        mode = self.modes[row]
+        nil = self.string_ids.get('nil')
+        for operation, (owner_bit, list_bit, others_bit) in ACCESS_BITS.items():
+            if mode & owner_bit:
+                self.by_owner[operation].setdefault(self.owners[row], set()).add(row)
+            if mode & list_bit and self.lists[row] != nil:
+                self.by_list[operation].setdefault(self.lists[row], set()).add(row)
+            if mode & others_bit:
+                self.by_others[operation].add(row)
+
+    def _unindex(self, row):
+        # Remove a row from the access indexes before its owner, list or permissions change
+        if not self.indexed:
+            return
+
+        for operation in ACCESS_BITS:
+            self.by_owner[operation].get(self.owners[row], set()).discard(row)
+            self.by_list[operation].get(self.lists[row], set()).discard(row)
+            self.by_others[operation].discard(row)
+
+    def __getitem__(self, picture_name):
+        # Return a picture as the dict it used to be stored as (a copy; change it through PictureManager)
+        row = self.rows[picture_name]
+        owner, list_permissions, others = render_permissions(self.modes[row])
+        return {
+            'owner': self.strings[self.owners[row]],
+            'list': self.strings[self.lists[row]],
+            'permissions': {'owner': owner, 'list': list_permissions, 'others': others},
+            'mode': self.modes[row],
+        }
+
+    def __contains__(self, picture_name):
+        return picture_name in self.rows
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+class DecisionCache:
+    def __init__(self, max_entries=100000):
+        # Remember access decisions keyed by (viewer, picture, operation), in least to most recently used order.
+        # Each one costs about 300 bytes with its index entries, so only the max_entries most recent are kept
+        self.decisions = OrderedDict()
+        self.max_entries = max_entries
+
+        # Keys grouped by picture and by viewer so they can be dropped exactly when their inputs change
+        self.by_picture = {}
+        self.by_viewer = {}
+
+    def get(self, key):
+        allowed = self.decisions.get(key)
+        if allowed is not None:
+            self.decisions.move_to_end(key)
+        return allowed
+
+    def put(self, key, allowed):
+        viewer, picture_name, _ = key
+        self.decisions[key] = allowed
+        self.by_picture.setdefault(picture_name, set()).add(key)
+        self.by_viewer.setdefault(viewer, set()).add(key)
+
+        # Forget the least recently used decision once the cache is full
+        if len(self.decisions) > self.max_entries:
+            oldest, _ = self.decisions.popitem(last=False)
+            self._unlink(self.by_picture, oldest[1], oldest)
+            self._unlink(self.by_viewer, oldest[0], oldest)
+
+    def invalidate_picture(self, picture_name):
+        # The owner, list or permissions of the picture changed (chown, chlst, chmod)
+        for key in self.by_picture.pop(picture_name, ()):
+            self.decisions.pop(key, None)
+            self._unlink(self.by_viewer, key[0], key)
+
+    def invalidate_viewer(self, viewer):
+        # The viewer joined a list (friendlist)
+        for key in self.by_viewer.pop(viewer, ()):
+            self.decisions.pop(key, None)
+            self._unlink(self.by_picture, key[1], key)
+
+    @staticmethod
+    def _unlink(index, name, key):
+        # Drop a key from one of the groupings, and the group once it is empty
+        keys = index.get(name)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[name]
+
+
+class CommentCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        # Picture bodies (title and comments, as in the picture file) in least to most recently used order.
+        # Each body is a list of chunks so appending a comment does not copy the whole body
+        self.bodies = OrderedDict()
+        self.sizes = {}
+        self.max_bytes = max_bytes
+        self.bytes = 0
+
+        # Cache metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, picture_name):
+        # Return the cached body of a picture (None on a miss)
+        chunks = self.bodies.get(picture_name)
+        if chunks is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.bodies.move_to_end(picture_name)
+        if len(chunks) > 1:
+            chunks[:] = [''.join(chunks)]
+        return chunks[0]
+
+    def put(self, picture_name, body):
+        # Cache the whole body of a picture (bodies bigger than the budget are not cached)
+        self.discard(picture_name)
+        size = len(body.encode())
+        if size > self.max_bytes:
+            return
+
+        self.bodies[picture_name] = [body]
+        self.sizes[picture_name] = size
+        self.bytes += size
+        self._evict()
+
+    def append(self, picture_name, text):
+        # Extend a cached body after a comment was written to the picture file (nothing to do if it is not cached)
+        chunks = self.bodies.get(picture_name)
+        if chunks is None:
+            return
+
+        size = len(text.encode())
+        chunks.append(text)
+        self.bodies.move_to_end(picture_name)
+        self.sizes[picture_name] += size
+        self.bytes += size
+        self._evict()
+
+    def discard(self, picture_name):
+        if self.bodies.pop(picture_name, None) is not None:
+            self.bytes -= self.sizes.pop(picture_name)
+
+    def _evict(self):
+        # Drop least recently used bodies until the cache fits in its budget
+        while self.bytes > self.max_bytes:
+            picture_name, _ = self.bodies.popitem(last=False)
+            self.bytes -= self.sizes.pop(picture_name)
+            self.evictions += 1
+
+
 class PictureManager:
-    def __init__(self, filename="pictures.txt"):
-        # Initialize PictureManager with a file name and en empty dictionary
-        self.pictures = {}
+    def __init__(self, filename="pictures.txt", comment_store=None, directory=".",
+                 comment_cache_bytes=32 * 1024 * 1024, io_pool=None):
+        # Initialize PictureManager with a file name and en empty picture table
+        self.pictures = PictureTable()
         self.filename = filename
 
+        # Directory that holds the picture files
+        self.directory = directory
+
+        # Keep comments in a CommentStore instead of one file per picture when one is given
+        self.comment_store = comment_store
+
+        # Cache of (viewer, picture, operation) access decisions
+        self.decisions = DecisionCache()
+
+        # Bodies of recently read picture files, kept up to date by write_comments
+        self.comment_cache = CommentCache(comment_cache_bytes)
+
+        # Hand comment appends to an IOPool (see pipeline.py) instead of doing them inline when one is given
+        self.io_pool = io_pool
+
         # Clear pictures.txt file each time the program is run
         open(self.filename, 'w').close()
 
@@ -12,107 +338,163 @@ class PictureManager:
 
     def add_picture(self, picture_name, owner):
         # Add/post a picture with the default list ('nil') and default permissions
-        self.pictures[picture_name] = {
-            'owner': owner,
-            'list': 'nil',
-            'permissions': {'owner': 'rw', 'list': '--', 'others': '--'},
-        }
+        self.pictures.set(picture_name, owner, 'nil', OWNER_READ | OWNER_WRITE)
+        self.decisions.invalidate_picture(picture_name)
 
         # Create a new file for the posted picture with the name of the picture on the first line
-        with open(picture_name, 'w') as picture:
-            picture.write(f"{picture_name.rsplit(".txt", 1)[0]}\n")
+        title = picture_name.rsplit('.txt', 1)[0]
+        if self.comment_store is not None:
+            self.comment_store.create(picture_name, title)
+            return
+
+        with open(self.picture_path(picture_name), 'w') as picture:
+            picture.write(f"{title}\n")
+        self.comment_cache.put(picture_name, f"{title}\n")
+
+    def picture_path(self, picture_name):
+        # Return the path of the file holding a picture's comments
+        return os.path.join(self.directory, picture_name)
+
+    def picture_body(self, picture_name):
+        # Return the contents of a picture file (title and comments), from the comment cache when possible
+        body = self.comment_cache.get(picture_name)
+        if body is None:
+            # Writes to the picture may still be queued
+            if self.io_pool is not None:
+                self.io_pool.wait(picture_name)
+            with open(self.picture_path(picture_name), 'r') as picture:
+                body = picture.read()
+            self.comment_cache.put(picture_name, body)
+        return body
+
+    def set_picture(self, picture_name, owner, list_name, permissions):
+        # Store a picture's data without touching its comments (used when loading or recovering state)
+        self.pictures.set(picture_name, owner, list_name, compile_permissions(*permissions[:3]))
+        self.decisions.invalidate_picture(picture_name)
 
     def change_list(self, picture_name, list_name):
          # Change the list for a given picture
-        self.pictures[picture_name]['list'] = list_name
+        self.pictures.set_list(picture_name, list_name)
+        self.decisions.invalidate_picture(picture_name)
 
     def change_permissions(self, picture_name, permissions):
         # Change the read/write permissions for owner, list, and others for a given picture
-        self.pictures[picture_name]['permissions'] = {
-            'owner': permissions[0],
-            'list': permissions[1],
-            'others': permissions[2]
-        }
+        self.pictures.set_mode(picture_name, compile_permissions(permissions[0], permissions[1], permissions[2]))
+        self.decisions.invalidate_picture(picture_name)
 
     def change_owner(self, picture_name, new_owner):
         # Change the owner of a given picture
-        self.pictures[picture_name]['owner'] = new_owner
+        self.pictures.set_owner(picture_name, new_owner)
+        self.decisions.invalidate_picture(picture_name)
+
+    def owner_of(self, picture_name):
+        # Return the owner of a given picture
+        return self.pictures.owner_of(picture_name)
+
+    def list_of(self, picture_name):
+        # Return the list of a given picture
+        return self.pictures.list_of(picture_name)
+
+    def permissions_of(self, picture_name):
+        # Return the owner, list and others permission strings of a given picture
+        return render_permissions(self.pictures.mode_of(picture_name))
+
+    def accessible(self, viewer, operation, list_manager):
+        # Return the pictures (in posting order) the viewer may read ('r') or write ('w'), in time
+        # proportional to the answer and the number of lists the viewer is in
+        rows = self.pictures.accessible_rows(viewer, list_manager.lists_of(viewer), operation)
+        return [self.pictures.names[row] for row in sorted(rows)]
+
+    def check_access(self, picture_name, viewer, operation, list_manager):
+        # Decide whether the viewer may read ('r') or write ('w') the picture, reusing earlier decisions
+        key = (viewer, picture_name, operation)
+        allowed = self.decisions.get(key)
+
+        if allowed is None:
+            allowed = self._evaluate_access(self.pictures.rows[picture_name], viewer, operation, list_manager)
+            self.decisions.put(key, allowed)
+
+        return allowed
+
+    def _evaluate_access(self, row, viewer, operation, list_manager):
+        owner_bit, list_bit, others_bit = ACCESS_BITS[operation]
+        table = self.pictures
+        mode = table.modes[row]
+
+        # Check owner permissions
+        if mode & owner_bit and viewer == table.strings[table.owners[row]]:
+            return True
 
-    # Read in any comment(s) that have been written to a picture
-    def read_comments(self, picture_name, viewer, list_manager):
-        picture = self.pictures[picture_name]
-
-        # Check owner permissions to determine whether to read comments from picture/file
-        if viewer == picture['owner'] and picture['permissions']['owner'][0] == 'r':
-            with open(picture_name, 'r') as picture:
-                # Read the comment from the picture
-                return picture.read().strip()
-                
         # Check to make sure the associated list is not the default 'nil' and that the friend is in the list
-        if picture['list'] != 'nil' and list_manager.friend_in_list(viewer, picture['list']):
-            # Check list permissions to determine whether to read comments from picture/file
-            if picture['permissions']['list'][0] == 'r':
-                with open(picture_name, 'r') as picture:
-                    # Read the comment from the picture
-                    return picture.read().strip()
-
-        # Check others permissions to determine whether to read comments from picture/file
-        if picture['permissions']['others'][0] == 'r':
-            with open(picture_name, 'r') as picture:
-                # Read the comment from the picture
-                return picture.read().strip()
+        list_name = table.strings[table.lists[row]]
+        if mode & list_bit and list_name != 'nil' and list_manager.friend_in_list(viewer, list_name):
+            return True
+
+        # Check others permissions
+        return bool(mode & others_bit)
+
+    def invalidate_viewer(self, viewer):
+        # Forget the decisions made for a friend whose list memberships changed
+        self.decisions.invalidate_viewer(viewer)
 
+    # Read in any comment(s) that have been written to a picture
+    def read_comments(self, picture_name, viewer, list_manager, start=None, count=None):
         # Indicate that permission to read is denied
-        return None
+        if not self.check_access(picture_name, viewer, 'r', list_manager):
+            return None
+
+        # Read the whole picture (title and comments) unless a page of comments was requested
+        if start is None:
+            if self.comment_store is not None:
+                return '\n'.join(self.comment_store.read(picture_name)).strip()
+
+            # Read the comment from the picture
+            return self.picture_body(picture_name).strip()
+
+        return '\n'.join(self.read_comment_page(picture_name, start, count))
+
+    def read_comment_page(self, picture_name, start, count=None):
+        # Return up to count comments starting at offset start (a negative start counts back from the newest)
+        if self.comment_store is None:
+            comments = self.picture_body(picture_name).splitlines()[1:]
+            first, last = self._page_bounds(len(comments), start, count)
+            return comments[first:last]
+
+        # Record 0 is the picture title, so comment k is record k + 1
+        first, last = self._page_bounds(self.comment_store.count(picture_name) - 1, start, count)
+        return self.comment_store.read(picture_name, first + 1, last + 1)
+
+    def _page_bounds(self, total, start, count):
+        # Clamp a page request to the comments that actually exist
+        first = max(total + start, 0) if start < 0 else min(start, total)
+        last = total if count is None else min(first + count, total)
+        return first, last
 
     # Write new comment(s) to the picture
     def write_comments(self, picture_name, viewer, comment, list_manager):
-        picture = self.pictures[picture_name]
-        
-        # Check owner permissions to determine whether to write comment to picture/file
-        if viewer == picture['owner'] and picture['permissions']['owner'][1] == 'w':
-            with open(picture_name, 'a') as picture:
-                # Append the comment into the picture file
-                picture.write(comment + "\n")
+        # Indicate that permission to write is denied
+        if not self.check_access(picture_name, viewer, 'w', list_manager):
+            return False
+
+        if self.comment_store is not None:
+            self.comment_store.append(picture_name, comment)
             return True
-        
-        # Check to make sure the associated list is not the default 'nil' and that the friend is in the list
-        if picture['list'] != 'nil' and list_manager.friend_in_list(viewer, picture['list']): 
-            # Check list permissions to determine whether to write comment to picture/file
-            if picture['permissions']['list'][1] == 'w':
-                with open(picture_name, 'a') as picture:
-                    # Append the comment into the picture file
-                    picture.write(comment + "\n")
-                return True
-
-        # Check others permissions to determine whether to write comment to picture/file
-        if picture['permissions']['others'][1] == 'w':
-            with open(picture_name, 'a') as picture:
+
+        if self.io_pool is not None:
+            self.io_pool.append(picture_name, self.picture_path(picture_name), comment + "\n")
+        else:
+            with open(self.picture_path(picture_name), 'a') as picture:
                 # Append the comment into the picture file
                 picture.write(comment + "\n")
-            return True
-        
-        # Indicate that permission to write is denied
-        return False
+        self.comment_cache.append(picture_name, comment + "\n")
+        return True
 
     def load_from_file(self):
         # Load pictures from the file
         try:
-            with open(self.filename, 'r') as file:
-                for line in file:
-                    # Strip the newline and add each friend to the list
-                    parts = line.strip().split()
-
-                    # Extract picture name,  owner, and list from first three parts
-                    pic_name = parts[0]
-                    owner = parts[1]
-                    list_name = parts[2]
-
-                    # Extract permissions for owner, list, and others from remaining parts
-                    permissions = {'owner': parts[3], 'list': parts[4], 'others': parts[5]}
-
-                    # Store the picutre's data into the the pictures dictionary
-                    self.pictures[pic_name] = {'owner': owner, 'list': list_name, 'permissions': permissions}
+            for pic_name, owner, list_name, permissions in read_pictures(self.filename):
+                # Store the picutre's data (with the owner, list, and others permissions) into the the pictures dictionary
+                self.set_picture(pic_name, owner, list_name, permissions)
         except FileNotFoundError:
             # Handle the case for if the file does not exist
             print(f"Warning: {self.filename} not found. Starting with empty file {self.filename}")
@@ -120,7 +502,9 @@ class PictureManager:
     
     def save_to_file(self):
         # Save any posted/created pictures to pictures.txt
-        with open("pictures.txt", 'w') as f:
-            for pic, data in self.pictures.items():
+        with open(self.filename, 'w') as f:
+            table = self.pictures
+            for row, pic in enumerate(table.names):
+                owner, list_permissions, others = render_permissions(table.modes[row])
                 # Write each picture to a new line in the file wiht the format: picture_name: owner list owner_permissions list_permissions others_permissions
-                f.write(f"{pic}: {data['owner']} {data['list']} {data['permissions']['owner']} {data['permissions']['list']} {data['permissions']['others']}\n")
\ No newline at end of file
+                f.write(f"{pic}: {table.strings[table.owners[row]]} {table.strings[table.lists[row]]} {owner} {list_permissions} {others}\n")
\ No newline at end of file
@@ -0,0 +1,159 @@
+import atexit
+import multiprocessing
+import queue
+import threading
+import zlib
+from collections import OrderedDict
+
+# Commands parsed per batch handed from the parser thread to the evaluator
+PARSE_BATCH = 256
+
+
+class IOPool:
+    def __init__(self, workers=2, batch_size=256, queue_size=64, open_files=256):
+        # Initialize IOPool with one worker process per shard, each fed batches of appends through a bounded queue.
+        # Every file is appended to by the shard its name hashes to, so the appends to one picture happen in the
+        # order they were made. Processes rather than threads, so the workers' system calls never wait on the GIL.
+        # Files are created by the caller, so a file that cannot be created fails the command that created it
+        self.shards = [multiprocessing.JoinableQueue(queue_size) for _ in range(workers)]
+        self.batch_size = batch_size
+
+        # Appends not handed to their shard yet; they are queued a batch at a time to keep messages few
+        self.pending = [[] for _ in self.shards]
+
+        # Errors the workers ran into, raised on the evaluator at the next wait, drain or close
+        self.errors = multiprocessing.SimpleQueue()
+
+        self.workers = [multiprocessing.Process(target=write_batches, args=(shard, self.errors, open_files),
+                                                name=f"io-worker-{number}", daemon=True)
+                        for number, shard in enumerate(self.shards)]
+        for worker in self.workers:
+            worker.start()
+
+        # Make sure queued appends reach the disk even if the command file never issues end
+        atexit.register(self.close)
+
+    def shard_of(self, key):
+        return zlib.crc32(key.encode()) % len(self.shards)
+
+    def append(self, key, path, text):
+        # Append text to the (existing) file at path after the earlier appends for key
+        shard = self.shard_of(key)
+        pending = self.pending[shard]
+        pending.append((path, text))
+        if len(pending) >= self.batch_size:
+            self._submit(shard)
+
+    def wait(self, key):
+        # Block until the appends made so far for key (and the rest of its shard) are written
+        shard = self.shard_of(key)
+        self._submit(shard)
+        self.shards[shard].join()
+        self.check()
+
+    def drain(self):
+        # Block until every append made so far is written
+        for shard in range(len(self.shards)):
+            self._submit(shard)
+        for shard in self.shards:
+            shard.join()
+        self.check()
+
+    def close(self):
+        # Finish the queued appends, close the files and stop the workers
+        if not self.workers:
+            return
+        for shard in range(len(self.shards)):
+            self._submit(shard)
+            self.shards[shard].put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+        atexit.unregister(self.close)
+        self.check()
+
+    def check(self):
+        if not self.errors.empty():
+            raise self.errors.get()
+
+    def _submit(self, shard):
+        # Hand a shard its pending appends (blocks while its queue is full)
+        if self.pending[shard]:
+            batch, self.pending[shard] = self.pending[shard], []
+            self.shards[shard].put(batch)
+
+
+def write_batches(shard, errors, open_files):
+    # Worker process: append each batch through a small LRU of open files, flushed once the batch is done
+    files = OrderedDict()
+    while True:
+        batch = shard.get()
+        try:
+            if batch is None:
+                for file in files.values():
+                    file.close()
+                return
+
+            for path, text in batch:
+                file = files.get(path)
+                if file is None:
+                    file = files[path] = open(path, 'a')
+                    if len(files) > open_files:
+                        files.popitem(last=False)[1].close()
+                files.move_to_end(path)
+                file.write(text)
+
+            for path in {path for path, _ in batch}:
+                if path in files:
+                    files[path].flush()
+        except Exception as e:
+            errors.put(e)
+        finally:
+            shard.task_done()
+
+
+def parse_in_background(commands, queue_size=64):
+    # Tokenize commands on a parser thread and yield the (parts, command) pairs in order. The batches queue is
+    # bounded so the parser never runs far ahead; an error raised while reading is re-raised here, where the
+    # sequential loop would have seen it
+    batches = queue.Queue(queue_size)
+    stopped = threading.Event()
+
+    def parse():
+        batch = []
+        try:
+            for command in commands:
+                batch.append((command.split(), command))
+                if len(batch) >= PARSE_BATCH:
+                    if not put(batch):
+                        return
+                    batch = []
+            put(batch)
+            put(None)
+        except Exception as e:
+            put(batch)
+            put(e)
+
+    def put(item):
+        # Hand an item to the evaluator unless it has stopped reading (e.g. after end)
+        while not stopped.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    thread = threading.Thread(target=parse, name="command-parser", daemon=True)
+    thread.start()
+    try:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            if isinstance(batch, Exception):
+                raise batch
+            yield from batch
+    finally:
+        # The parser may be blocked reading a pipe, so it is told to stop rather than joined
+        stopped.set()
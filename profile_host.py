@@ -0,0 +1,170 @@
+import argparse
+import os
+import resource
+from collections import OrderedDict
+
+from access import MyFacebook, stream_commands
+
+# Rough in-memory cost of each kind of record, used to keep the resident profiles under the memory budget
+PROFILE_BYTES = 64 * 1024
+FRIEND_BYTES = 160
+MEMBER_BYTES = 90
+PICTURE_BYTES = 700
+
+# Files a loaded profile keeps open (audit.txt and its write-ahead log), and descriptors left for everything else
+FILES_PER_PROFILE = 2
+RESERVED_FILES = 64
+
+
+def estimate_bytes(facebook):
+    # Estimate how much memory a loaded profile holds
+    members = sum(len(members) for members in facebook.list_manager.lists.values())
+    return (PROFILE_BYTES
+            + len(facebook.friends_manager.friends) * FRIEND_BYTES
+            + (len(facebook.list_manager.lists) + members) * MEMBER_BYTES
+            + len(facebook.picture_manager.pictures) * PICTURE_BYTES
+            + facebook.picture_manager.comment_cache.bytes)
+
+
+def default_max_profiles():
+    # As many loaded profiles as the process's open file limit leaves room for (None when it is unlimited)
+    soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft_limit == resource.RLIM_INFINITY:
+        return None
+    return max(1, (soft_limit - RESERVED_FILES) // FILES_PER_PROFILE)
+
+
+class ProfileHost:
+    def __init__(self, root="profiles", memory_budget=256 * 1024 * 1024, checkpoint_every=1000, max_profiles=None):
+        # Initialize ProfileHost with a root directory holding one state directory per profile
+        self.root = root
+        self.memory_budget = memory_budget
+        self.checkpoint_every = checkpoint_every
+
+        # Loaded profiles hold open files, so their number is capped by the open file limit as well as by memory
+        self.max_profiles = max_profiles or default_max_profiles()
+        os.makedirs(self.root, exist_ok=True)
+
+        # Loaded profiles in least to most recently used order, with their estimated sizes and the total
+        self.profiles = OrderedDict()
+        self.sizes = {}
+        self.resident_bytes = 0
+
+        # Session state of evicted profiles (whether the owner has viewed it, and its command metrics), which is not
+        # part of the state on disk and is handed back when the profile is loaded again
+        self.sessions = {}
+
+        # Cache metrics
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, profile_id):
+        # Return the profile's MyFacebook, loading it from its directory on first access
+        facebook = self.profiles.get(profile_id)
+        if facebook is not None:
+            self.hits += 1
+            self.profiles.move_to_end(profile_id)
+            return facebook
+
+        # Profile ids name directories under the root, so they may not point anywhere else
+        if not profile_id or profile_id.startswith('.') or os.sep in profile_id:
+            raise ValueError(f"invalid profile id {profile_id!r}")
+
+        self.loads += 1
+        state_dir = os.path.join(self.root, profile_id)
+        os.makedirs(state_dir, exist_ok=True)
+
+        # The profile's write-ahead log and checkpoints are its state on disk between loads
+        facebook = MyFacebook(wal_dir=os.path.join(state_dir, "wal"), checkpoint_every=self.checkpoint_every,
+                              state_dir=state_dir, fresh=False)
+        if profile_id in self.sessions:
+            facebook.profile_owner_has_viewed, facebook.metrics = self.sessions.pop(profile_id)
+        self.profiles[profile_id] = facebook
+        self.sizes[profile_id] = 0
+        self.update_size(profile_id)
+        self.enforce_budget()
+        return facebook
+
+    def execute(self, profile_id, command):
+        # Run one command against a profile; end saves that profile instead of exiting
+        facebook = self.get(profile_id)
+        parts = command.split()
+
+        if parts and parts[0] == "end":
+            facebook.save()
+        else:
+            facebook.run_commands(profile_id, [(parts, command)])
+
+        self.update_size(profile_id)
+        self.enforce_budget()
+
+    def update_size(self, profile_id):
+        # Re-estimate a loaded profile's size and keep the resident total in step
+        size = estimate_bytes(self.profiles[profile_id])
+        self.resident_bytes += size - self.sizes[profile_id]
+        self.sizes[profile_id] = size
+
+    def over_budget(self):
+        return (self.resident_bytes > self.memory_budget or
+                self.max_profiles is not None and len(self.profiles) > self.max_profiles)
+
+    def enforce_budget(self):
+        # Evict least recently used profiles until the resident ones fit in the memory and open file budgets.
+        # Profiles with a viewer logged in or a transaction open are kept, since those live only in memory
+        most_recent = next(reversed(self.profiles), None)
+        for profile_id in list(self.profiles):
+            if not self.over_budget():
+                return
+            facebook = self.profiles[profile_id]
+            if profile_id != most_recent and facebook.current_viewer is None and facebook.transaction is None:
+                self.evict(profile_id)
+
+    def evict(self, profile_id):
+        # Checkpoint a profile to disk and drop it from memory, keeping its session state
+        # (a transaction still open when the host closes is rolled back rather than saved)
+        facebook = self.profiles.pop(profile_id)
+        self.resident_bytes -= self.sizes.pop(profile_id)
+        if facebook.transaction is not None:
+            facebook.abort()
+        self.sessions[profile_id] = (facebook.profile_owner_has_viewed, facebook.metrics)
+        facebook.save()
+        facebook.close()
+        self.evictions += 1
+
+    def metrics(self):
+        # Return the cache metrics
+        lookups = self.hits + self.loads
+        return {
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "resident_profiles": len(self.profiles),
+            "resident_bytes": self.resident_bytes,
+        }
+
+    def close(self):
+        # Save and unload every profile
+        for profile_id in list(self.profiles):
+            self.evict(profile_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host many MyFacebook profiles in one process")
+    parser.add_argument("commands_file", help="lines of '<profile> <command>', or - for stdin")
+    parser.add_argument("--root", default="profiles", help="directory holding one state directory per profile")
+    parser.add_argument("--budget-mb", type=float, default=256, help="memory budget for loaded profiles")
+    parser.add_argument("--max-profiles", type=int, metavar="N",
+                        help="most profiles loaded at once (default: what the open file limit allows)")
+    args = parser.parse_args()
+
+    host = ProfileHost(args.root, int(args.budget_mb * 1024 * 1024), max_profiles=args.max_profiles)
+    for line in stream_commands(args.commands_file):
+        profile_id, _, command = line.partition(' ')
+        host.execute(profile_id, command.strip())
+
+    metrics = host.metrics()
+    host.close()
+    print(' '.join(f"{name}={value:.3f}" if isinstance(value, float) else f"{name}={value}"
+                   for name, value in metrics.items()))
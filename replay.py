@@ -0,0 +1,131 @@
+import argparse
+import struct
+
+from access import MyFacebook, stream_commands
+
+# Compiled command scripts start with this magic number and format version
+MAGIC = b"MFBR"
+VERSION = 2
+
+# Opcodes are fixed, so a replay runs each command by indexing the handler table with its opcode byte.
+# New instructions are only ever appended here; any other line is stored raw
+OPCODES = ("friendadd", "viewby", "logout", "listadd", "friendlist", "postpicture", "chlst", "chmod", "chown",
+           "readcomments", "writecomments", "accessible", "accessmatrix", "stats", "begin", "commit", "abort", "end")
+OPCODE_OF = {instruction: opcode for opcode, instruction in enumerate(OPCODES)}
+
+# Opcode for lines whose instruction has no opcode; its only argument is the raw line
+RAW_OPCODE = 0xFF
+
+HEADER = struct.Struct("<4sB")
+COUNT = struct.Struct("<I")
+# Opcode and argument count (32 bits, so a bulk friendadd of any size fits)
+COMMAND = struct.Struct("<BI")
+
+
+def compile_script(source, destination):
+    # Compile a text command script into opcodes plus an interned string table
+    strings = {}
+    commands = []
+
+    def intern(text):
+        return strings.setdefault(text, len(strings))
+
+    for command in stream_commands(source):
+        parts = command.split()
+
+        # Unknown instructions keep the raw line so the "Invalid command" message is unchanged on replay
+        opcode = OPCODE_OF.get(parts[0])
+        if opcode is None:
+            commands.append((RAW_OPCODE, [intern(command)]))
+            continue
+
+        commands.append((opcode, [intern(part) for part in parts[1:]]))
+
+    with open(destination, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION))
+
+        # String table: count, then length-prefixed UTF-8 strings in id order
+        file.write(COUNT.pack(len(strings)))
+        for text in strings:
+            data = text.encode()
+            file.write(COUNT.pack(len(data)))
+            file.write(data)
+
+        # Commands: opcode, argument count and the string ids of the arguments
+        for opcode, arguments in commands:
+            file.write(COMMAND.pack(opcode, len(arguments)))
+            file.write(struct.pack(f"<{len(arguments)}I", *arguments))
+
+    return len(commands)
+
+
+def load_program(path):
+    # Decode a compiled script into (opcode, parts, command) entries; command is only kept for raw lines
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    magic, version = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a compiled command script (version {VERSION})")
+    offset = HEADER.size
+
+    (string_count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    strings = []
+    for _ in range(string_count):
+        (length,) = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        strings.append(data[offset:offset + length].decode())
+        offset += length
+
+    program = []
+    while offset < len(data):
+        opcode, argument_count = COMMAND.unpack_from(data, offset)
+        offset += COMMAND.size
+        arguments = [strings[string_id] for string_id in struct.unpack_from(f"<{argument_count}I", data, offset)]
+        offset += argument_count * COUNT.size
+
+        if opcode == RAW_OPCODE:
+            program.append((opcode, arguments[0].split(), arguments[0]))
+        else:
+            program.append((opcode, [OPCODES[opcode]] + arguments, None))
+
+    return program
+
+
+def replay(facebook, path, program=None):
+    # Run a compiled script (or an already loaded program) with the same output and audit log as the text path
+    handlers = [facebook.HANDLERS[instruction] for instruction in OPCODES]
+
+    def execute(opcode, parts, command):
+        # Dispatch on the opcode; only raw lines go through the instruction name lookup
+        if opcode == RAW_OPCODE:
+            facebook.execute_parts(parts, command)
+        else:
+            facebook.execute_handler(handlers[opcode], parts)
+
+    def commands():
+        yield from program if program is not None else load_program(path)
+
+    facebook.run_commands(path, commands(), execute)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile command scripts to a binary replay format and replay them")
+    subcommands = parser.add_subparsers(dest="action", required=True)
+
+    compile_parser = subcommands.add_parser("compile", help="compile a text command script")
+    compile_parser.add_argument("source")
+    compile_parser.add_argument("destination")
+
+    run_parser = subcommands.add_parser("run", help="replay a compiled command script")
+    run_parser.add_argument("program")
+    run_parser.add_argument("--comment-store", metavar="DIR")
+
+    args = parser.parse_args()
+
+    if args.action == "compile":
+        count = compile_script(args.source, args.destination)
+        print(f"Compiled {count} commands from {args.source} into {args.destination}")
+    else:
+        replay(MyFacebook(comment_store_dir=args.comment_store), args.program)
@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import os
+import signal
+
+from access import MyFacebook
+
+
+class Session:
+    def __init__(self):
+        # Each connection has its own viewer; None until its viewby succeeds
+        self.viewer = None
+
+        # and its own open transaction (begin ... commit/abort), if any
+        self.transaction = None
+
+
+class MyFacebookServer:
+    def __init__(self, facebook, socket_path):
+        # Initialize the server with the MyFacebook state shared by every session
+        self.facebook = facebook
+        self.socket_path = socket_path
+        self._server = None
+
+        # The session whose transaction is open. Its staged changes are already applied to the shared managers,
+        # so the other sessions wait until it commits or aborts instead of seeing (or overwriting) them
+        self.transaction_session = None
+        self._transaction_closed = asyncio.Condition()
+
+    def execute(self, session, command):
+        # Run one command as the session's viewer and return the lines it produced.
+        # Nothing in here awaits, so each command runs to completion before the next one starts and
+        # mutations to the shared managers are serialized by the event loop.
+        facebook = self.facebook
+        output = []
+        facebook.output = output.append
+        facebook.current_viewer = session.viewer
+        facebook.transaction = session.transaction
+        try:
+            facebook.run_commands("connection", [(command.split(), command)])
+        finally:
+            session.viewer = facebook.current_viewer
+            session.transaction = facebook.transaction
+            facebook.current_viewer = None
+            facebook.transaction = None
+            facebook.output = print
+
+        # Hold the other sessions back while this session's transaction is open
+        if session.transaction is not None:
+            self.transaction_session = session
+        elif self.transaction_session is session:
+            self.transaction_session = None
+
+        return '\n'.join(output).split('\n') if output else []
+
+    async def execute_when_free(self, session, command):
+        # Wait until no other session has a transaction open, then execute the command
+        async with self._transaction_closed:
+            await self._transaction_closed.wait_for(lambda: self.transaction_session in (None, session))
+            lines = self.execute(session, command)
+            self._transaction_closed.notify_all()
+        return lines
+
+    async def save_when_free(self, session):
+        # Save the shared state once no other session has a transaction open, so staged changes never reach the disk
+        async with self._transaction_closed:
+            await self._transaction_closed.wait_for(lambda: self.transaction_session in (None, session))
+            self.facebook.save()
+
+    async def abort_transaction(self, session):
+        # Roll back a session's open transaction (its connection ended without commit or abort)
+        if session.transaction is not None:
+            await self.execute_when_free(session, "abort")
+
+    async def handle_connection(self, reader, writer):
+        # Serve the command language line by line; each response is a line count followed by the lines
+        session = Session()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                command = line.decode().strip()
+                if not command:
+                    continue
+
+                # end saves the shared state and closes this connection instead of stopping the server
+                # (an open transaction of the session is rolled back, and another session's is waited for)
+                if command.split()[0] == "end":
+                    await self.abort_transaction(session)
+                    await self.save_when_free(session)
+                    writer.write(b"0\n")
+                    await writer.drain()
+                    break
+
+                lines = await self.execute_when_free(session, command)
+                writer.write(f"{len(lines)}\n".encode() + ''.join(f"{line}\n" for line in lines).encode())
+                await writer.drain()
+        except ConnectionError:
+            # The client went away mid-response
+            pass
+        finally:
+            # Roll back the open transaction and log out the viewer of a connection that closed without doing so
+            await self.abort_transaction(session)
+            if session.viewer is not None:
+                await self.execute_when_free(session, "logout")
+            writer.close()
+
+    async def serve(self):
+        # Listen on the Unix domain socket until SIGINT/SIGTERM, then save the state
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = await asyncio.start_unix_server(self.handle_connection, path=self.socket_path)
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, stop.set)
+
+        async with self._server:
+            print(f"Serving MyFacebook on {self.socket_path}")
+            await stop.wait()
+
+        # Changes staged by a transaction that is still open are not saved
+        if self.transaction_session is not None:
+            self.execute(self.transaction_session, "abort")
+        self.facebook.save()
+        self.facebook.close()
+        os.remove(self.socket_path)
+
+
+async def send_command(reader, writer, command):
+    # Client helper: send a command and return the lines of its response
+    writer.write(f"{command}\n".encode())
+    await writer.drain()
+
+    count = int(await reader.readline())
+    return [(await reader.readline()).decode().rstrip('\n') for _ in range(count)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve MyFacebook commands to many sessions over a Unix socket")
+    parser.add_argument("--socket", default="myfacebook.sock", help="path of the Unix domain socket")
+    parser.add_argument("--comment-store", metavar="DIR")
+    parser.add_argument("--wal", metavar="DIR")
+    args = parser.parse_args()
+
+    facebook = MyFacebook(comment_store_dir=args.comment_store, wal_dir=args.wal)
+    asyncio.run(MyFacebookServer(facebook, args.socket).serve())
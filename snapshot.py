@@ -0,0 +1,347 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+from friend_management import FriendRegistry, read_friends
+from list_management import read_lists
+from picture_management import DecisionCache, PictureTable, compile_permissions, read_pictures, render_permissions
+
+# Snapshot layout (little-endian, every section starts on an 8-byte boundary):
+#   header     magic, version, then the (offset, length) of each section below
+#   friends    name section: friend names in registry order (the first one is the profile owner)
+#   lists      name section: list names
+#   pictures   name section: picture names in posting order
+#   strings    name section: owner, list and member names referred to by id
+#   members    u32[lists + 1] offsets into member_ids, then u32 member_ids (string ids; "@name" for a nested list)
+#   owners     u32 string id per picture
+#   picture lists  u32 string id per picture
+#   modes      u8 permission bits per picture
+#
+# A name section is u32 count, u32 capacity, u32 offsets[count + 1] into the name bytes, a u32 open addressing
+# hash table of capacity slots (position + 1, 0 for an empty slot, probed linearly from crc32(name)) and the
+# concatenated UTF-8 names. Names are only decoded when they are first looked up.
+MAGIC = b"MFBS"
+VERSION = 1
+SECTIONS = ("friends", "lists", "pictures", "strings", "members", "owners", "picture_lists", "modes")
+HEADER = struct.Struct(f"<4sHH{2 * len(SECTIONS)}Q")
+NAMES_HEADER = struct.Struct("<II")
+
+
+class SnapshotNames:
+    def __init__(self, buffer, offset):
+        # Sequence view of a name section; names appended after loading are kept in memory
+        self.count, self.capacity = NAMES_HEADER.unpack_from(buffer, offset)
+        start = offset + NAMES_HEADER.size
+        self.offsets = buffer[start:start + 4 * (self.count + 1)].cast('I')
+        start += 4 * (self.count + 1)
+        self.slots = buffer[start:start + 4 * self.capacity].cast('I')
+        start += 4 * self.capacity
+        self.data = buffer[start:start + self.offsets[self.count]]
+
+        # Names decoded (or overwritten) so far, and names appended after the snapshot ones
+        self.decoded = {}
+        self.extra = []
+
+    def find(self, name):
+        # Return the position of a name in the snapshot (None if it is not there) without decoding other names
+        if not self.count:
+            return None
+
+        data = name.encode()
+        mask = self.capacity - 1
+        slot = zlib.crc32(data) & mask
+        while True:
+            position = self.slots[slot]
+            if not position:
+                return None
+            if self.data[self.offsets[position - 1]:self.offsets[position]] == data:
+                return position - 1
+            slot = (slot + 1) & mask
+
+    def append(self, name):
+        self.extra.append(name)
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if position >= self.count:
+            return self.extra[position - self.count]
+
+        if position not in self.decoded:
+            self.decoded[position] = bytes(self.data[self.offsets[position]:self.offsets[position + 1]]).decode()
+        return self.decoded[position]
+
+    def __setitem__(self, position, name):
+        if position >= self.count:
+            self.extra[position - self.count] = name
+        else:
+            self.decoded[position] = name
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def __len__(self):
+        return self.count + len(self.extra)
+
+
+class SnapshotIndex:
+    def __init__(self, names):
+        # Mapping view from name to position over a SnapshotNames section, with in-memory additions and removals
+        self.names = names
+        self.added = {}
+        self.removed = set()
+
+    def get(self, name, default=None):
+        position = self.added.get(name)
+        if position is not None:
+            return position
+
+        position = self.names.find(name)
+        if position is None or position in self.removed:
+            return default
+        return position
+
+    def pop(self, name, default=None):
+        if name in self.added:
+            return self.added.pop(name)
+
+        position = self.get(name)
+        if position is None:
+            return default
+        self.removed.add(position)
+        return position
+
+    def __getitem__(self, name):
+        position = self.get(name)
+        if position is None:
+            raise KeyError(name)
+        return position
+
+    def __setitem__(self, name, position):
+        self.added[name] = position
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __iter__(self):
+        # Snapshot names first (in snapshot order), then the names added since
+        for position in range(self.names.count):
+            if position not in self.removed:
+                yield self.names[position]
+        yield from self.added
+
+    def __len__(self):
+        return self.names.count - len(self.removed) + len(self.added)
+
+
+class Snapshot:
+    def __init__(self, filename):
+        # Map a snapshot file and check its header; nothing else is read until it is used
+        if sys.byteorder != "little":
+            raise ValueError("snapshots can only be mapped on little-endian machines")
+
+        self.filename = filename
+        with open(filename, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buffer = memoryview(self._map)
+
+        header = HEADER.unpack_from(self.buffer, 0)
+        if header[0] != MAGIC:
+            raise ValueError(f"{filename} is not a MyFacebook snapshot")
+        if header[1] != VERSION:
+            raise ValueError(f"{filename} has unsupported snapshot version {header[1]}")
+        self.sections = {name: (header[3 + 2 * index], header[4 + 2 * index]) for index, name in enumerate(SECTIONS)}
+
+    def close(self):
+        # Unmap the file (every name table and column taken from the map must have been dropped)
+        self.buffer.release()
+        self._map.close()
+
+    def names(self, section):
+        return SnapshotNames(self.buffer, self.sections[section][0])
+
+    def column(self, section, typecode):
+        # Copy a fixed-width column out of the map (a memcpy, far cheaper than decoding records)
+        offset, length = self.sections[section]
+        column = array(typecode)
+        column.frombytes(self.buffer[offset:offset + length])
+        return column
+
+    def lists(self):
+        # Yield (list name, members) for each list
+        list_names = self.names("lists")
+        strings = self.names("strings")
+        offset, length = self.sections["members"]
+        members = self.buffer[offset:offset + length].cast('I')
+        member_offsets, member_ids = members[:list_names.count + 1], members[list_names.count + 1:]
+        for position in range(list_names.count):
+            yield list_names[position], [strings[string_id] for string_id in
+                                         member_ids[member_offsets[position]:member_offsets[position + 1]]]
+
+
+def encode_names(names):
+    # Encode a name section (see the layout above)
+    encoded = [name.encode() for name in names]
+    offsets = array('I', [0])
+    total = 0
+    for data in encoded:
+        total += len(data)
+        offsets.append(total)
+
+    # Keep the hash table at most half full so probes stay short
+    capacity = 1
+    while capacity < 2 * len(encoded):
+        capacity *= 2
+    mask = capacity - 1
+    slots = array('I', bytes(4 * capacity))
+    for position, data in enumerate(encoded):
+        slot = zlib.crc32(data) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = position + 1
+
+    return NAMES_HEADER.pack(len(encoded), capacity) + offsets.tobytes() + slots.tobytes() + b"".join(encoded)
+
+
+def write_snapshot(filename, friends, lists, pictures):
+    # Write a snapshot from friend names, (list name, members) pairs and (picture, owner, list, mode) tuples
+    strings = {}
+
+    def intern(name):
+        string_id = strings.get(name)
+        if string_id is None:
+            string_id = strings[name] = len(strings)
+        return string_id
+
+    list_names = []
+    member_offsets = array('I', [0])
+    member_ids = array('I')
+    for list_name, members in lists:
+        list_names.append(list_name)
+        member_ids.extend(intern(member) for member in members)
+        member_offsets.append(len(member_ids))
+
+    picture_names = []
+    owners = array('I')
+    picture_lists = array('I')
+    modes = bytearray()
+    for picture_name, owner, list_name, mode in pictures:
+        picture_names.append(picture_name)
+        owners.append(intern(owner))
+        picture_lists.append(intern(list_name))
+        modes.append(mode)
+
+    sections = [encode_names(friends), encode_names(list_names), encode_names(picture_names), encode_names(strings),
+                member_offsets.tobytes() + member_ids.tobytes(), owners.tobytes(), picture_lists.tobytes(),
+                bytes(modes)]
+
+    # Lay the sections out after the header, each padded to an 8-byte boundary
+    positions = []
+    offset = HEADER.size
+    for section in sections:
+        offset += -offset % 8
+        positions += [offset, len(section)]
+        offset += len(section)
+
+    # Publish the snapshot atomically; a map of the previous file stays valid
+    temporary = filename + ".tmp"
+    with open(temporary, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, *positions))
+        for section in sections:
+            file.write(bytes(-file.tell() % 8))
+            file.write(section)
+    os.replace(temporary, filename)
+
+
+def save_snapshot(filename, friends_manager, list_manager, picture_manager):
+    # Write the state of the three managers to a snapshot
+    table = picture_manager.pictures
+    pictures = ((table.names[row], table.strings[table.owners[row]], table.strings[table.lists[row]], table.modes[row])
+                for row in range(len(table)))
+    lists = ((list_name, list_manager.entries_of(list_name)) for list_name in list_manager.lists)
+    write_snapshot(filename, list(friends_manager.friends), lists, pictures)
+
+
+def load_snapshot(filename, friends_manager, list_manager, picture_manager):
+    # Replace the managers' state with a snapshot's. Friend, picture, owner and list names stay in the map and are
+    # decoded when first touched, and the picture access indexes are built on first use, so loading only copies
+    # the fixed-width picture columns. Lists are loaded eagerly to keep the membership reverse index complete
+    snapshot = Snapshot(filename)
+
+    friends = FriendRegistry()
+    friends._names = snapshot.names("friends")
+    friends._ids = SnapshotIndex(friends._names)
+    friends_manager.friends = friends
+
+    list_manager.clear()
+    for list_name, members in snapshot.lists():
+        list_manager.set_list(list_name, members)
+
+    table = PictureTable()
+    table.names = snapshot.names("pictures")
+    table.rows = SnapshotIndex(table.names)
+    table.strings = snapshot.names("strings")
+    table.string_ids = SnapshotIndex(table.strings)
+    table.owners = snapshot.column("owners", 'I')
+    table.lists = snapshot.column("picture_lists", 'I')
+    table.modes = bytearray(snapshot.column("modes", 'B'))
+    picture_manager.pictures = table
+    picture_manager.decisions = DecisionCache()
+
+    return snapshot
+
+
+def text_to_snapshot(directory, filename):
+    # Convert friends.txt, lists.txt and pictures.txt in a directory to a snapshot
+    pictures = ((picture_name, owner, list_name, compile_permissions(*permissions))
+                for picture_name, owner, list_name, permissions in read_pictures(os.path.join(directory, "pictures.txt")))
+    write_snapshot(filename, list(read_friends(os.path.join(directory, "friends.txt"))),
+                   read_lists(os.path.join(directory, "lists.txt")), pictures)
+
+
+def snapshot_to_text(filename, directory):
+    # Convert a snapshot to friends.txt, lists.txt and pictures.txt in a directory (in the managers' text formats)
+    snapshot = Snapshot(filename)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "friends.txt"), 'w') as f:
+        for friend in snapshot.names("friends"):
+            f.write(friend + "\n")
+
+    with open(os.path.join(directory, "lists.txt"), 'w') as f:
+        for list_name, members in snapshot.lists():
+            f.write(f"{list_name}: {' '.join(members)}\n")
+
+    strings = snapshot.names("strings")
+    owners = snapshot.column("owners", 'I')
+    lists = snapshot.column("picture_lists", 'I')
+    modes = snapshot.column("modes", 'B')
+    with open(os.path.join(directory, "pictures.txt"), 'w') as f:
+        for row, picture_name in enumerate(snapshot.names("pictures")):
+            f.write(f"{picture_name}: {strings[owners[row]]} {strings[lists[row]]} "
+                    f"{' '.join(render_permissions(modes[row]))}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert between the text state files and a binary snapshot")
+    subcommands = parser.add_subparsers(dest="action", required=True)
+
+    to_snapshot = subcommands.add_parser("to-snapshot", help="pack friends.txt, lists.txt and pictures.txt")
+    to_snapshot.add_argument("directory", help="directory holding the text files")
+    to_snapshot.add_argument("snapshot")
+
+    to_text = subcommands.add_parser("to-text", help="unpack a snapshot into friends.txt, lists.txt and pictures.txt")
+    to_text.add_argument("snapshot")
+    to_text.add_argument("directory", help="directory to write the text files to")
+
+    args = parser.parse_args()
+
+    if args.action == "to-snapshot":
+        text_to_snapshot(args.directory, args.snapshot)
+    else:
+        snapshot_to_text(args.snapshot, args.directory)
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from access import MyFacebook
+
+
+def run(facebook, commands):
+    # Execute commands as a script would (end exits the run) and return the lines they printed
+    output = []
+    facebook.output = output.append
+    try:
+        facebook.run_commands("test", [(command.split(), command) for command in commands])
+    except SystemExit:
+        pass
+    return '\n'.join(output).split('\n') if output else []
+
+
+@pytest.fixture
+def make_facebook(tmp_path):
+    # Build MyFacebook instances keeping their state under tmp_path, closed when the test ends
+    created = []
+
+    def make(state_dir=tmp_path, **options):
+        os.makedirs(state_dir, exist_ok=True)
+        facebook = MyFacebook(state_dir=str(state_dir), **options)
+        created.append(facebook)
+        return facebook
+
+    yield make
+    for facebook in created:
+        facebook.close()
@@ -0,0 +1,51 @@
+import itertools
+
+import pytest
+
+from tests.conftest import run
+
+np = pytest.importorskip("numpy")
+
+from access_matrix import AccessMatrix  # noqa: E402
+
+MODES = ["rw", "r-", "-w", "--"]
+
+
+def build_profile(facebook):
+    # Friends in plain and nested lists, and pictures with every owner, list and mode combination
+    commands = ["friendadd alice", "viewby alice"] + [f"friendadd f{number}" for number in range(11)] + [
+        "listadd team", "listadd club", "listadd all", "friendlist f1 team", "friendlist f2 team",
+        "friendlist f3 club", "friendlist team all", "friendlist f4 all"]
+    owners = ["alice", "f1", "f5"]
+    lists = ["nil", "team", "club", "all"]
+    for number, (owner, list_name, modes) in enumerate(itertools.product(owners, lists,
+                                                                         itertools.product(MODES, repeat=3))):
+        picture = f"p{number}.txt"
+        commands += [f"postpicture {picture}", f"chmod {picture} {' '.join(modes)}"]
+        if list_name != "nil":
+            commands.append(f"chlst {picture} {list_name}")
+        if owner != "alice":
+            commands.append(f"chown {picture} {owner}")
+    run(facebook, commands)
+
+
+def test_matrix_matches_check_access(make_facebook):
+    facebook = make_facebook(comment_cache_bytes=0)
+    build_profile(facebook)
+    matrix = AccessMatrix.build(facebook.friends_manager, facebook.list_manager, facebook.picture_manager)
+
+    pictures = facebook.picture_manager
+    for friend, picture, operation in itertools.product(facebook.friends_manager.friends, pictures.pictures, "rw"):
+        assert matrix.allowed(friend, picture, operation) == \
+            pictures.check_access(picture, friend, operation, facebook.list_manager), (friend, picture, operation)
+
+
+def test_exports_never_replace_a_picture(make_facebook, tmp_path):
+    facebook = make_facebook()
+    output = run(facebook, ["friendadd alice", "viewby alice", "postpicture p.csv", "writecomments p.csv hi",
+                            "postpicture q.labels.txt", "accessmatrix p.csv", "accessmatrix q.npy"])
+
+    assert output[-2:] == ["Error with accessmatrix: p.csv is a picture",
+                           "Error with accessmatrix: q.labels.txt is a picture"]
+    assert (tmp_path / "p.csv").read_text() == "p.csv\nhi\n"
+    assert not (tmp_path / "q.npy").exists()
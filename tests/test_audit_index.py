@@ -0,0 +1,40 @@
+import time
+
+from audit_index import AuditStore, parse_time, query
+from tests.conftest import run
+
+
+def test_query_by_fields_and_time(make_facebook, tmp_path):
+    audit = tmp_path / "audit"
+    facebook = make_facebook(audit_index_dir=str(audit))
+    run(facebook, ["friendadd alice", "viewby alice", "friendadd bob", "friendadd carl", "listadd team",
+                   "friendlist bob carl team", "friendlist alice team", "postpicture p.txt", "logout",
+                   "viewby bob", "readcomments p.txt"])
+    facebook.audit_store.close()
+
+    denied = list(query(str(audit), friend="bob", picture="p.txt", outcome="denied_read"))
+    assert [record["message"] for record in denied] == ["Friend bob denied read access to p.txt"]
+
+    # Bulk friendlist records the list (its last argument), not the second friend
+    listed = list(query(str(audit), instruction="friendlist"))
+    assert [record["list"] for record in listed] == ["team", "team"]
+    assert list(query(str(audit), list="carl")) == []
+
+    assert list(query(str(audit), since=time.time() + 60)) == []
+    assert len(list(query(str(audit), since=parse_time("1h")))) == 11
+
+
+def test_segments_are_sealed_and_an_unsealed_tail_is_recovered(tmp_path):
+    store = AuditStore(str(tmp_path), segment_records=2)
+    for number in range(5):
+        store.append("alice", "writecomments", f"p{number}.txt", None, "success", f"message {number}")
+    store.flush()
+
+    # The third segment is still open: it is indexed on the fly, and reopening the store continues it
+    assert [record["picture"] for record in query(str(tmp_path), picture="p4.txt")] == ["p4.txt"]
+    store._active.close()
+    store._active = None
+    store = AuditStore(str(tmp_path), segment_records=2)
+    store.append("alice", "writecomments", "p5.txt", None, "success", "message 5")
+    store.close()
+    assert [record["message"] for record in query(str(tmp_path))] == [f"message {number}" for number in range(6)]
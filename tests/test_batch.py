@@ -0,0 +1,37 @@
+from batch import run_batch
+
+
+def write_scripts(tmp_path, count):
+    scripts = []
+    for number in range(count):
+        script = tmp_path / f"script{number}.txt"
+        friends = ''.join(f"friendadd f{number}_{friend}\n" for friend in range(number % 4))
+        script.write_text(f"friendadd owner{number}\nviewby owner{number}\n{friends}bogus {number}\nend\n")
+        scripts.append(str(script))
+    return scripts
+
+
+def expected_audit(scripts):
+    # Each script's audit log, under its header, in the order the scripts were given
+    lines = []
+    for number, script in enumerate(scripts):
+        lines += [f"==> {script} <==", f"Friend owner{number} added", f"Friend owner{number} views the profile"]
+        lines += [f"Friend f{number}_{friend} added" for friend in range(number % 4)]
+        lines.append(f"Invalid command: bogus {number}")
+    return lines
+
+
+def test_merged_audit_is_in_input_order(tmp_path):
+    scripts = write_scripts(tmp_path, 12)
+    merged = tmp_path / "merged.txt"
+    assert run_batch(scripts, str(merged), workers=3) == 12
+    assert merged.read_text().splitlines() == expected_audit(scripts)
+
+
+def test_rerun_with_kept_work_directory(tmp_path):
+    scripts = write_scripts(tmp_path, 3)
+    work = tmp_path / "work"
+    for _ in range(2):
+        run_batch(scripts, str(tmp_path / "merged.txt"), workers=2, work_root=str(work), keep=True)
+    assert (tmp_path / "merged.txt").read_text().splitlines() == expected_audit(scripts)
+    assert sorted(path.name for path in work.iterdir()) == ["000000", "000001", "000002"]
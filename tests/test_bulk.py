@@ -0,0 +1,48 @@
+from tests.conftest import run
+
+
+def test_friendadd_file_and_friendlist_many(make_facebook, tmp_path):
+    names = tmp_path / "new.txt"
+    names.write_text("bob\ncarl\nbob\n")
+    facebook = make_facebook()
+    output = run(facebook, ["friendadd alice", "viewby alice", f"friendadd @{names} dave", "listadd team",
+                            "friendlist bob carl team"])
+
+    assert output[-3:] == ["3 friends added", "List team added", "2 friends added to list team"]
+    assert list(facebook.friends_manager.friends) == ["alice", "bob", "carl", "dave"]
+    assert set(facebook.list_manager.members_of("team")) == {"bob", "carl"}
+
+
+def test_invalid_names_in_file_are_reported_and_nothing_is_added(make_facebook, tmp_path):
+    names = tmp_path / "new.txt"
+    names.write_text("bob\njohn smith\n\n@carl\n")
+    facebook = make_facebook()
+    output = run(facebook, ["friendadd alice", "viewby alice", f"friendadd @{names}"])
+
+    assert output[-3:] == [f"Error with friendadd: invalid friend name 'john smith' in {names} line 2",
+                           f"Error with friendadd: invalid friend name '' in {names} line 3",
+                           f"Error with friendadd: invalid friend name '@carl' in {names} line 4"]
+    assert list(facebook.friends_manager.friends) == ["alice"]
+
+
+def test_glob_chmod_changes_the_viewers_matching_pictures(make_facebook):
+    facebook = make_facebook()
+    run(facebook, ["friendadd alice", "viewby alice", "friendadd bob", "postpicture a.jpg", "postpicture b.jpg",
+                   "postpicture c.txt", "logout", "viewby bob", "postpicture d.jpg", "chmod *.jpg rw rw rw"])
+
+    permissions = facebook.picture_manager.permissions_of
+    assert permissions("d.jpg") == ("rw", "rw", "rw")
+    assert permissions("a.jpg") == permissions("c.txt") == ("rw", "--", "--")
+
+
+def test_empty_name_file_is_reported(make_facebook, tmp_path):
+    empty = tmp_path / "empty.txt"
+    empty.write_text("")
+    facebook = make_facebook()
+    output = run(facebook, ["friendadd alice", "viewby alice", "listadd team", f"friendadd @{empty}",
+                            f"friendlist @{empty} team"])
+
+    assert output[-2:] == ["Error with friendadd: no friend names given",
+                           "Error with friendlist: no friend names given"]
+    assert facebook.metrics.outcomes[("friendadd", "no_friend_names")] == 1
+    assert facebook.metrics.outcomes[("friendlist", "no_friend_names")] == 1
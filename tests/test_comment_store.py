@@ -0,0 +1,29 @@
+from comment_store import CommentStore
+from tests.conftest import run
+
+
+def test_index_survives_reload_with_any_picture_name(tmp_path):
+    store = CommentStore(str(tmp_path), segment_bytes=64)
+    for picture_name in ("reset", "R", "A", "p.txt"):
+        store.create(picture_name, picture_name)
+        for number in range(5):
+            store.append(picture_name, f"{picture_name} comment {number}")
+    store.create("p.txt", "p")
+    store.append("p.txt", "after repost")
+    store.close()
+
+    store = CommentStore(str(tmp_path), segment_bytes=64)
+    for picture_name in ("reset", "R", "A"):
+        assert store.read(picture_name) == [picture_name] + [f"{picture_name} comment {number}" for number in range(5)]
+    assert store.read("p.txt") == ["p", "after repost"]
+    assert store.read("reset", -2) == ["reset comment 3", "reset comment 4"]
+    store.close()
+
+
+def test_paged_reads_through_facebook(make_facebook, tmp_path):
+    facebook = make_facebook(comment_store_dir=str(tmp_path / "comments"))
+    commands = ["friendadd alice", "viewby alice", "postpicture reset"]
+    commands += [f"writecomments reset comment {number}" for number in range(5)]
+    output = run(facebook, commands + ["readcomments reset last 2", "readcomments reset from 1 2"])
+    assert output[-6:] == ["Friend alice reads reset as:", "comment 3", "comment 4",
+                           "Friend alice reads reset as:", "comment 1", "comment 2"]
@@ -0,0 +1,47 @@
+import pytest
+
+from picture_management import DecisionCache
+from tests.conftest import run
+
+SETUP = ["friendadd alice", "viewby alice", "friendadd bob", "friendadd carl", "listadd team", "friendlist bob team",
+         "postpicture a.jpg", "postpicture b.jpg", "chlst a.jpg team", "chmod a.jpg rw r- --"]
+KEYS = {(viewer, picture, 'r') for viewer in ("bob", "carl") for picture in ("a.jpg", "b.jpg")}
+
+
+def warm(facebook):
+    # Decide every key once so they are all cached, and return the decisions
+    pictures = facebook.picture_manager
+    return {key: pictures.check_access(key[1], key[0], key[2], facebook.list_manager) for key in KEYS}
+
+
+@pytest.mark.parametrize("command, dropped", [
+    ("chmod a.jpg rw rw rw", {key for key in KEYS if key[1] == "a.jpg"}),
+    ("chlst b.jpg team", {key for key in KEYS if key[1] == "b.jpg"}),
+    ("chown a.jpg carl", {key for key in KEYS if key[1] == "a.jpg"}),
+    ("friendlist carl team", {key for key in KEYS if key[0] == "carl"}),
+])
+def test_changes_invalidate_exactly_the_affected_decisions(make_facebook, command, dropped):
+    facebook = make_facebook()
+    run(facebook, SETUP)
+    warm(facebook)
+
+    run(facebook, [command])
+    assert set(facebook.picture_manager.decisions.decisions) == KEYS - dropped
+
+    # The decisions made again agree with evaluating the rules from scratch
+    pictures = facebook.picture_manager
+    for (viewer, picture, operation), allowed in warm(facebook).items():
+        assert allowed == pictures._evaluate_access(pictures.pictures.rows[picture], viewer, operation,
+                                                    facebook.list_manager)
+
+
+def test_cache_keeps_the_most_recently_used_decisions():
+    cache = DecisionCache(max_entries=2)
+    cache.put(("bob", "a.jpg", 'r'), True)
+    cache.put(("bob", "b.jpg", 'r'), False)
+    cache.get(("bob", "a.jpg", 'r'))
+    cache.put(("carl", "c.jpg", 'r'), True)
+
+    assert list(cache.decisions) == [("bob", "a.jpg", 'r'), ("carl", "c.jpg", 'r')]
+    assert "b.jpg" not in cache.by_picture
+    assert cache.by_viewer["bob"] == {("bob", "a.jpg", 'r')}
@@ -0,0 +1,28 @@
+import os
+
+from engine import Engine
+
+
+def test_reset_forgets_the_snapshot_and_the_comment_store(tmp_path):
+    snapshot = str(tmp_path / "state.mfbs")
+    comments = str(tmp_path / "comments")
+    engine = Engine(str(tmp_path / "state"), snapshot=snapshot, comment_store_dir=comments)
+    for command in ["friendadd alice", "viewby alice", "postpicture a.jpg", "writecomments a.jpg hello"]:
+        engine.execute(command)
+    engine.end()
+
+    # The next engine maps the snapshot and finds the comments again
+    engine = Engine(str(tmp_path / "state"), snapshot=snapshot, comment_store_dir=comments)
+    assert engine.mapped_snapshot is not None
+    assert engine.comment_store.count("a.jpg") == 2
+    for command in ["viewby alice", "readcomments a.jpg", "chmod a.jpg rw r- --", "accessible alice r"]:
+        assert engine.execute(command).outcome == "success"
+
+    engine.reset()
+    assert not os.path.exists(snapshot)
+    assert engine.mapped_snapshot is None
+    assert list(engine.friends_manager.friends) == []
+    assert "a.jpg" not in engine.comment_store.positions
+
+    assert engine.execute("friendadd bob").messages == ["Friend bob added"]
+    engine.end()
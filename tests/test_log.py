@@ -0,0 +1,67 @@
+import gc
+import threading
+import time
+import weakref
+
+from log import Logger
+
+
+def test_loggers_share_one_writer_thread(tmp_path):
+    loggers = [Logger(str(tmp_path / f"audit{number}.txt"), flush_every=2) for number in range(50)]
+    writers = [thread for thread in threading.enumerate() if thread.name == "audit-writer"]
+    assert len(writers) == 1
+
+    for logger in loggers:
+        logger.log_action("one")
+        logger.log_action("two")
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and (tmp_path / "audit49.txt").read_text() != "one\ntwo\n":
+        time.sleep(0.01)
+    assert all((tmp_path / f"audit{number}.txt").read_text() == "one\ntwo\n" for number in range(50))
+
+    for logger in loggers:
+        logger.close()
+
+
+def test_time_policy_flushes_in_the_background(tmp_path):
+    logger = Logger(str(tmp_path / "audit.txt"), flush_policy="time", flush_interval=0.05)
+    logger.log_action("tick")
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not (tmp_path / "audit.txt").read_text():
+        time.sleep(0.01)
+    assert (tmp_path / "audit.txt").read_text() == "tick\n"
+    logger.close()
+
+
+def test_closed_logger_is_released(tmp_path):
+    logger = Logger(str(tmp_path / "audit.txt"))
+    logger.log_action("kept")
+    logger.close()
+    assert (tmp_path / "audit.txt").read_text() == "kept\n"
+
+    reference = weakref.ref(logger)
+    del logger
+    gc.collect()
+    assert reference() is None
+
+
+def test_rotation(tmp_path):
+    logger = Logger(str(tmp_path / "audit.txt"), flush_policy="line", max_bytes=10, backup_count=2)
+    for number in range(4):
+        logger.log_action(f"line {number} ..")
+    logger.close()
+    assert (tmp_path / "audit.txt.1").read_text() == "line 3 ..\n"
+    assert (tmp_path / "audit.txt.2").read_text() == "line 2 ..\n"
+    assert not (tmp_path / "audit.txt.3").exists()
+
+
+def test_facebook_passes_the_audit_options(make_facebook, tmp_path):
+    facebook = make_facebook(audit_flush_policy="line", audit_max_bytes=40, audit_backup_count=1)
+    facebook.output = lambda message: None
+    facebook.execute_command("friendadd alice")
+    assert (tmp_path / "audit.txt").read_text() == "Friend alice added\n"
+
+    facebook.execute_command("viewby alice")
+    facebook.execute_command("listadd team")
+    assert (tmp_path / "audit.txt.1").read_text() == "Friend alice added\nFriend alice views the profile\n"
+    assert (tmp_path / "audit.txt").read_text() == "List team added\n"
@@ -0,0 +1,19 @@
+from tests.conftest import run
+
+
+def test_metrics_are_only_written_when_asked_for(make_facebook, tmp_path):
+    run(make_facebook(tmp_path / "default"), ["friendadd alice", "end"])
+    assert not (tmp_path / "default" / "metrics.prom").exists()
+
+    metrics = tmp_path / "metrics.prom"
+    run(make_facebook(tmp_path / "metrics", metrics_path=str(metrics)), ["friendadd alice", "end"])
+    assert 'myfacebook_commands_total{instruction="friendadd",outcome="success"} 1' in metrics.read_text()
+
+
+def test_only_the_configured_metrics_file_is_reserved(make_facebook, tmp_path):
+    output = run(make_facebook(tmp_path / "default"), ["friendadd alice", "viewby alice", "postpicture metrics.prom"])
+    assert output[-1] == "Picture metrics.prom with owner alice and default permissions created"
+
+    facebook = make_facebook(tmp_path / "metrics", metrics_path=str(tmp_path / "metrics" / "stats.prom"))
+    output = run(facebook, ["friendadd alice", "viewby alice", "postpicture stats.prom", "accessmatrix stats.prom"])
+    assert output[-2:] == ["Error: invalid filename stats.prom", "Error with accessmatrix: invalid filename stats.prom"]
@@ -0,0 +1,38 @@
+from list_management import ListManager, read_lists
+from tests.conftest import run
+
+SETUP = ["friendadd alice", "viewby alice", "friendadd bob", "friendadd carl", "listadd a", "listadd b", "listadd c",
+         "friendlist bob a", "friendlist a b", "friendlist b c"]
+
+
+def test_nested_members_gain_access(make_facebook):
+    facebook = make_facebook()
+    run(facebook, SETUP + ["friendlist carl b", "postpicture p.jpg", "chlst p.jpg c", "chmod p.jpg rw r- --",
+                           "logout", "viewby bob", "readcomments p.jpg"])
+
+    assert set(facebook.list_manager.members_of("c")) == {"bob", "carl"}
+    assert facebook.list_manager.friend_in_list("bob", "c")
+    assert facebook.metrics.outcomes[("readcomments", "success")] == 1
+
+
+def test_cycles_are_rejected(make_facebook):
+    facebook = make_facebook()
+    output = run(facebook, SETUP + ["friendlist c a", "friendlist a a"])
+
+    assert output[-2:] == ["Error with friendlist: list c contains list a, nesting would create a cycle",
+                           "Error with friendlist: list a contains list a, nesting would create a cycle"]
+    assert facebook.metrics.outcomes[("friendlist", "list_cycle")] == 2
+    assert set(facebook.list_manager.members_of("a")) == {"bob"}
+
+
+def test_nested_lists_are_saved_and_loaded(make_facebook, tmp_path):
+    facebook = make_facebook()
+    run(facebook, SETUP + ["end"])
+
+    saved = dict(read_lists(str(tmp_path / "lists.txt")))
+    assert saved["c"] == ["@b"]
+
+    lists = ListManager(str(tmp_path / "loaded.txt"))
+    for list_name, members in saved.items():
+        lists.set_list(list_name, members)
+    assert set(lists.members_of("c")) == {"bob"}
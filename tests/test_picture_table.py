@@ -0,0 +1,28 @@
+from tests.conftest import run
+
+COMMANDS = ["friendadd alice", "viewby alice", "friendadd bob", "friendadd carl", "listadd team",
+            "friendlist bob team", "postpicture a.jpg", "postpicture b.jpg", "postpicture c.jpg",
+            "chlst a.jpg team", "chmod a.jpg rw r- --", "chmod b.jpg rw -- r-", "chown c.jpg carl"]
+
+
+def expected(facebook, friend, operation):
+    pictures = facebook.picture_manager
+    return [name for name in pictures.pictures
+            if pictures.check_access(name, friend, operation, facebook.list_manager)]
+
+
+def test_access_indexes_are_built_by_the_first_query(make_facebook):
+    facebook = make_facebook()
+    run(facebook, COMMANDS)
+    table = facebook.picture_manager.pictures
+    assert not table.indexed and table.by_others['r'] == set()
+
+    assert facebook.picture_manager.accessible("bob", 'r', facebook.list_manager) == ["a.jpg", "b.jpg"]
+    assert table.indexed
+
+    # Once built, the indexes follow every change
+    run(facebook, ["chmod b.jpg rw -- --", "chlst c.jpg team", "postpicture d.jpg", "chmod d.jpg rw rw rw"])
+    for friend in ("alice", "bob", "carl"):
+        for operation in "rw":
+            assert facebook.picture_manager.accessible(friend, operation, facebook.list_manager) == \
+                expected(facebook, friend, operation)
@@ -0,0 +1,40 @@
+import filecmp
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = ["friendadd alice", "viewby alice", "friendadd bob", "listadd team", "friendlist bob team",
+          "postpicture p.txt", "chmod p.txt rw rw --", "chlst p.txt team", "writecomments p.txt first",
+          "postpicture q.txt", "writecomments q.txt other", "readcomments p.txt", "logout", "viewby bob",
+          "writecomments p.txt second", "readcomments p.txt last 1", "readcomments q.txt"]
+
+
+def run_access(directory, script, options):
+    # Run access.py on a script in a fresh state directory and return its stdout
+    os.makedirs(directory)
+    result = subprocess.run([sys.executable, os.path.join(ROOT, "access.py"), *options, str(script)], cwd=directory,
+                            capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+@pytest.mark.parametrize("commands", [
+    SCRIPT + ["end"],
+    # Creating the picture file fails: the run stops at that command, with the same output in both modes
+    SCRIPT + ["postpicture missing/x.txt", "writecomments p.txt third", "end"],
+], ids=["ok", "failing"])
+def test_pipelined_output_matches_sequential(tmp_path, commands):
+    script = tmp_path / "script.txt"
+    script.write_text('\n'.join(commands) + '\n')
+
+    sequential = run_access(tmp_path / "sequential", script, ["--comment-cache-mb", "0"])
+    pipelined = run_access(tmp_path / "pipelined", script, ["--comment-cache-mb", "0", "--pipeline"])
+
+    assert pipelined == sequential
+    names = sorted(os.listdir(tmp_path / "sequential"))
+    assert names == sorted(os.listdir(tmp_path / "pipelined"))
+    _, mismatch, errors = filecmp.cmpfiles(tmp_path / "sequential", tmp_path / "pipelined", names, shallow=False)
+    assert mismatch == errors == []
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+
+from profile_host import ProfileHost
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_hosted_profiles_share_one_writer_thread(tmp_path):
+    before = threading.active_count()
+    host = ProfileHost(str(tmp_path), memory_budget=1 << 40)
+    for number in range(200):
+        host.execute(f"profile{number}", f"friendadd owner{number}")
+    assert len(host.profiles) == 200
+    assert threading.active_count() <= before + 1
+    host.close()
+
+
+def test_eviction_and_reload_keep_the_session_state(tmp_path, capsys):
+    host = ProfileHost(str(tmp_path), memory_budget=1)
+    for command in ["friendadd alice", "viewby alice", "friendadd bob", "postpicture p.txt", "logout"]:
+        host.execute("first", command)
+    host.execute("second", "friendadd carl")
+    assert "first" not in host.profiles
+    capsys.readouterr()
+
+    # The owner viewed the profile before it was evicted, so bob may log in straight away
+    host.execute("first", "viewby bob")
+    host.execute("first", "readcomments p.txt")
+    assert capsys.readouterr().out.splitlines() == ["Friend bob views the profile",
+                                                    "Friend bob denied read access to p.txt"]
+    assert host.profiles["first"].metrics.outcomes[("viewby", "success")] == 2
+    host.close()
+
+
+def test_thousands_of_profiles_under_a_low_open_file_limit(tmp_path):
+    # The host runs in its own process so the limit does not affect the test run
+    script = textwrap.dedent(f"""
+        import resource
+        from profile_host import ProfileHost
+
+        resource.setrlimit(resource.RLIMIT_NOFILE, (256, resource.getrlimit(resource.RLIMIT_NOFILE)[1]))
+        host = ProfileHost({str(tmp_path)!r})
+        for number in range(3000):
+            host.execute(f"profile{{number}}", f"friendadd owner{{number}}")
+        assert len(host.profiles) <= host.max_profiles == 96, host.metrics()
+        host.execute("profile0", "viewby owner0")
+        host.close()
+    """)
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1] == "Friend owner0 views the profile"
@@ -0,0 +1,59 @@
+from replay import compile_script, load_program, replay
+from tests.conftest import run
+
+SCRIPT = """friendadd alice
+viewby alice
+friendadd bob
+listadd team
+friendlist bob team
+postpicture a.jpg
+chlst a.jpg team
+chmod a.jpg rw r- --
+bogus command
+logout
+viewby bob
+readcomments a.jpg
+writecomments a.jpg hello there
+logout
+end
+"""
+
+
+def replay_output(facebook, path):
+    output = []
+    facebook.output = output.append
+    try:
+        replay(facebook, str(path))
+    except SystemExit:
+        pass
+    return '\n'.join(output).split('\n')
+
+
+def test_replay_matches_the_text_script(make_facebook, tmp_path):
+    script = tmp_path / "script.txt"
+    script.write_text(SCRIPT)
+    compile_script(str(script), str(tmp_path / "script.mfbr"))
+
+    text = run(make_facebook(tmp_path / "text"), SCRIPT.splitlines())
+    assert replay_output(make_facebook(tmp_path / "binary"), tmp_path / "script.mfbr") == text
+    assert "Invalid command: bogus command" in text
+
+
+def test_replay_dispatches_on_the_opcode(tmp_path):
+    script = tmp_path / "script.txt"
+    script.write_text("friendadd alice\nbogus command\n")
+    compile_script(str(script), str(tmp_path / "script.mfbr"))
+
+    assert load_program(str(tmp_path / "script.mfbr")) == [
+        (0, ["friendadd", "alice"], None), (0xFF, ["bogus", "command"], "bogus command")]
+
+
+def test_bulk_friendadd_past_65535_names(make_facebook, tmp_path):
+    names = [f"friend{number}" for number in range(70000)]
+    script = tmp_path / "script.txt"
+    script.write_text(f"friendadd alice\nviewby alice\nfriendadd {' '.join(names)}\n")
+    compile_script(str(script), str(tmp_path / "script.mfbr"))
+
+    facebook = make_facebook()
+    assert replay_output(facebook, tmp_path / "script.mfbr")[-1] == "70000 friends added"
+    assert len(facebook.friends_manager.friends) == 70001
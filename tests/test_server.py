@@ -0,0 +1,79 @@
+import asyncio
+
+from server import MyFacebookServer, send_command
+
+
+async def connect(path):
+    return await asyncio.open_unix_connection(path)
+
+
+def test_transactions_are_per_session(make_facebook, tmp_path):
+    facebook = make_facebook()
+    server = MyFacebookServer(facebook, str(tmp_path / "s.sock"))
+
+    async def scenario():
+        server._server = await asyncio.start_unix_server(server.handle_connection, path=server.socket_path)
+        a = await connect(server.socket_path)
+        b = await connect(server.socket_path)
+
+        await send_command(*a, "friendadd alice")
+        await send_command(*a, "viewby alice")
+        await send_command(*a, "friendadd bob")
+        await send_command(*a, "postpicture p.txt")
+        await send_command(*b, "viewby bob")
+        assert await send_command(*a, "begin") == ["Transaction started by alice"]
+        assert await send_command(*a, "chmod p.txt rw rw rw") == []
+
+        # bob's read waits for alice's transaction instead of failing, aborting it or seeing the staged chmod
+        reading = asyncio.ensure_future(send_command(*b, "readcomments p.txt"))
+        await asyncio.sleep(0.05)
+        assert not reading.done()
+
+        assert await send_command(*a, "commit") == ["Permissions for p.txt set to rw rw rw by alice",
+                                                    "Transaction committed: 1 changes"]
+        assert await reading == ["Friend bob reads p.txt as:", "p"]
+
+        # A transaction left open by a closed connection is rolled back
+        assert await send_command(*a, "begin") == ["Transaction started by alice"]
+        await send_command(*a, "chmod p.txt rw -- --")
+        a[1].close()
+        assert await send_command(*b, "readcomments p.txt") == ["Friend bob reads p.txt as:", "p"]
+
+        b[1].close()
+        server._server.close()
+        await server._server.wait_closed()
+
+    asyncio.run(scenario())
+    assert facebook.transaction is None
+    assert facebook.picture_manager.permissions_of("p.txt") == ("rw", "rw", "rw")
+
+
+def test_end_waits_for_another_sessions_transaction(make_facebook, tmp_path):
+    facebook = make_facebook()
+    server = MyFacebookServer(facebook, str(tmp_path / "s.sock"))
+
+    async def scenario():
+        server._server = await asyncio.start_unix_server(server.handle_connection, path=server.socket_path)
+        a = await connect(server.socket_path)
+        b = await connect(server.socket_path)
+
+        for command in ["friendadd alice", "viewby alice", "friendadd bob", "listadd team", "postpicture p.txt",
+                        "begin", "chmod p.txt rw rw rw", "friendlist bob team"]:
+            await send_command(*a, command)
+
+        # bob's end must not save alice's staged changes
+        ending = asyncio.ensure_future(send_command(*b, "end"))
+        await asyncio.sleep(0.05)
+        assert not ending.done()
+
+        assert await send_command(*a, "abort") == ["Transaction aborted: 2 changes rolled back"]
+        assert await ending == []
+
+        a[1].close()
+        b[1].close()
+        server._server.close()
+        await server._server.wait_closed()
+
+    asyncio.run(scenario())
+    assert (tmp_path / "pictures.txt").read_text() == "p.txt: alice nil rw -- --\n"
+    assert (tmp_path / "lists.txt").read_text() == "team: \n"
@@ -0,0 +1,42 @@
+from snapshot import snapshot_to_text, text_to_snapshot
+from tests.conftest import run
+
+COMMANDS = ["friendadd alice", "viewby alice", "friendadd bob", "friendadd carl", "listadd team", "listadd all",
+            "friendlist bob team", "friendlist team all", "postpicture a.jpg", "chlst a.jpg all",
+            "chmod a.jpg rw r- --", "postpicture b.jpg"]
+
+
+def state(facebook):
+    pictures = facebook.picture_manager
+    return (list(facebook.friends_manager.friends), facebook.profile_owner,
+            {name: facebook.list_manager.entries_of(name) for name in facebook.list_manager.lists},
+            {name: (pictures.owner_of(name), pictures.list_of(name), pictures.permissions_of(name))
+             for name in ("a.jpg", "b.jpg")})
+
+
+def test_snapshot_round_trip(make_facebook, tmp_path):
+    snapshot = str(tmp_path / "state.mfbs")
+    facebook = make_facebook(tmp_path / "first", snapshot=snapshot)
+    run(facebook, COMMANDS)
+    expected = state(facebook)
+    run(facebook, ["end"])
+
+    # The mapped state reads back the same (picture files stay in the state directory) and keeps working after changes
+    loaded = make_facebook(tmp_path / "first", snapshot=snapshot)
+    assert state(loaded) == expected
+    output = run(loaded, ["viewby alice", "logout", "viewby bob", "readcomments a.jpg", "logout", "viewby alice",
+                          "friendadd dave", "chown b.jpg dave", "end"])
+    assert "Friend bob reads a.jpg as:" in output
+
+    reloaded = make_facebook(tmp_path / "first", snapshot=snapshot)
+    assert list(reloaded.friends_manager.friends) == ["alice", "bob", "carl", "dave"]
+    assert reloaded.picture_manager.owner_of("b.jpg") == "dave"
+
+
+def test_text_conversion_round_trip(make_facebook, tmp_path):
+    snapshot = tmp_path / "state.mfbs"
+    run(make_facebook(tmp_path / "first", snapshot=str(snapshot)), COMMANDS + ["end"])
+
+    snapshot_to_text(str(snapshot), str(tmp_path / "text"))
+    text_to_snapshot(str(tmp_path / "text"), str(tmp_path / "again.mfbs"))
+    assert (tmp_path / "again.mfbs").read_bytes() == snapshot.read_bytes()
@@ -0,0 +1,60 @@
+import os
+
+from tests.conftest import run
+
+SETUP = ["friendadd alice", "viewby alice", "friendadd bob", "listadd team", "postpicture p.txt"]
+
+
+def test_commit_applies_staged_changes(make_facebook):
+    facebook = make_facebook()
+    output = run(facebook, SETUP + ["begin", "friendlist bob team", "chlst p.txt team", "commit"])
+
+    assert output[-3:] == ["Friend bob added to list team", "List for p.txt set to team by alice",
+                           "Transaction committed: 2 changes"]
+    assert facebook.list_manager.friend_in_list("bob", "team")
+    assert facebook.picture_manager.list_of("p.txt") == "team"
+
+
+def test_error_rolls_back(make_facebook):
+    facebook = make_facebook()
+    output = run(facebook, SETUP + ["begin", "chlst p.txt team", "chown missing.txt bob", "readcomments p.txt"])
+
+    assert output[-3] == "Transaction aborted: 1 changes rolled back"
+    assert facebook.transaction is None
+    assert facebook.picture_manager.list_of("p.txt") == "nil"
+
+
+def test_end_inside_transaction_rolls_back_and_saves(make_facebook, tmp_path):
+    facebook = make_facebook()
+    output = run(facebook, SETUP + ["begin", "chlst p.txt team", "end", "postpicture q.txt"])
+
+    assert output[-1] == "Transaction aborted: 1 changes rolled back"
+    with open(tmp_path / "pictures.txt") as file:
+        assert file.read() == "p.txt: alice nil rw -- --\n"
+
+
+def test_transaction_open_at_end_of_file_is_rolled_back(make_facebook, tmp_path):
+    script = tmp_path / "script.txt"
+    script.write_text('\n'.join(SETUP + ["begin", "chlst p.txt team"]) + '\n')
+    facebook = make_facebook(tmp_path / "state")
+    output = []
+    facebook.output = output.append
+    facebook.run(str(script))
+
+    assert output[-1] == "Transaction aborted: 1 changes rolled back"
+    assert facebook.picture_manager.list_of("p.txt") == "nil"
+
+
+def test_commit_writes_the_log_once(make_facebook, tmp_path):
+    facebook = make_facebook(wal_dir=str(tmp_path / "wal"))
+    run(facebook, SETUP)
+    writes = []
+    append_many = facebook.wal.append_many
+    facebook.wal.append = lambda *record: writes.append([record])
+    facebook.wal.append_many = lambda records: writes.append(list(records)) or append_many(records)
+    run(facebook, ["begin", "friendlist bob team", "chlst p.txt team", "chmod p.txt rw r- --", "commit"])
+
+    assert writes == [[("friendlist", ("bob", "team")), ("chlst", ("p.txt", "team")),
+                       ("chmod", ("p.txt", "rw", "r-", "--"))]]
+    with open(tmp_path / "wal" / "wal.log") as file:
+        assert file.read().splitlines()[-3:] == ["6 friendlist bob team", "7 chlst p.txt team", "8 chmod p.txt rw r- --"]
@@ -0,0 +1,43 @@
+from tests.conftest import run
+
+COMMANDS = ["friendadd alice", "viewby alice", "friendadd bob", "friendadd carl", "listadd team",
+            "friendlist bob team", "postpicture a.jpg", "chlst a.jpg team", "chmod a.jpg rw r- --", "chown a.jpg bob"]
+
+
+def crash(facebook):
+    # Stop without end: nothing is saved, only the write-ahead log survives
+    facebook.close()
+
+
+def recovered_state(facebook):
+    return (list(facebook.friends_manager.friends), set(facebook.list_manager.members_of("team")),
+            facebook.picture_manager.permissions_of("a.jpg"))
+
+
+def test_state_survives_a_crash_before_end(make_facebook, tmp_path):
+    wal = str(tmp_path / "wal")
+    facebook = make_facebook(tmp_path / "first", wal_dir=wal)
+    run(facebook, COMMANDS)
+    expected = recovered_state(facebook)
+    crash(facebook)
+
+    assert recovered_state(make_facebook(tmp_path / "second", wal_dir=wal)) == expected
+    assert expected == (["alice", "bob", "carl"], {"bob"}, ("rw", "r-", "--"))
+
+
+def test_recovery_combines_checkpoints_with_the_log_tail(make_facebook, tmp_path):
+    wal = str(tmp_path / "wal")
+    facebook = make_facebook(tmp_path / "first", wal_dir=wal, checkpoint_every=3)
+    run(facebook, COMMANDS)
+    expected = recovered_state(facebook)
+    crash(facebook)
+    assert list((tmp_path / "wal").glob("checkpoint-*"))
+
+    # A record torn by the crash is skipped
+    with open(tmp_path / "wal" / "wal.log", 'a') as log:
+        log.write("999 friendadd da")
+
+    recovered = make_facebook(tmp_path / "second", wal_dir=wal, checkpoint_every=3)
+    assert recovered_state(recovered) == expected
+    assert recovered.picture_manager.owner_of("a.jpg") == "bob"
+    assert "da" not in recovered.friends_manager.friends
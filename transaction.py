@@ -0,0 +1,46 @@
+# Commands that may be staged in a transaction (besides commit and abort, which end it)
+TRANSACTION_COMMANDS = {"chmod", "chlst", "chown", "listadd", "friendlist"}
+
+
+class Transaction:
+    def __init__(self):
+        # Write-ahead log records and reports held back until commit, and how to undo each change so far
+        self.records = []
+        self.reports = []
+        self.undo = []
+
+    def stage(self, facebook, operation, arguments):
+        # Hold back a change's log record and remember the state it is about to overwrite
+        self.records.append((operation, arguments))
+
+        if operation in ("chlst", "chmod", "chown"):
+            picture_manager = facebook.picture_manager
+            picture_name = arguments[0]
+            self.undo.append(("picture", picture_name, picture_manager.owner_of(picture_name),
+                              picture_manager.list_of(picture_name), picture_manager.permissions_of(picture_name)))
+        elif operation == "listadd":
+            self.undo.append(("listadd", arguments[0]))
+        elif operation == "friendlist":
+            friend_name, list_name = arguments
+            if friend_name not in facebook.list_manager.lists[list_name]:
+                self.undo.append(("friendlist", friend_name, list_name))
+        elif operation == "sublist":
+            child_name, list_name = arguments
+            if child_name not in facebook.list_manager.sublists[list_name]:
+                self.undo.append(("sublist", child_name, list_name))
+
+    def rollback(self, facebook):
+        # Undo the staged changes, newest first
+        for change in reversed(self.undo):
+            if change[0] == "picture":
+                facebook.picture_manager.set_picture(change[1], change[2], change[3], change[4])
+            elif change[0] == "listadd":
+                facebook.list_manager.remove_list(change[1])
+            elif change[0] == "friendlist":
+                facebook.list_manager.remove_friend_from_list(change[1], change[2])
+                facebook.picture_manager.invalidate_viewer(change[1])
+            elif change[0] == "sublist":
+                facebook.list_manager.remove_list_from_list(change[1], change[2])
+                for friend_name in facebook.list_manager.members_of(change[1]):
+                    facebook.picture_manager.invalidate_viewer(friend_name)
+        self.undo.clear()
@@ -0,0 +1,230 @@
+import os
+
+# State-changing records written to the log, with the entity kind each one dirties for the next checkpoint
+RECORD_KINDS = {
+    "friendadd": "friend",
+    "owner": "owner",
+    "listadd": "list",
+    "friendlist": "list",
+    "sublist": "list",
+    "postpicture": "picture",
+    "chlst": "picture",
+    "chmod": "picture",
+    "chown": "picture",
+}
+
+
+class WriteAheadLog:
+    def __init__(self, directory="wal", checkpoint_every=1000, max_deltas=8, sync=False):
+        # Initialize WriteAheadLog with a directory for the log and its checkpoints
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Write a checkpoint after this many records, and fold the deltas into a full checkpoint after max_deltas
+        self.checkpoint_every = checkpoint_every
+        self.max_deltas = max_deltas
+
+        # fsync every record instead of only flushing it to the operating system
+        self.sync = sync
+
+        # Sequence number of the last record written and of the last record covered by a checkpoint
+        self.sequence = 0
+        self.checkpointed = 0
+
+        # Names of the entities changed since the last checkpoint (dicts keep the order they were changed in)
+        self.dirty = {kind: {} for kind in ("friend", "owner", "list", "picture")}
+
+        self._log = None
+
+    def append(self, operation, *arguments):
+        # Write a record before the change it describes is applied
+        self.sequence += 1
+        self._log.write(f"{self.sequence} {operation} {' '.join(arguments)}\n")
+        self._log.flush()
+        if self.sync:
+            os.fsync(self._log.fileno())
+
+        self._mark_dirty(operation, arguments)
+
+    def append_many(self, records):
+        # Write a batch of (operation, arguments) records with a single write and flush
+        lines = []
+        for operation, arguments in records:
+            self.sequence += 1
+            lines.append(f"{self.sequence} {operation} {' '.join(arguments)}\n")
+            self._mark_dirty(operation, arguments)
+
+        self._log.write(''.join(lines))
+        self._log.flush()
+        if self.sync:
+            os.fsync(self._log.fileno())
+
+    def checkpoint_due(self):
+        return self.sequence - self.checkpointed >= self.checkpoint_every
+
+    def checkpoint(self, facebook):
+        # Write the entities changed since the last checkpoint and start a fresh log
+        if self.sequence == self.checkpointed:
+            return
+
+        checkpoints = self._checkpoint_files()
+        deltas_since_full = len(checkpoints) - self._last_full_index(checkpoints) - 1
+        full = deltas_since_full >= self.max_deltas
+
+        number = int(checkpoints[-1].split('-')[1].split('.')[0]) + 1 if checkpoints else 1
+        name = f"checkpoint-{number:06d}.{'full' if full else 'delta'}.txt"
+        self._write_checkpoint(name, facebook, full)
+
+        # Older checkpoints are no longer needed once a full checkpoint exists
+        if full:
+            for old in checkpoints:
+                os.remove(os.path.join(self.directory, old))
+
+        self.checkpointed = self.sequence
+        for names in self.dirty.values():
+            names.clear()
+
+        # Records up to here are covered by the checkpoint, so the log can start over
+        self._log.close()
+        self._log = open(self._log_path(), 'w')
+
+    def recover(self, facebook):
+        # Rebuild state from the newest full checkpoint, the deltas after it and the tail of the log
+        checkpoints = self._checkpoint_files()
+        for name in checkpoints[max(self._last_full_index(checkpoints), 0):]:
+            self._load_checkpoint(name, facebook)
+
+        self.sequence = self.checkpointed
+        replayed = 0
+        try:
+            with open(self._log_path(), 'r') as file:
+                for line in file:
+                    parts = line.split()
+
+                    # Skip a torn final record and records already covered by a checkpoint
+                    if len(parts) < 2 or not line.endswith("\n"):
+                        continue
+                    sequence = int(parts[0])
+                    if sequence <= self.checkpointed:
+                        continue
+
+                    apply_record(facebook, parts[1], parts[2:])
+                    self._mark_dirty(parts[1], parts[2:])
+                    self.sequence = sequence
+                    replayed += 1
+        except FileNotFoundError:
+            # Handle the case for a brand new log
+            pass
+
+        # Keep appending after the records that were recovered
+        self._log = open(self._log_path(), 'a')
+        return replayed
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def _mark_dirty(self, operation, arguments):
+        # Remember which entity the record changed
+        kind, name = changed_entity(operation, arguments)
+        self.dirty[kind][name] = None
+
+    def _write_checkpoint(self, name, facebook, full):
+        # Write checkpoint records (every entity for a full checkpoint, only dirty ones for a delta)
+        friends = facebook.friends_manager.friends
+        list_manager = facebook.list_manager
+        lists = list_manager.lists
+        picture_manager = facebook.picture_manager
+        pictures = picture_manager.pictures
+
+        temporary = os.path.join(self.directory, name + ".tmp")
+        with open(temporary, 'w') as file:
+            file.write(f"sequence {self.sequence}\n")
+
+            if facebook.profile_owner is not None:
+                file.write(f"owner {facebook.profile_owner}\n")
+            for friend in (friends if full else self.dirty["friend"]):
+                file.write(f"friend {friend}\n")
+            for list_name in (lists if full else self.dirty["list"]):
+                file.write(f"list {list_name} {' '.join(sorted(list_manager.entries_of(list_name)))}\n")
+            for picture_name in (pictures if full else self.dirty["picture"]):
+                file.write(f"picture {picture_name} {picture_manager.owner_of(picture_name)} "
+                           f"{picture_manager.list_of(picture_name)} "
+                           f"{' '.join(picture_manager.permissions_of(picture_name))}\n")
+
+            file.flush()
+            os.fsync(file.fileno())
+
+        # Publish the checkpoint atomically so recovery never sees a half written one
+        os.replace(temporary, os.path.join(self.directory, name))
+
+    def _load_checkpoint(self, name, facebook):
+        # Apply a checkpoint's records on top of the current state
+        with open(os.path.join(self.directory, name), 'r') as file:
+            for line in file:
+                parts = line.split()
+                kind = parts[0]
+
+                if kind == "sequence":
+                    self.checkpointed = int(parts[1])
+                elif kind == "owner":
+                    facebook.profile_owner = parts[1]
+                elif kind == "friend":
+                    facebook.friends_manager.add_friend(parts[1])
+                elif kind == "list":
+                    facebook.list_manager.set_list(parts[1], parts[2:])
+                elif kind == "picture":
+                    facebook.picture_manager.set_picture(parts[1], parts[2], parts[3], parts[4:7])
+
+    def _checkpoint_files(self):
+        # Return the checkpoint file names in the order they were written
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith("checkpoint-") and name.endswith(".txt"))
+
+    def _last_full_index(self, checkpoints):
+        # Return the position of the newest full checkpoint (-1 if there is none)
+        for index in range(len(checkpoints) - 1, -1, -1):
+            if checkpoints[index].endswith(".full.txt"):
+                return index
+        return -1
+
+    def _log_path(self):
+        return os.path.join(self.directory, "wal.log")
+
+
+def changed_entity(operation, arguments):
+    # Return the (kind, name) of the entity a record changes (the outer list for friendlist and sublist, the picture
+    # for picture records)
+    return RECORD_KINDS[operation], arguments[1] if operation in ("friendlist", "sublist") else arguments[0]
+
+
+def apply_record(facebook, operation, arguments):
+    # Re-apply a logged change directly to the managers (it was already validated when it was logged)
+    friends_manager = facebook.friends_manager
+    list_manager = facebook.list_manager
+    picture_manager = facebook.picture_manager
+
+    if operation == "friendadd":
+        friends_manager.add_friend(arguments[0])
+    elif operation == "owner":
+        facebook.profile_owner = arguments[0]
+    elif operation == "listadd":
+        list_manager.add_list(arguments[0])
+    elif operation == "friendlist":
+        list_manager.add_friend_to_list(arguments[0], arguments[1])
+        picture_manager.invalidate_viewer(arguments[0])
+    elif operation == "sublist":
+        list_manager.add_list_to_list(arguments[0], arguments[1])
+        for friend_name in list_manager.members_of(arguments[0]):
+            picture_manager.invalidate_viewer(friend_name)
+    elif operation == "postpicture":
+        # The picture's comments already exist on disk, so only its record is restored
+        picture_manager.set_picture(arguments[0], arguments[1], 'nil', ('rw', '--', '--'))
+    elif operation == "chlst":
+        picture_manager.change_list(arguments[0], arguments[1])
+    elif operation == "chmod" and len(arguments) >= 4:
+        # (a chmod with fewer than three permissions failed when it was issued and changed nothing)
+        picture_manager.change_permissions(arguments[0], arguments[1:4])
+    elif operation == "chown":
+        picture_manager.change_owner(arguments[0], arguments[1])
@@ -0,0 +1,124 @@
+import argparse
+import random
+import sys
+
+# Default mix of commands issued once the profile has been set up (relative weights)
+DEFAULT_MIX = {
+    "friendadd": 4,
+    "listadd": 1,
+    "friendlist": 6,
+    "postpicture": 4,
+    "chmod": 4,
+    "chlst": 3,
+    "readcomments": 50,
+    "writecomments": 20,
+}
+
+# Mixes that stress one manager each
+MIXES = {
+    "default": DEFAULT_MIX,
+    "friends": {"friendadd": 60, "friendlist": 10, "readcomments": 20, "writecomments": 10},
+    "lists": {"listadd": 10, "friendlist": 60, "chlst": 10, "readcomments": 20},
+    "pictures": {"postpicture": 20, "chmod": 15, "chlst": 10, "readcomments": 35, "writecomments": 20},
+}
+
+PERMISSIONS = ("rw", "r-", "-w", "--")
+
+
+def generate(size, seed=0, mix=None, session_length=20):
+    # Yield a seeded, reproducible command script of the given size
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    instructions = list(mix)
+    weights = [mix[instruction] for instruction in instructions]
+
+    owner = "owner"
+    friends = [owner]
+    lists = []
+    pictures = []
+    emitted = 0
+
+    def emit(command):
+        nonlocal emitted
+        emitted += 1
+        return command
+
+    # Set up the profile owner with a few friends, lists and pictures so every command has targets
+    yield emit(f"friendadd {owner}")
+    yield emit(f"viewby {owner}")
+    for i in range(10):
+        friends.append(f"friend{i}")
+        yield emit(f"friendadd friend{i}")
+    for i in range(2):
+        lists.append(f"list{i}")
+        yield emit(f"listadd list{i}")
+    for i in range(3):
+        pictures.append(f"picture{i}.txt")
+        yield emit(f"postpicture picture{i}.txt")
+
+    viewer = owner
+    remaining_in_session = session_length
+    while emitted < size:
+        # Switch to another friend's session every so often; popular friends view more often
+        if remaining_in_session == 0:
+            viewer = friends[min(int(rng.paretovariate(1.2)) - 1, len(friends) - 1)] if rng.random() < 0.8 \
+                else owner
+            yield emit("logout")
+            if emitted < size:
+                yield emit(f"viewby {viewer}")
+            remaining_in_session = session_length
+            continue
+        remaining_in_session -= 1
+
+        instruction = rng.choices(instructions, weights)[0]
+
+        # A few popular pictures get most of the reads and writes
+        picture = pictures[min(int(rng.paretovariate(1.1)) - 1, len(pictures) - 1)]
+
+        # Owner-only commands are issued by whoever is viewing; most are rejected unless it is the owner
+        if instruction == "friendadd":
+            friend = f"friend{len(friends) - 1}"
+            if viewer == owner:
+                friends.append(friend)
+            yield emit(f"friendadd {friend}")
+        elif instruction == "listadd":
+            list_name = f"list{len(lists)}"
+            if viewer == owner:
+                lists.append(list_name)
+            yield emit(f"listadd {list_name}")
+        elif instruction == "friendlist":
+            yield emit(f"friendlist {rng.choice(friends)} {rng.choice(lists)}")
+        elif instruction == "postpicture":
+            picture = f"picture{len(pictures)}.txt"
+            pictures.append(picture)
+            yield emit(f"postpicture {picture}")
+        elif instruction == "chmod":
+            yield emit(f"chmod {picture} {' '.join(rng.choice(PERMISSIONS) for _ in range(3))}")
+        elif instruction == "chlst":
+            yield emit(f"chlst {picture} {rng.choice(lists + ['nil'])}")
+        elif instruction == "readcomments":
+            yield emit(f"readcomments {picture} last 10" if rng.random() < 0.5 else f"readcomments {picture}")
+        elif instruction == "writecomments":
+            yield emit(f"writecomments {picture} comment {emitted} from {viewer}")
+
+
+def write_workload(path, size, seed=0, mix="default"):
+    # Stream a generated workload to a file (or stdout for '-') without holding it in memory
+    output = sys.stdout if path == '-' else open(path, 'w')
+    try:
+        for command in generate(size, seed, MIXES[mix]):
+            output.write(command + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic MyFacebook command workload")
+    parser.add_argument("output", help="file to write, or - for stdout")
+    parser.add_argument("--size", type=int, default=1000, help="number of commands (1K to 10M)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    args = parser.parse_args()
+
+    write_workload(args.output, args.size, args.seed, args.mix)